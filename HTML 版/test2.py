@@ -1,386 +1,9 @@
-import json
-import re
-import requests
-import subprocess
-from jinja2 import Environment, FileSystemLoader
-from datetime import datetime, timedelta
-import time
-import statistics
+import os
+import sys
 
-# Zabbix API 配置
-ZABBIX_URL = "http://10.40.4.67:8090/api_jsonrpc.php"
-ZABBIX_USER = "Admin"
-ZABBIX_PASSWORD = "zabbix"
-HOST_IDS = {
-    "linux": "10644",  # 假設 Linux 主機 ID
-    "windows": "10643"  # 假設 Windows 主機 ID
-}
-HEADERS = {"Content-Type": "application/json"}
-
-# 假設的 IP 和 URL 資訊
-SYSTEM_INFO = {
-    "linux": {"ip": "10.40.4.67", "url": "sp.hosp"},
-    "windows": {"ip": "10.40.4.86", "url": "ap.hosp"}
-}
-
-# 閾值配置
-THRESHOLDS = {
-    "cpu": 70,  # CPU utilization > 70%
-    "cpuload": None,  # Will be set dynamically based on CPU cores
-    "mem": 70,  # Memory utilization > 70%
-    "swap": 70,  # Swap utilization > 70%
-    "disk": 80,  # Disk utilization > 80%
-    "iops": 80,  # IOPS utilization > 80%
-    "readwrite": 80,  # Read/Write MB/s > 80%
-    "disk_active": 80  # Disk active time > 80%
-}
-
-def get_zabbix_token():
-    login_data = {
-        "jsonrpc": "2.0",
-        "method": "user.login",
-        "params": {
-            "user": ZABBIX_USER,
-            "password": ZABBIX_PASSWORD
-        },
-        "id": 1,
-        "auth": None
-    }
-    try:
-        response = requests.post(ZABBIX_URL, headers=HEADERS, json=login_data)
-        response.raise_for_status()
-        result = response.json()
-        return result.get('result', Exception(f"Login failed: {result.get('error', 'Unknown error')}"))
-    except Exception as e:
-        print(f"Error obtaining token: {str(e)}")
-        exit(1)
-
-def zabbix_api_request(method, params, auth_token):
-    request_data = {
-        "jsonrpc": "2.0",
-        "method": method,
-        "params": params,
-        "id": 2,
-        "auth": auth_token
-    }
-    try:
-        response = requests.post(ZABBIX_URL, headers=HEADERS, json=request_data)
-        response.raise_for_status()
-        result = response.json()
-        return result.get('result', Exception(f"API request failed: {result.get('error', 'Unknown error')}"))
-    except Exception as e:
-        print(f"Error in API request ({method}): {str(e)}")
-        return []
-
-def get_historical_data(host_id, item_key, value_type, auth_token, time_from, time_till, threshold=None, invert=False):
-    params = {
-        "hostids": host_id,
-        "filter": {"key_": item_key},
-        "output": ["itemid", "name", "key_", "value_type"]
-    }
-    items = zabbix_api_request("item.get", params, auth_token)
-    if not items:
-        print(f"No items found for key: {item_key}")
-        return []
-
-    item_id = items[0]['itemid']
-    print(items)
-    params = {
-        "history": value_type,
-        "itemids": item_id,
-        "time_from": time_from,
-        "time_till": time_till,
-        "output": "extend",
-        "sortfield": "clock",
-        "sortorder": "ASC"
-    }
-    history = zabbix_api_request("history.get", params, auth_token)
-
-    data = []
-    for entry in history:
-        timestamp = datetime.fromtimestamp(int(entry['clock'])).strftime('%Y-%m-%d %H:%M:%S')
-        value = float(entry['value'])
-        if 'memory' in item_key or 'vfs.fs.size' in item_key or 'swap' in item_key:
-            if 'pavailable' not in item_key and 'pfree' not in item_key and 'pused' not in item_key:
-                value = value / (1024 * 1024 * 1024)  # bytes → GB
-        elif 'net' in item_key:
-            value = value / 1000  # bits/s to Kbps
-        elif 'readwrite' in item_key:
-            value = value / (1024 * 1024)  # bytes/s to MB/s
-
-        if threshold is not None:
-            if invert:
-                if value >= threshold:
-                    continue
-            else:
-                if value <= threshold:
-                    continue
-
-        data.append([timestamp, f"{value:.2f}"])
-    return data
-
-def calculate_stats(data, hostname, threshold, invert=False, anomaly_threshold=None):
-    if not data:
-        return []
-
-    data2 = []
-    for timestamp, value in data:
-        val = float(value)
-        data2.append({"hostname": hostname, "usage": f"{val:.2f}", "timestamp": timestamp})
-
-    if anomaly_threshold is not None:
-        for item in data2:
-            val = float(item["usage"])
-            item["is_anomalous"] = (val > anomaly_threshold and not invert) or (val < anomaly_threshold and invert)
-
-    data2.sort(key=lambda x: float(x["usage"]), reverse=not invert)
-    return data2[:10]
-
-def get_system_info(host_id, os_type, auth_token):
-    keys = [
-        "vm.memory.size[total]", "system.cpu.util", "system.cpu.load[all,avg1]",
-        "vm.memory.size[pavailable]", "system.swap.size[,pfree]"
-    ]
-    if os_type == "linux":
-        keys.extend([
-            "system.sw.os", "system.cpu.num",
-            "vfs.fs.size[/,total]", "vfs.fs.size[/,pused]",
-            "vfs.fs.size[/data,total]", "vfs.fs.size[/data,pused]",
-            "vfs.fs.size[/var/lib/docker,total]", "vfs.fs.size[/var/lib/docker,pused]",
-            "custom.iops[dm-0]", "custom.iops[dm-1]", "custom.iops[dm-2]",
-            "custom.readwrite[dm-0]", "custom.readwrite[dm-1]", "custom.readwrite[dm-2]",
-            "disk.util[dm-0]", "disk.util[dm-1]", "disk.util[dm-2]"
-        ])
-    else:  # windows
-        keys.extend(["system.uname", "wmi.get[root/cimv2,\"Select NumberOfLogicalProcessors from Win32_ComputerSystem\"]"])
-
-    params = {
-        "hostids": host_id,
-        "output": ["itemid", "name", "key_", "lastvalue"],
-        "filter": {"key_": keys}
-    }
-    items = zabbix_api_request("item.get", params, auth_token)
-
-    # 獲取主機名稱
-    params = {
-        "hostids": host_id,
-        "output": ["host", "name"]
-    }
-    hosts = zabbix_api_request("host.get", params, auth_token)
-    hostname = hosts[0].get('name', 'Unknown Host') if hosts else 'Unknown Host'
-
-    # 初始化 system_info
-    system_info = {
-        "os_string": "Unknown OS",
-        "cpu_cores": 0,
-        "memory_bytes": 0,
-        "os_type": os_type,
-        "num": 0,
-        "last_month_count": 0,
-        "this_month_count": 0,
-        "growth_rate": 0.0,
-        "user_login_total": 0,
-        "slide_total": 0,
-        "slide_free_size": 0,
-        "login_users": []
-    }
-
-    # 先處理 CPU 核心數和其他基本資訊
-    for item in items:
-        if item["key_"] in ["system.sw.os", "system.uname"]:
-            system_info["os_string"] = item["lastvalue"]
-        elif item["key_"] == "system.cpu.num":
-            system_info["cpu_cores"] = int(item["lastvalue"])
-        elif item["key_"] == "wmi.get[root/cimv2,\"Select NumberOfLogicalProcessors from Win32_ComputerSystem\"]":
-            system_info["cpu_cores"] = int(item["lastvalue"])
-        elif item["key_"] == "vm.memory.size[total]":
-            system_info["memory_bytes"] = int(item["lastvalue"])
-
-    # 設定時間範圍：過去 7 天
-    time_till = int(time.time())
-    time_from = time_till - (7 * 24 * 3600)  # 7 days in seconds
-
-    # 獲取歷史數據
-    cpu_data = get_historical_data(host_id, 'system.cpu.util', 0, auth_token, time_from, time_till, THRESHOLDS["cpu"])
-    cpu_alerts = calculate_stats(cpu_data, hostname, THRESHOLDS["cpu"], anomaly_threshold=THRESHOLDS["cpu"])
-
-    cpuload_data = get_historical_data(host_id, 'system.cpu.load[all,avg1]', 0, auth_token, time_from, time_till)
-    mem_data = get_historical_data(host_id, 'vm.memory.size[pavailable]', 0, auth_token, time_from, time_till, THRESHOLDS["mem"], invert=True)
-    swap_data = get_historical_data(host_id, 'system.swap.size[,pfree]', 0, auth_token, time_from, time_till, THRESHOLDS["swap"], invert=True)
-
-    # 磁碟相關數據
-    linux_disks = [
-        {"name": "/", "total_key": "vfs.fs.size[/,total]", "pused_key": "vfs.fs.size[/,pused]", "value_type": 0},
-        {"name": "/data", "total_key": "vfs.fs.size[/data,total]", "pused_key": "vfs.fs.size[/data,pused]", "value_type": 0},
-        {"name": "/var/lib/docker", "total_key": "vfs.fs.size[/var/lib/docker,total]", "pused_key": "vfs.fs.size[/var/lib/docker,pused]", "value_type": 0}
-    ]
-
-    disk_data = []
-    for disk in linux_disks if os_type == "linux" else []:
-        total_data = get_historical_data(host_id, disk["total_key"], disk["value_type"], auth_token, time_from, time_till)
-        pused_data = get_historical_data(host_id, disk["pused_key"], disk["value_type"], auth_token, time_from, time_till)
-        disk_alerts = calculate_stats(pused_data, hostname, THRESHOLDS["disk"], anomaly_threshold=THRESHOLDS["disk"])
-        disk["total"] = total_data[0][1] if total_data else "0.00"
-        disk["alerts"] = disk_alerts
-        disk_data.append(disk)
-
-    # IOPS 數據
-    iops_keys = ["custom.iops[dm-0]", "custom.iops[dm-1]", "custom.iops[dm-2]"] if os_type == "linux" else []
-    iops_data = []
-    for key in iops_keys:
-        data = get_historical_data(host_id, key, 0, auth_token, time_from, time_till, THRESHOLDS["iops"])
-        iops_data.append({
-            "name": key.split("[")[1][:-1],
-            "alerts": calculate_stats(data, hostname, THRESHOLDS["iops"], anomaly_threshold=THRESHOLDS["iops"])
-        })
-
-    # Read/Write 數據
-    readwrite_keys = ["custom.readwrite[dm-0]", "custom.readwrite[dm-1]", "custom.readwrite[dm-2]"] if os_type == "linux" else []
-    readwrite_data = []
-    for key in readwrite_keys:
-        data = get_historical_data(host_id, key, 0, auth_token, time_from, time_till, THRESHOLDS["readwrite"])
-        readwrite_data.append({
-            "name": key.split("[")[1][:-1],
-            "alerts": calculate_stats(data, hostname, THRESHOLDS["readwrite"], anomaly_threshold=THRESHOLDS["readwrite"])
-        })
-
-    # Disk Active Time 數據
-    disk_util_keys = ["disk.util[dm-0]", "disk.util[dm-1]", "disk.util[dm-2]"] if os_type == "linux" else []
-    disk_util_data = []
-    for key in disk_util_keys:
-        data = get_historical_data(host_id, key, 0, auth_token, time_from, time_till, THRESHOLDS["disk_active"])
-        disk_util_data.append({
-            "name": key.split("[")[1][:-1],
-            "alerts": calculate_stats(data, hostname, THRESHOLDS["disk_active"], anomaly_threshold=THRESHOLDS["disk_active"])
-        })
-
-    # 更新 system_info
-    system_info.update({
-        "cpu_data": cpu_alerts,
-        "cpuload_data": calculate_stats(cpuload_data, hostname, THRESHOLDS["cpuload"], anomaly_threshold=system_info["cpu_cores"] if system_info["cpu_cores"] else 1),
-        "mem_data": calculate_stats(mem_data, hostname, THRESHOLDS["mem"], invert=True, anomaly_threshold=THRESHOLDS["mem"]),
-        "swap_data": calculate_stats(swap_data, hostname, THRESHOLDS["swap"], invert=True, anomaly_threshold=THRESHOLDS["swap"]),
-        "disk_data": disk_data,
-        "iops_data": iops_data,
-        "readwrite_data": readwrite_data,
-        "disk_util_data": disk_util_data
-    })
-
-    if os_type == "linux":
-        try:
-            cmd_slide = ["zabbix_get", "-s", "10.40.4.67", "-k", "collect.slide.issue"]
-            slide_data = subprocess.check_output(cmd_slide, text=True, stderr=subprocess.STDOUT).strip()
-            print(f"Debug: slide_data = {slide_data}")
-            lines = slide_data.splitlines()
-            for line in lines:
-                if not line or line == "None":
-                    continue
-                num_match = re.search(r'num (\d+)', line)
-                last_month_match = re.search(r'last (\d+)', line)
-                this_month_match = re.search(r'this (\d+)', line)
-                growth_rate_match = re.search(r'grow ([\d.]+)', line)
-
-                if num_match:
-                    system_info["num"] = int(num_match.group(1))
-                if last_month_match:
-                    system_info["last_month_count"] = int(last_month_match.group(1))
-                if this_month_match:
-                    system_info["this_month_count"] = int(this_month_match.group(1))
-                if growth_rate_match:
-                    system_info["growth_rate"] = float(growth_rate_match.group(1))
-
-            cmd_userlogin = ["zabbix_get", "-s", "10.40.4.67", "-k", "collect.userlogin.issue"]
-            userlogin_data = subprocess.check_output(cmd_userlogin, text=True, stderr=subprocess.STDOUT).strip()
-            print(f"Debug: userlogin_data = {userlogin_data}")
-            login_users = json.loads(userlogin_data)
-            system_info["login_users"] = [{"userid": user["User_ID"], "username": user["Username"], "count": user["Count"]} for user in login_users]
-            system_info["user_login_total"] = sum(user["Count"] for user in login_users) if login_users else 0
-
-            system_info["slide_total"] = 100
-            system_info["slide_free_size"] = 50
-
-        except subprocess.CalledProcessError as e:
-            print(f"Error executing zabbix_get: {e.output}")
-            system_info["last_month_count"] = 9
-            system_info["this_month_count"] = 12
-            system_info["growth_rate"] = 0.33
-            system_info["num"] = 23
-            system_info["user_login_total"] = 4
-            system_info["slide_total"] = 100
-            system_info["slide_free_size"] = 50
-            system_info["login_users"] = [{"userid": "admin", "username": "Just_anAdmin", "count": 3}, {"userid": "test", "username": "aaadefault", "count": 1}]
-
-    return system_info
-
-def parse_os_info(os_string, os_type):
-    if os_type == "linux":
-        match = re.search(r'#\d+~(\d+\.\d+)\.\d+-Ubuntu', os_string)
-        if match:
-            return f"Ubuntu {match.group(1)}"
-        match = re.search(r'Ubuntu \d+\.\d+\.\d+-[\w\d]+~(\d+\.\d+)', os_string)
-        if match:
-            return f"Ubuntu {match.group(1)}"
-    elif os_type == "windows":
-        match = re.search(r'Windows \S+ (\d+\.\d+\.\d+) Microsoft Windows (\d+ [^\s]+)', os_string)
-        if match:
-            version = match.group(1)
-            os_name = match.group(2)
-            return f"Windows {os_name} {version}"
-    return "Unknown OS"
-
-def main():
-    auth_token = get_zabbix_token()
-    print("Authentication successful")
-
-    linux_data = {}
-    windows_data = {}
-
-    for os_type, host_id in HOST_IDS.items():
-        system_info = get_system_info(host_id, os_type, auth_token)
-        memory_gb = round(system_info["memory_bytes"] / (1024 ** 3), 2)
-
-        data = {
-            "system_ip": SYSTEM_INFO[os_type]["ip"],
-            "system_url": SYSTEM_INFO[os_type]["url"],
-            "system_os": parse_os_info(system_info["os_string"], os_type),
-            "system_cpu": f"{system_info['cpu_cores']} cores",
-            "system_mem": f"{memory_gb} GB",
-            "num": system_info["num"],
-            "last_month_count": system_info["last_month_count"],
-            "this_month_count": system_info["this_month_count"],
-            "growth_rate": system_info["growth_rate"],
-            "user_login_total": system_info["user_login_total"],
-            "slide_total": system_info["slide_total"],
-            "slide_free_size": system_info["slide_free_size"],
-            "login_users": system_info["login_users"],
-            "cpu_alerts": system_info["cpu_data"],
-            "cpuload_alerts": system_info["cpuload_data"],
-            "mem_alerts": system_info["mem_data"],
-            "swap_alerts": system_info["swap_data"],
-            "disks": system_info["disk_data"],
-            "iops": system_info["iops_data"],
-            "readwrite": system_info["readwrite_data"],
-            "disk_util": system_info["disk_util_data"]
-        }
-
-        if os_type == "linux":
-            linux_data = data
-        else:
-            windows_data = data
-
-    env = Environment(loader=FileSystemLoader('.'))
-    template = env.get_template('report.html')
-
-    rendered_html = template.render(
-        linux=linux_data,
-        windows=windows_data,
-        linux_disks=linux_data["disks"],
-        windows_disks=[]  # Windows 磁碟數據未提供
-    )
-
-    with open('report_output.html', 'w', encoding='utf-8') as f:
-        f.write(rendered_html)
-    print("HTML report generated: report_output.html")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from zabbix_report.cli import main
 
+# 相容原本的執行方式 python3 test2.py，等同 zabbix-report html
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(["html"] + sys.argv[1:])
@@ -0,0 +1,19 @@
+#!/bin/sh
+# 讀取 disk_stats_sampler.py 的快取：disk_stats_read.sh <裝置> <欄位> [最長秒數]
+# 快取的 time 超過最長秒數（預設 30 秒，取樣間隔 10 秒的 3 倍）表示取樣程式已停止或卡住，
+# 不輸出任何值，數值型 item 會顯示為不支援，而不是一直回報最後一次的數值
+
+CACHE_DIR=/run/zabbix/diskstats
+DEVICE="$1"
+FIELD="$2"
+MAX_AGE="${3:-30}"
+
+[ -r "$CACHE_DIR/$DEVICE" ] || exit 1
+awk -v field="$FIELD" -v now="$(date +%s)" -v max_age="$MAX_AGE" '
+    $1 == "time" { sampled = $2 }
+    $1 == field { value = $2; found = 1 }
+    END {
+        if (!found || sampled == "" || now - sampled > max_age) exit 1
+        print value
+    }
+' "$CACHE_DIR/$DEVICE"
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# 背景磁碟統計：每 INTERVAL 秒讀一次 /proc/diskstats，計算兩次之間的差值
+# 結果寫到 CACHE_DIR/<裝置>（每行 "名稱 值"），UserParameter 只要讀檔，不必再執行 iostat -dx 1 2 等待一秒
+# 裝置清單來自 mount_disk_find.sh（每 DISCOVERY_INTERVAL 秒重新查詢），也可以用 --devices 指定
+# 只使用標準函式庫（agent 主機上不需要安裝其他套件）
+#
+# 輸出欄位：
+#   util        忙碌時間百分比（與 iostat %util 相同）
+#   iops        每秒讀寫次數（read_iops + write_iops）
+#   readwrite   每秒讀寫 MB（read_mbps + write_mbps）
+#   time        取樣時間（epoch 秒）；disk_stats_read.sh 以此判斷快取是否過期（超過 3 × INTERVAL 不回傳數值）
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+
+DISKSTATS = "/proc/diskstats"
+CACHE_DIR = "/run/zabbix/diskstats"
+DISCOVERY_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mount_disk_find.sh")
+INTERVAL = 10              # 取樣間隔（秒）
+DISCOVERY_INTERVAL = 300   # 重新查詢裝置清單的間隔（秒）
+SECTOR_SIZE = 512          # /proc/diskstats 的 sector 固定為 512 bytes
+
+# /proc/diskstats 欄位（裝置名稱之後）的位置
+READS, SECTORS_READ, WRITES, SECTORS_WRITTEN, IO_TICKS = 0, 2, 4, 6, 9
+# 只檢查會用到的遞增計數器；第 8 欄（進行中的 I/O 數）是瞬間值，本來就會變小
+COUNTERS = (READS, SECTORS_READ, WRITES, SECTORS_WRITTEN, IO_TICKS)
+
+# 回傳 {裝置: [計數器, ...]}
+def read_diskstats(path=DISKSTATS):
+    stats = {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 14:
+                stats[fields[2]] = [int(value) for value in fields[3:14]]
+    return stats
+
+# mount_disk_find.sh 輸出 Zabbix LLD JSON，取出 {#DISK}
+def discover_devices(script=DISCOVERY_SCRIPT):
+    try:
+        output = subprocess.check_output([script], text=True, timeout=30)
+        return sorted({entry["{#DISK}"] for entry in json.loads(output)["data"]})
+    except (OSError, ValueError, KeyError, subprocess.SubprocessError) as e:
+        print(f"❌ 無法查詢磁碟清單：{e}", file=sys.stderr)
+        return None
+
+def rates(previous, current, elapsed):
+    # 計數器歸零或溢位（舊核心為 32 位元）時略過這一輪
+    delta = [now - before for now, before in zip(current, previous)]
+    if elapsed <= 0 or min(delta[field] for field in COUNTERS) < 0:
+        return None
+    read_iops = delta[READS] / elapsed
+    write_iops = delta[WRITES] / elapsed
+    read_mbps = delta[SECTORS_READ] * SECTOR_SIZE / elapsed / 1024 / 1024
+    write_mbps = delta[SECTORS_WRITTEN] * SECTOR_SIZE / elapsed / 1024 / 1024
+    return {
+        "util": min(delta[IO_TICKS] / (elapsed * 1000) * 100, 100.0),
+        "iops": read_iops + write_iops,
+        "read_iops": read_iops,
+        "write_iops": write_iops,
+        "readwrite": read_mbps + write_mbps,
+        "read_mbps": read_mbps,
+        "write_mbps": write_mbps
+    }
+
+def write_cache(cache_dir, device, values, sampled):
+    lines = [f"{name} {value:.2f}" for name, value in values.items()]
+    lines.append(f"time {int(sampled)}")
+    path = os.path.join(cache_dir, device)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+# 停止時刪除快取，避免 agent 讀到過期的數值（讀不到檔案時 item 會顯示為不支援）
+def clear_cache(cache_dir):
+    for name in os.listdir(cache_dir):
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except OSError:
+            pass
+
+def run(cache_dir, interval, devices=None, discovery_interval=DISCOVERY_INTERVAL):
+    os.makedirs(cache_dir, exist_ok=True)
+    selected = devices
+    discovered_at = None
+    previous = None
+    previous_time = None
+    while True:
+        now = time.monotonic()
+        if devices is None and (discovered_at is None or now - discovered_at >= discovery_interval):
+            found = discover_devices()
+            if found is not None:
+                selected = found
+                # 已經不存在的裝置，刪除舊的快取
+                for name in os.listdir(cache_dir):
+                    if name not in selected and not name.endswith(".tmp"):
+                        os.remove(os.path.join(cache_dir, name))
+            discovered_at = now
+
+        current = read_diskstats()
+        if previous is not None:
+            elapsed = now - previous_time
+            for device in selected or []:
+                if device not in current or device not in previous:
+                    continue
+                values = rates(previous[device], current[device], elapsed)
+                if values is not None:
+                    write_cache(cache_dir, device, values, time.time())
+        previous, previous_time = current, now
+        time.sleep(max(interval - (time.monotonic() - now), 0))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sample /proc/diskstats into a cache read by zabbix_agentd")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--interval", type=float, default=INTERVAL)
+    parser.add_argument("--devices", nargs="+", default=None, help="指定裝置（預設由 mount_disk_find.sh 查詢）")
+    args = parser.parse_args(argv)
+
+    def stop(signum, frame):
+        clear_cache(args.cache_dir)
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    run(args.cache_dir, args.interval, args.devices)
+
+if __name__ == "__main__":
+    main()
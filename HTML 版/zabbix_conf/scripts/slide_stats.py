@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# Cytomine 玻片統計（collect.slide.issue 使用）：總量、上個月、本月與成長率
+# 各月份（依 created）的玻片數存在狀態檔，並記住已統計到的最大 abstract_image.id
+# 每次查詢只計算 id 大於 checkpoint 的新資料（走主鍵索引），已結束的月份不再重新計算
+# 只有第一次執行、狀態檔版本不符或超過 REBUILD_INTERVAL 時才整張表重新分組計算一次（校正刪除的資料）
+# 月份邊界依目前日期決定，不再寫死日期
+# 只使用標準函式庫（agent 主機上不需要安裝其他套件）
+
+import argparse
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+
+STATE_VERSION = 1
+STATE_FILE = "/tmp/slide_stats_state.json"
+CONTAINER = "postgresql"
+DB_USER = "docker"
+DB_PASSWORD = "docker"
+REBUILD_INTERVAL = 7 * 24 * 3600   # 秒；0 表示只在沒有狀態檔時整表計算
+
+# created 為空的資料歸在 "unknown"，只計入總量
+MONTH_COUNTS_SQL = """
+SELECT COALESCE(to_char(created, 'YYYY-MM'), 'unknown'), COUNT(1), MAX(id)
+FROM abstract_image
+{where}
+GROUP BY 1;
+"""
+
+def empty_state():
+    return {"version": STATE_VERSION, "checkpoint": 0, "months": {}, "rebuilt": 0}
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return empty_state()
+
+def save_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def run_sql(sql, container, user, password):
+    command = ["docker", "exec", "-e", f"PGPASSWORD={password}", "-i", container,
+               "psql", "-h", "localhost", "-U", user, "-t", "-A", "-F", "|", "-c", sql]
+    return subprocess.check_output(command, text=True)
+
+# 回傳 ({月份: 數量}, 最大 id)
+def month_counts(output):
+    counts = {}
+    max_id = 0
+    for line in output.splitlines():
+        fields = line.strip().split("|")
+        if len(fields) != 3:
+            continue
+        month, count, row_max = fields
+        counts[month] = counts.get(month, 0) + int(count)
+        max_id = max(max_id, int(row_max or 0))
+    return counts, max_id
+
+def update(state, query, rebuild_interval):
+    now = int(time.time())
+    if not state["rebuilt"] or (rebuild_interval and now - state["rebuilt"] >= rebuild_interval):
+        counts, max_id = month_counts(query(MONTH_COUNTS_SQL.format(where="")))
+        state["months"] = counts
+        state["checkpoint"] = max_id
+        state["rebuilt"] = now
+        return
+
+    counts, max_id = month_counts(query(MONTH_COUNTS_SQL.format(where=f"WHERE id > {int(state['checkpoint'])}")))
+    # 新資料大多落在本月；匯入舊資料時也加到對應的月份
+    for month, count in counts.items():
+        state["months"][month] = state["months"].get(month, 0) + count
+    state["checkpoint"] = max(state["checkpoint"], max_id)
+
+# 本月與上個月的 "YYYY-MM"
+def month_bounds(now=None):
+    now = time.localtime(now)
+    this_month = f"{now.tm_year:04d}-{now.tm_mon:02d}"
+    if now.tm_mon == 1:
+        last_month = f"{now.tm_year - 1:04d}-12"
+    else:
+        last_month = f"{now.tm_year:04d}-{now.tm_mon - 1:02d}"
+    return last_month, this_month
+
+# 與原本 a.sh 的輸出相同：num / last / this / grow（上個月為 0 時 grow 為空）
+def report(state, now=None):
+    last_month, this_month = month_bounds(now)
+    last = state["months"].get(last_month, 0)
+    this = state["months"].get(this_month, 0)
+    grow = f"{(this - last) / last:.2f}" if last else ""
+    return [
+        f"num {sum(state['months'].values())}",
+        f"last {last}",
+        f"this {this}",
+        f"grow {grow}"
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cached monthly Cytomine slide statistics")
+    parser.add_argument("--container", default=CONTAINER)
+    parser.add_argument("--user", default=DB_USER)
+    parser.add_argument("--password", default=DB_PASSWORD)
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("--rebuild-interval", type=int, default=REBUILD_INTERVAL,
+                        help="整表重新計算的間隔（秒），0 表示不定期重算")
+    parser.add_argument("--rebuild", action="store_true", help="立即整表重新計算")
+    args = parser.parse_args(argv)
+
+    def query(sql):
+        return run_sql(sql, args.container, args.user, args.password)
+
+    # 同一時間只有一個程序更新狀態檔（agent 可能同時執行多次）
+    with open(f"{args.state}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = empty_state() if args.rebuild else load_state(args.state)
+        try:
+            update(state, query, args.rebuild_interval)
+        except (OSError, ValueError, subprocess.CalledProcessError) as e:
+            print(f"❌ 無法查詢玻片數量：{e}", file=sys.stderr)
+            return 1
+        save_state(args.state, state)
+
+    print("\n".join(report(state)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -55,50 +55,16 @@ else
 fi
 
 # === 取得登入紀錄並分析 ===
+# user_login_stats.py 只讀取上次之後新增的 log，各月各使用者的登入次數存在狀態檔
 echo "[3] 分析使用者登入紀錄..."
 mkdir -p "$LOGDIR"
-docker exec $CONTAINER_APP grep 'Success' /var/log/tomcat7/catalina.out | grep user > "$LOGDIR/user_login.log"
-
-# 統計登入 user:id 次數
-awk '{match($0, /user:[0-9]+/, arr); if (arr[0] != "") count[substr(arr[0],6)]++ }
-     END { for (id in count) print id, count[id] }' "$LOGDIR/user_login.log" > "$LOGDIR/user_count.log"
-
-# 轉換格式
-sed -i 's/ /,/g' "$LOGDIR/user_count.log"
 sed -i 's/ /_/g' "$ACCOUNT_FILE"
 
-# 合併帳號與統計數據
-total=$(awk -F',' '{sum += $2} END {print sum}' "$LOGDIR/user_count.log")
-
-awk -F', *' '
-NR==FNR { id = $1 + 0; accounts[id]=$2; names[id]=$3; next }
-{ id = $1 + 0; print ( id in accounts ? accounts[id] : "Unknown" ),
-( id in names ? names[id] : "Unknown" ), $2
-}' "$ACCOUNT_FILE" "$LOGDIR/user_count.log" > "$LOGDIR/user_login_num.log"
-
-# 排序前 11 名，加入表頭與統計期間
-sort -r -k3 "$LOGDIR/user_login_num.log" | head -n 11 > "$LOGDIR/user_login_num2.log"
-sed -i '1i User_ID Username Count' "$LOGDIR/user_login_num2.log"
-date_start=$(head -n 1 "$LOGDIR/user_login.log" | awk '{print $1 "_" $2}')
-date_to=$(tail -n 1 "$LOGDIR/user_login.log" | awk '{print $1 "_" $2}')
-period="$date_start ~ $date_to"
-sed -i "1i $period" "$LOGDIR/user_login_num2.log"
-
-# 顯示結果
 if [ "$OUTPUT_JSON" -eq 1 ]; then
-  echo "["
-  total_lines=$(($(wc -l < "$LOGDIR/user_login_num2.log") - 2))  # 扣掉 header 兩行
-  tail -n +3 "$LOGDIR/user_login_num2.log" | awk -v total="$total_lines" '
-    {
-      user_id = $1;
-      username = $2;
-      count = $3;
-      printf "  {\"User_ID\": \"%s\", \"Username\": \"%s\", \"Count\": %s}", user_id, username, count;
-      if (NR < total) print ","; else print ""
-    }
-  '
-  echo "]"
+  FORMAT=json
 else
-  echo "✅ 完成，總登入數：$total"
-  column -t "$LOGDIR/user_login_num2.log"
+  FORMAT=text
 fi
+python3 "$(dirname "$0")/user_login_stats.py" "$FORMAT" \
+  --container "$CONTAINER_APP" --log /var/log/tomcat7/catalina.out \
+  --state "$LOGDIR/user_login_state.json" --accounts "$ACCOUNT_FILE"
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# 增量統計 catalina.out 的登入紀錄（collect.userlogin.issue 使用）
+# 記住上次讀到的位置（byte offset）與 inode，每次只讀新增的部分；log 被輪替（inode 改變）或截斷時從頭讀
+# 每月每個使用者的登入次數存在狀態檔，查詢時直接從狀態檔產生前 N 名 JSON，不必每次掃描整個 log
+# 只使用標準函式庫（agent 主機上不需要安裝其他套件）
+
+import argparse
+import csv
+import fcntl
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+STATE_VERSION = 1
+STATE_FILE = "/tmp/user_login_state.json"
+LOG_FILE = "/var/log/tomcat7/catalina.out"
+CONTAINER = "core"
+READ_SIZE = 8 * 1024 * 1024
+TOP_N = 11  # 與原本 user_login_num.sh 的 head -n 11 相同
+
+SUCCESS = re.compile(rb"Success")
+USER_ID = re.compile(rb"user:([0-9]+)")
+MONTHS = {name: i + 1 for i, name in enumerate(
+    [b"Jan", b"Feb", b"Mar", b"Apr", b"May", b"Jun", b"Jul", b"Aug", b"Sep", b"Oct", b"Nov", b"Dec"])}
+# 2024-05-01 10:11:12 / 01-May-2024 10:11:12 / May 01, 2024 10:11:12 AM
+DATE_FORMATS = [
+    (re.compile(rb"^(\d{4})-(\d{2})-\d{2}"), lambda m: (int(m.group(1)), int(m.group(2)))),
+    (re.compile(rb"^\d{2}-([A-Z][a-z]{2})-(\d{4})"), lambda m: (int(m.group(2)), MONTHS.get(m.group(1)))),
+    (re.compile(rb"^([A-Z][a-z]{2}) \d{1,2}, (\d{4})"), lambda m: (int(m.group(2)), MONTHS.get(m.group(1))))
+]
+
+def empty_state():
+    return {"version": STATE_VERSION, "inode": None, "offset": 0, "months": {}, "first": None, "last": None}
+
+def load_state(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("version") == STATE_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return empty_state()
+
+def save_state(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, separators=(",", ":"))
+    os.replace(tmp_path, path)
+
+def line_month(line):
+    for pattern, parse in DATE_FORMATS:
+        match = pattern.match(line)
+        if match:
+            year, month = parse(match)
+            if month:
+                return f"{year:04d}-{month:02d}"
+    return "unknown"
+
+def line_time(line):
+    fields = line.split(None, 2)
+    return "_".join(field.decode("utf-8", "replace") for field in fields[:2])
+
+# 統計一段完整的行（bytes），只看含有 Success 與 user:<id> 的行（與原本 grep 'Success' | grep user 相同）
+def count_lines(data, state):
+    months = state["months"]
+    last_start = -1
+    for match in SUCCESS.finditer(data):
+        start = data.rfind(b"\n", 0, match.start()) + 1
+        if start == last_start:
+            continue
+        last_start = start
+        end = data.find(b"\n", match.end())
+        line = data[start:end if end >= 0 else len(data)]
+        user = USER_ID.search(line)
+        if user is None:
+            continue
+        counts = months.setdefault(line_month(line), {})
+        user_id = str(int(user.group(1)))
+        counts[user_id] = counts.get(user_id, 0) + 1
+        if state["first"] is None:
+            state["first"] = line_time(line)
+        state["last"] = line_time(line)
+
+# 從 offset 開始逐段讀取，只處理到最後一個換行為止，未完成的行留給下一次
+def consume(stream, state):
+    pending = b""
+    while True:
+        chunk = stream.read(READ_SIZE)
+        if not chunk:
+            break
+        data = pending + chunk
+        cut = data.rfind(b"\n") + 1
+        if cut:
+            count_lines(data[:cut], state)
+            state["offset"] += cut
+        pending = data[cut:]
+
+# (inode, size)；container 不為 None 時讀取容器內的檔案
+def stat_log(path, container):
+    if container is None:
+        st = os.stat(path)
+        return st.st_ino, st.st_size
+    output = subprocess.check_output(["docker", "exec", container, "stat", "-c", "%i %s", path], text=True)
+    inode, size = output.split()
+    return int(inode), int(size)
+
+def update(state, path, container):
+    inode, size = stat_log(path, container)
+    if inode != state["inode"] or size < state["offset"]:
+        # 輪替或截斷：從頭讀，已統計的月份保留
+        state["inode"] = inode
+        state["offset"] = 0
+    if size == state["offset"]:
+        return
+
+    if container is None:
+        with open(path, "rb") as stream:
+            stream.seek(state["offset"])
+            consume(stream, state)
+    else:
+        process = subprocess.Popen(["docker", "exec", container, "tail", "-c", f"+{state['offset'] + 1}", path],
+                                   stdout=subprocess.PIPE)
+        try:
+            consume(process.stdout, state)
+        finally:
+            process.stdout.close()
+            process.wait()
+        # docker exec / tail 失敗時讀到的內容不完整，不可儲存狀態（offset 維持上次的值）
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, process.args)
+
+# 帳號 CSV（id,username,user_name），名稱中的空白換成底線（與原本 sed 's/ /_/g' 相同）
+def load_accounts(path):
+    accounts = {}
+    if not path or not os.path.exists(path):
+        return accounts
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        for row in csv.reader(f):
+            if len(row) < 3 or not row[0].strip().isdigit():
+                continue
+            accounts[str(int(row[0]))] = (row[1].strip().replace(" ", "_"), row[2].strip().replace(" ", "_"))
+    return accounts
+
+# month 為 "all"、"current" 或 "YYYY-MM"
+def totals(state, month="all"):
+    if month == "current":
+        month = time.strftime("%Y-%m")
+    result = {}
+    for name, counts in state["months"].items():
+        if month != "all" and name != month:
+            continue
+        for user_id, count in counts.items():
+            result[user_id] = result.get(user_id, 0) + count
+    return result
+
+def top_users(state, accounts, month="all", top_n=TOP_N):
+    counts = totals(state, month)
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], int(item[0])))[:top_n]
+    users = []
+    for user_id, count in ranked:
+        username, name = accounts.get(user_id, ("Unknown", "Unknown"))
+        users.append({"User_ID": username, "Username": name, "Count": count})
+    return users, sum(counts.values())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental Cytomine login statistics from catalina.out")
+    parser.add_argument("output", nargs="?", choices=["json", "text"], default="text")
+    parser.add_argument("--log", default=LOG_FILE)
+    parser.add_argument("--container", default=CONTAINER, help="讀取容器內的 log；空字串表示直接讀取主機上的檔案")
+    parser.add_argument("--state", default=STATE_FILE)
+    parser.add_argument("--accounts", default=None, help="帳號 CSV（id,username,user_name）")
+    parser.add_argument("--month", default="all", help="all、current 或 YYYY-MM")
+    parser.add_argument("--top", type=int, default=TOP_N)
+    args = parser.parse_args(argv)
+
+    # 同一時間只有一個程序更新狀態檔（agent 可能同時執行多次）
+    with open(f"{args.state}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        state = load_state(args.state)
+        try:
+            update(state, args.log, args.container or None)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"❌ 無法讀取登入紀錄：{e}", file=sys.stderr)
+            return 1
+        save_state(args.state, state)
+
+    users, total = top_users(state, load_accounts(args.accounts), args.month, args.top)
+    if args.output == "json":
+        print(json.dumps(users, ensure_ascii=False, indent=2))
+    else:
+        print(f"✅ 完成，總登入數：{total}")
+        print(f"{state['first']} ~ {state['last']}")
+        print("User_ID Username Count")
+        for user in users:
+            print(f"{user['User_ID']} {user['Username']} {user['Count']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,245 @@
+# 報表的端對端效能測試：啟動 zabbix_stub.py 的合成 Zabbix，在子行程執行各報表並量測
+#   - 整體時間、CPU 時間與峰值 RSS（os.wait4 取得子行程的 rusage）
+#   - 各階段時間（報表以 --trace 寫出的 span 彙總：登入、item 索引、API 呼叫、歷史快取、統計、產生報表）
+# 每個報表先以空的快取執行一次（cold），再沿用快取執行一次（warm）；collect 之後從 snapshot 產生三種報表
+# 結果寫成 JSON，--compare 與之前的結果比較，變慢超過 --threshold 時標示出來
+#
+# python benchmarks/report_bench.py --hosts 20 --items 200 --days 7 --latency 20 --repeat 3 -o bench.json
+# python benchmarks/report_bench.py --compare bench.json -o bench-new.json
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB = os.path.join(ROOT, "benchmarks", "zabbix_stub.py")
+RESULT_VERSION = 1
+THRESHOLD = 0.10          # 比較時變慢超過 10% 視為退步
+PHASES_SHOWN = 8          # 比較時列出的階段數（依時間排序）
+
+# 情境名稱 → (zabbix-report 參數, 使用的狀態目錄)；同一個狀態目錄的情境依序執行，後面的沿用前面的快取
+SCENARIOS = [
+    ("pdf.cold", ["pdf"], "pdf"),
+    ("pdf.warm", ["pdf"], "pdf"),
+    ("html.cold", ["html"], "html"),
+    ("html.warm", ["html"], "html"),
+    ("xlsx.cold", ["xlsx", "--format", "csv.gz", "--output", "csv"], "xlsx"),
+    ("xlsx.warm", ["xlsx", "--format", "csv.gz", "--output", "csv"], "xlsx"),
+    ("collect", ["collect", "-o", "run.snapshot.npz"], "collect"),
+    ("render.pdf", ["pdf", "--snapshot", "run.snapshot.npz"], "collect"),
+    ("render.html", ["html", "--snapshot", "run.snapshot.npz"], "collect"),
+    ("render.xlsx", ["xlsx", "--format", "csv.gz", "--output", "csv", "--snapshot", "run.snapshot.npz"], "collect")
+]
+
+def start_stub(args):
+    command = [
+        sys.executable, STUB, "--hosts", str(args.hosts), "--items", str(args.items), "--days", str(args.days),
+        "--interval", str(args.interval), "--latency", str(args.latency), "--disks", str(args.disks), "--seed", str(args.seed)
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    line = process.stdout.readline().split()
+    if len(line) != 3 or line[0] != "ready":
+        process.kill()
+        raise RuntimeError("zabbix_stub.py did not start")
+    return process, int(line[1]), int(line[2])
+
+# 執行一個情境，回傳量測結果；stdout / stderr 寫到 state_dir 的 log
+def run_scenario(name, report_args, state_dir, env):
+    trace_path = os.path.join(state_dir, f"{name}.trace.json")
+    log_path = os.path.join(state_dir, f"{name}.log")
+    command = [sys.executable, "-m", "zabbix_report"] + report_args + ["--trace", trace_path]
+    start = time.perf_counter()
+    with open(log_path, "w") as log:
+        process = subprocess.Popen(command, cwd=state_dir, env=env, stdout=log, stderr=subprocess.STDOUT)
+        _, status, usage = os.wait4(process.pid, 0)
+    wall = time.perf_counter() - start
+    # 已由 os.wait4 回收，設定 returncode 讓 Popen 不再等待
+    process.returncode = returncode = os.waitstatus_to_exitcode(status)
+
+    result = {
+        "wall_seconds": wall,
+        "cpu_seconds": usage.ru_utime + usage.ru_stime,
+        "peak_rss_bytes": usage.ru_maxrss * 1024,    # Linux 的 ru_maxrss 單位為 KB
+        "returncode": returncode,
+        "phases": {}
+    }
+    try:
+        with open(trace_path, encoding="utf-8") as f:
+            trace = json.load(f)
+        result["phases"] = {
+            phase: {"seconds": values["seconds"], "count": values["count"], "rows": values["rows"], "bytes": values["bytes"]}
+            for phase, values in trace["phases"].items()
+        }
+    except (OSError, ValueError, KeyError):
+        pass
+    if returncode != 0:
+        print(f"❌ {name} exited with {returncode}, see {log_path}")
+    return result
+
+# 多次執行取中位數；api_calls 為所有 "api <method>" 階段的次數
+def aggregate(runs):
+    phases = {}
+    for run in runs:
+        for phase, values in run["phases"].items():
+            phases.setdefault(phase, []).append(values)
+    return {
+        "runs": len(runs),
+        "wall_seconds": round(statistics.median(run["wall_seconds"] for run in runs), 4),
+        "cpu_seconds": round(statistics.median(run["cpu_seconds"] for run in runs), 4),
+        "peak_rss_bytes": int(statistics.median(run["peak_rss_bytes"] for run in runs)),
+        "failed": sum(1 for run in runs if run["returncode"] != 0),
+        "api_calls": int(statistics.median(
+            sum(values["count"] for phase, values in run["phases"].items() if phase.startswith("api ")) for run in runs
+        )),
+        "phases": {
+            phase: {
+                "seconds": round(statistics.median(values["seconds"] for values in samples), 4),
+                "count": int(statistics.median(values["count"] for values in samples)),
+                "rows": int(statistics.median(values["rows"] for values in samples)),
+                "bytes": int(statistics.median(values["bytes"] for values in samples))
+            }
+            for phase, samples in phases.items()
+        },
+        "samples": [round(run["wall_seconds"], 4) for run in runs]
+    }
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--", "zabbix_report"], cwd=ROOT, text=True).strip())
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(args, selected):
+    stub, port, agent_port = start_stub(args)
+    work_dir = tempfile.mkdtemp(prefix="zabbix-report-bench-")
+    runs = {name: [] for name, _, _ in selected}
+    try:
+        for repeat in range(args.repeat):
+            state_dirs = {}
+            for name, report_args, state in selected:
+                # 每一輪重新建立狀態目錄，cold 情境一定從空的快取開始
+                if state not in state_dirs:
+                    state_dirs[state] = os.path.join(work_dir, f"{repeat}-{state}")
+                    os.makedirs(os.path.join(state_dirs[state], "csv"))
+                state_dir = state_dirs[state]
+                env = dict(
+                    os.environ,
+                    PYTHONPATH=os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")])),
+                    ZABBIX_URL=f"http://127.0.0.1:{port}/api_jsonrpc.php",
+                    ZABBIX_AGENT_HOST="127.0.0.1",
+                    ZABBIX_AGENT_PORT=str(agent_port),
+                    ZABBIX_TOKEN_CACHE=os.path.join(state_dir, "token.json"),
+                    ZABBIX_ITEM_INDEX=os.path.join(state_dir, "items.json"),
+                    ZABBIX_HISTORY_CACHE=os.path.join(state_dir, "history.sqlite3")
+                )
+                env.pop("ZABBIX_REPORT_TRACE", None)
+                env.pop("ZABBIX_REPORT_METRICS", None)
+                result = run_scenario(name, report_args, state_dir, env)
+                runs[name].append(result)
+                print(f"{name} #{repeat + 1}: {result['wall_seconds']:.2f}s, "
+                      f"peak RSS {result['peak_rss_bytes'] / 1024 / 1024:.1f} MB")
+    finally:
+        stub.terminate()
+        stub.wait()
+        if args.keep:
+            print(f"Work directory kept: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {name: aggregate(scenario_runs) for name, scenario_runs in runs.items()}
+
+def change(old, new):
+    return (new - old) / old if old else 0.0
+
+# 列出整體時間、峰值 RSS 與主要階段的變化；回傳退步的項目數
+def compare(baseline, results, threshold):
+    regressions = 0
+    print(f"Compare with {baseline.get('revision')} ({baseline.get('created')})")
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if previous is None:
+            continue
+        rows = [
+            ("wall", previous["wall_seconds"], current["wall_seconds"], "s"),
+            ("peak RSS", previous["peak_rss_bytes"] / 1024 / 1024, current["peak_rss_bytes"] / 1024 / 1024, "MB")
+        ]
+        slowest = sorted(current["phases"].items(), key=lambda entry: -entry[1]["seconds"])[:PHASES_SHOWN]
+        for phase, values in slowest:
+            if phase in previous["phases"]:
+                rows.append((phase, previous["phases"][phase]["seconds"], values["seconds"], "s"))
+        print(f"  {name}")
+        for label, old, new, unit in rows:
+            delta = change(old, new)
+            flag = ""
+            if delta > threshold and label in ("wall", "peak RSS"):
+                flag = "  ⚠️ regression"
+                regressions += 1
+            print(f"    {label:<32} {old:>10.3f} → {new:>10.3f} {unit:<2} {delta:+7.1%}{flag}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end report benchmarks against a synthetic Zabbix server")
+    parser.add_argument("--hosts", type=int, default=2)
+    parser.add_argument("--items", type=int, default=0, help="每台主機的 item 數")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--interval", type=int, default=60, help="歷史資料間隔（秒）")
+    parser.add_argument("--latency", type=float, default=0.0, help="每個 API 請求的延遲（毫秒）")
+    parser.add_argument("--disks", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--scenarios", default=None, help="逗號分隔，例如 html.cold,html.warm（預設全部）")
+    parser.add_argument("-o", "--output", default="report_bench.json")
+    parser.add_argument("--compare", default=None, help="之前的結果 JSON")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true", help="有退步時以 exit code 1 結束")
+    parser.add_argument("--keep", action="store_true", help="保留暫存目錄（報表、trace 與 log）")
+    args = parser.parse_args(argv)
+
+    selected = SCENARIOS
+    if args.scenarios:
+        names = args.scenarios.split(",")
+        unknown = [name for name in names if name not in {scenario[0] for scenario in SCENARIOS}]
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(unknown)}")
+        # warm 與 render 依賴同一個狀態目錄的第一個情境（cold 建立的快取、collect 寫出的 snapshot），一併執行
+        states = {state for name, _, state in SCENARIOS if name in names}
+        first = {}
+        for name, _, state in SCENARIOS:
+            first.setdefault(state, name)
+        selected = [scenario for scenario in SCENARIOS
+                    if scenario[0] in names or (scenario[2] in states and first[scenario[2]] == scenario[0])]
+
+    results = {
+        "version": RESULT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": {name: getattr(args, name) for name in ("hosts", "items", "days", "interval", "latency", "disks", "seed")},
+        "repeat": args.repeat,
+        "scenarios": run_suite(args, selected)
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Results saved: {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != results["params"]:
+            print(f"⚠️ parameters differ from the baseline: {baseline.get('params')}")
+        regressions = compare(baseline, results, args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
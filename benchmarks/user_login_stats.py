@@ -0,0 +1,157 @@
+# user_login_stats.py 的效能測試：產生數 GB 的合成 catalina.out，比較
+#   1. 原本的做法（每次 grep 整個 log 再統計）
+#   2. 第一次執行（完整掃描一次並建立狀態檔）
+#   3. 沒有新資料時的查詢
+#   4. 新增少量登入紀錄後的增量更新
+#   5. log 輪替後的更新
+# 每一步都檢查統計結果與產生資料時記錄的正確次數相同
+#
+# python benchmarks/user_login_stats.py --size-mb 2048
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                      "HTML 版", "zabbix_conf", "scripts", "user_login_stats.py")
+BLOCK_LINES = 20000
+USERS = 200
+
+def load_analyzer():
+    spec = importlib.util.spec_from_file_location("user_login_stats", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# 一個區塊約 2 MB：大部分是一般 log，約 3% 是登入成功紀錄；回傳 (bytes, {user_id: 次數})
+def make_block(rng, month, day_offset=0):
+    lines = []
+    counts = {}
+    for i in range(BLOCK_LINES):
+        stamp = f"{month}-{1 + (i + day_offset) % 28:02d} {i % 24:02d}:{i % 60:02d}:{(i * 7) % 60:02d},{i % 1000:03d}"
+        roll = rng.random()
+        if roll < 0.03:
+            user_id = rng.randint(1, USERS)
+            counts[str(user_id)] = counts.get(str(user_id), 0) + 1
+            lines.append(f"{stamp} [http-bio-8080-exec-{i % 50}] INFO  cytomine.LoginController  - Success login user:{user_id} from 10.0.{i % 255}.{rng.randint(1, 254)}")
+        elif roll < 0.04:
+            lines.append(f"{stamp} [http-bio-8080-exec-{i % 50}] WARN  cytomine.LoginController  - Failed login user:{rng.randint(1, USERS)} bad credentials")
+        elif roll < 0.05:
+            lines.append(f"{stamp} [quartz-{i % 10}] INFO  grails.app.jobs.CleanupJob  - Success cleanup of {rng.randint(1, 999)} sessions")
+        else:
+            lines.append(f"{stamp} [http-bio-8080-exec-{i % 50}] DEBUG org.hibernate.SQL  - select this_.id as id1_0_, this_.version as version1_0_ from image_instance this_ where this_.project_id={rng.randint(1, 9999)} limit {rng.randint(1, 100)}")
+    return ("\n".join(lines) + "\n").encode(), counts
+
+def merge(total, month, counts, times=1):
+    target = total.setdefault(month, {})
+    for user_id, count in counts.items():
+        target[user_id] = target.get(user_id, 0) + count * times
+
+# 寫出約 size_mb 的 log，依序分成 months 個月份
+def generate(path, size_mb, months, seed):
+    rng = random.Random(seed)
+    expected = {}
+    blocks = {month: make_block(rng, month) for month in months}
+    block_size = len(next(iter(blocks.values()))[0])
+    repeats = max(1, size_mb * 1024 * 1024 // block_size // len(months))
+    with open(path, "wb") as f:
+        for month in months:
+            data, counts = blocks[month]
+            for _ in range(repeats):
+                f.write(data)
+            merge(expected, month, counts, repeats)
+    return expected
+
+def run_analyzer(log_path, state_path):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, SCRIPT, "json", "--container", "", "--log", log_path, "--state", state_path],
+                   check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+# 原本 user_login_num.sh 的統計方式：grep 整個 log 後逐行統計
+def run_baseline(log_path):
+    start = time.perf_counter()
+    grep = subprocess.Popen(f"grep 'Success' '{log_path}' | grep user", shell=True, stdout=subprocess.PIPE)
+    counts = {}
+    analyzer = load_analyzer()
+    for line in grep.stdout:
+        match = analyzer.USER_ID.search(line)
+        if match:
+            counts[match.group(1)] = counts.get(match.group(1), 0) + 1
+    grep.wait()
+    return time.perf_counter() - start
+
+def check(state_path, expected, step):
+    with open(state_path, encoding="utf-8") as f:
+        months = json.load(f)["months"]
+    if months != expected:
+        raise SystemExit(f"{step}: counts differ from the generated log")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark user_login_stats.py on a synthetic catalina.out")
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--dir", default=None, help="暫存目錄（預設為系統暫存目錄）")
+    parser.add_argument("--skip-baseline", action="store_true")
+    parser.add_argument("--output", default=None, help="將結果另存為 JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="user_login_bench_", dir=args.dir)
+    log_path = os.path.join(workdir, "catalina.out")
+    state_path = os.path.join(workdir, "state.json")
+    months = [f"2025-{month:02d}" for month in range(1, args.months + 1)]
+    results = {"size_mb": args.size_mb}
+    try:
+        start = time.perf_counter()
+        expected = generate(log_path, args.size_mb, months, args.seed)
+        results["log_bytes"] = os.path.getsize(log_path)
+        print(f"generated {results['log_bytes'] / 1024 ** 2:.0f} MB in {time.perf_counter() - start:.1f}s")
+
+        if not args.skip_baseline:
+            results["baseline_full_scan_s"] = run_baseline(log_path)
+            print(f"grep full scan (every poll):  {results['baseline_full_scan_s']:.2f}s")
+
+        results["first_run_s"] = run_analyzer(log_path, state_path)
+        check(state_path, expected, "first run")
+        print(f"first run (full scan):        {results['first_run_s']:.2f}s "
+              f"({results['log_bytes'] / 1024 ** 2 / results['first_run_s']:.0f} MB/s)")
+
+        results["no_change_poll_s"] = run_analyzer(log_path, state_path)
+        check(state_path, expected, "no-change poll")
+        print(f"poll without new lines:       {results['no_change_poll_s'] * 1000:.0f} ms")
+
+        rng = random.Random(args.seed + 1)
+        data, counts = make_block(rng, months[-1], day_offset=7)
+        with open(log_path, "ab") as f:
+            f.write(data)
+        merge(expected, months[-1], counts)
+        results["incremental_poll_s"] = run_analyzer(log_path, state_path)
+        check(state_path, expected, "incremental poll")
+        print(f"poll after {BLOCK_LINES} new lines:  {results['incremental_poll_s'] * 1000:.0f} ms")
+
+        os.rename(log_path, log_path + ".1")
+        data, counts = make_block(rng, months[-1], day_offset=14)
+        with open(log_path, "wb") as f:
+            f.write(data)
+        merge(expected, months[-1], counts)
+        results["rotated_poll_s"] = run_analyzer(log_path, state_path)
+        check(state_path, expected, "rotated poll")
+        print(f"poll after log rotation:      {results['rotated_poll_s'] * 1000:.0f} ms")
+        print("counts match the generated log")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# 離線效能測試用的 Zabbix 替身：本機 JSON-RPC 伺服器與 agent 被動模式伺服器，只使用標準函式庫
+# 產生 N 台主機 × 每台 M 個 item × D 天、每 INTERVAL 秒一筆的合成歷史資料
+# 數值只由 (itemid, clock, seed) 決定，clock 對齊 INTERVAL 的整數倍，同樣的參數每次執行得到相同的資料
+#
+# 支援 user.login / user.logout / apiinfo.version / host.get / hostgroup.get / item.get（含 countOutput）/
+# history.get / trend.get；--latency 模擬 Zabbix 前端的回應時間
+#
+# python benchmarks/zabbix_stub.py --hosts 20 --items 200 --days 7 --interval 60 --latency 20
+# 啟動後印出 "ready <API 埠> <agent 埠>"，報表以環境變數連線：
+#   ZABBIX_URL=http://127.0.0.1:<API 埠>/api_jsonrpc.php ZABBIX_AGENT_HOST=127.0.0.1 ZABBIX_AGENT_PORT=<agent 埠>
+
+import argparse
+import json
+import math
+import socketserver
+import struct
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HOSTS = 2
+ITEMS = 0                 # 每台主機的 item 數；不足的部分以 custom.metric[n] 補齊，0 表示只有報表用到的 item
+DAYS = 7
+INTERVAL = 60             # 秒
+LATENCY = 0.0             # 毫秒
+DISKS = 3                 # 每台 Linux 主機的磁碟數（custom.iops / custom.readwrite / disk.util）
+MOUNTS = ["/", "/data", "/var/lib/docker"]
+GROUP_SIZE = 50           # hostgroup.get 每個群組的主機數
+TREND_PERIOD = 3600
+
+# 報表寫死的主機（html_report.HOST_IDS / pdf_report.HOST_ID），其餘主機的 hostid 從 EXTRA_HOSTID 開始
+FIXED_HOSTS = [("10644", "10.40.4.67", "linux"), ("10643", "Windows", "windows")]
+EXTRA_HOSTID = 20001
+
+# key 包含的字串 → (最小值, 最大值, value_type)；依序比對，第一個符合的為準
+PROFILES = [
+    ("[total]", 8 * 1024 ** 3, 8 * 1024 ** 3, 3),
+    (",total]", 200 * 1024 ** 3, 200 * 1024 ** 3, 3),
+    (",used]", 20 * 1024 ** 3, 180 * 1024 ** 3, 3),
+    ("net.if.", 0, 5000000, 3),
+    ("system.cpu.load", 0, 8, 0),
+    ("custom.iops", 0, 1500, 0),
+    ("custom.readwrite", 0, 150, 0),
+    ("", 0, 100, 0)
+]
+LAST_VALUES = {
+    "system.sw.os": "Linux version 5.15.0-91-generic #101~20.04.1-Ubuntu",
+    "system.uname": "Windows DESKTOP-O975H1S 10.0.19045 Microsoft Windows 10 Pro x64",
+    "system.cpu.num": "4",
+    "wmi.get[root/cimv2,\"Select NumberOfLogicalProcessors from Win32_ComputerSystem\"]": "8"
+}
+CHAR_KEYS = {"system.sw.os", "system.uname"}
+
+# agent 自訂 key 的固定回應
+AGENT_VALUES = {
+    "collect.slide.issue": "num 152340\nlast 4820\nthis 5213\ngrow 0.08",
+    "collect.userlogin.issue": json.dumps([
+        {"User_ID": f"U{n:04d}", "Username": f"user{n}", "Count": 40 - n} for n in range(20)
+    ]),
+    "agent.ping": "1"
+}
+AGENT_HEADER = struct.Struct("<4sBII")
+
+def linux_keys(disks, mounts):
+    keys = [
+        "system.cpu.util", "system.cpu.load[all,avg1]", "vm.memory.size[total]", "vm.memory.size[pavailable]",
+        "system.swap.size[,pfree]", "system.sw.os", "system.cpu.num", "system.uname",
+        'net.if.in["ens160"]', 'net.if.out["ens160"]'
+    ]
+    for mount in mounts:
+        keys.extend([f"vfs.fs.size[{mount},used]", f"vfs.fs.size[{mount},pused]", f"vfs.fs.size[{mount},total]"])
+    for n in range(disks):
+        keys.extend([f"custom.iops[dm-{n}]", f"custom.readwrite[dm-{n}]", f"disk.util[dm-{n}]"])
+    return keys
+
+def windows_keys():
+    return [
+        "system.cpu.util", "system.cpu.load[all,avg1]", "vm.memory.size[total]", "vm.memory.size[pavailable]",
+        "system.swap.size[,pfree]", "system.uname",
+        "wmi.get[root/cimv2,\"Select NumberOfLogicalProcessors from Win32_ComputerSystem\"]"
+    ]
+
+def profile(key):
+    for needle, low, high, value_type in PROFILES:
+        if needle in key:
+            return low, high, value_type
+
+class Fleet:
+    def __init__(self, hosts=HOSTS, items=ITEMS, days=DAYS, interval=INTERVAL, disks=DISKS, mounts=MOUNTS, seed=0):
+        self.days = days
+        self.interval = interval
+        self.seed = seed
+        self.hosts = []       # [{"hostid", "host", "name", "os"}]
+        self.items = []
+        self.by_itemid = {}   # itemid -> (最小值, 最大值, value_type, 相位)
+
+        for n in range(hosts):
+            if n < len(FIXED_HOSTS):
+                hostid, name, os_type = FIXED_HOSTS[n]
+            else:
+                hostid, name, os_type = str(EXTRA_HOSTID + n), f"host-{n:04d}", "linux" if n % 4 else "windows"
+            self.hosts.append({"hostid": hostid, "host": name, "name": name, "os": os_type})
+            keys = linux_keys(disks, mounts) if os_type == "linux" else windows_keys()
+            keys.extend(f"custom.metric[{m}]" for m in range(max(items - len(keys), 0)))
+            for m, key in enumerate(keys):
+                itemid = str(100000 + n * 10000 + m) if m < 10000 else f"{n}{m:06d}"
+                low, high, value_type = profile(key)
+                if key in CHAR_KEYS:
+                    value_type = 1
+                self.items.append({
+                    "itemid": itemid, "hostid": hostid, "key_": key, "name": key, "value_type": str(value_type),
+                    "lastvalue": LAST_VALUES.get(key, str(int(high) if value_type == 3 else round((low + high) / 2, 4)))
+                })
+                self.by_itemid[itemid] = (low, high, value_type, zlib.crc32(f"{seed}:{itemid}".encode()) % 628 / 100)
+
+    # 一天一個週期的正弦波加上雜訊，偶爾超過報表的閾值
+    def value(self, itemid, clock):
+        low, high, value_type, phase = self.by_itemid.get(itemid) or (0, 100, 0, int(itemid) % 628 / 100)
+        if low == high:
+            return low, value_type
+        noise = zlib.crc32(f"{self.seed}:{itemid}:{clock}".encode()) % 2000 / 10000 - 0.1
+        ratio = min(max(0.45 + 0.4 * math.sin(clock * 2 * math.pi / 86400 + phase) + noise, 0.0), 1.0)
+        return low + (high - low) * ratio, value_type
+
+    def clocks(self, time_from, time_till):
+        now = int(time.time())
+        time_from = max(int(time_from) if time_from is not None else 0, now - self.days * 86400)
+        time_till = min(int(time_till) if time_till is not None else now, now)
+        start = -(-time_from // self.interval) * self.interval
+        return range(start, time_till + 1, self.interval)
+
+    def history(self, params):
+        itemids = as_list(params.get("itemids"))
+        clocks = self.clocks(params.get("time_from"), params.get("time_till"))
+        descending = params.get("sortorder") == "DESC"
+        limit = int(params["limit"]) if params.get("limit") else None
+        if descending:
+            clocks = reversed(clocks)
+        rows = []
+        for clock in clocks:
+            for itemid in itemids:
+                value, value_type = self.value(itemid, clock)
+                rows.append({"itemid": itemid, "clock": str(clock),
+                             "value": str(int(value)) if value_type == 3 else f"{value:.4f}", "ns": "0"})
+            if limit is not None and len(rows) >= limit:
+                return rows[:limit]
+        return rows
+
+    # 每小時的 min / avg / max 由同一組 history 計算，與 history.get 一致
+    def trends(self, params):
+        itemids = as_list(params.get("itemids"))
+        clocks = self.clocks(params.get("time_from"), params.get("time_till"))
+        hours = range(-(-clocks.start // TREND_PERIOD) * TREND_PERIOD, clocks.stop, TREND_PERIOD)
+        rows = []
+        for hour in hours:
+            for itemid in itemids:
+                values = [self.value(itemid, clock)[0] for clock in range(hour, hour + TREND_PERIOD, self.interval)]
+                rows.append({
+                    "itemid": itemid, "clock": str(hour), "num": str(len(values)),
+                    "value_min": f"{min(values):.4f}", "value_avg": f"{sum(values) / len(values):.4f}",
+                    "value_max": f"{max(values):.4f}"
+                })
+        return rows
+
+    def item_get(self, params):
+        hostids = set(as_list(params.get("hostids")))
+        itemids = set(as_list(params.get("itemids")))
+        keys = set(as_list((params.get("filter") or {}).get("key_")))
+        search = (params.get("search") or {}).get("key_")
+        found = [
+            item for item in self.items
+            if (not hostids or item["hostid"] in hostids) and (not itemids or item["itemid"] in itemids)
+            and (not keys or item["key_"] in keys) and (not search or search in item["key_"])
+        ]
+        if params.get("countOutput"):
+            return str(len(found))
+        return [dict(item) for item in found]
+
+    def host_get(self, params):
+        hostids = set(as_list(params.get("hostids")))
+        groupids = set(as_list(params.get("groupids")))
+        hosts = []
+        for n, host in enumerate(self.hosts):
+            if (hostids and host["hostid"] not in hostids) or (groupids and str(n // GROUP_SIZE + 1) not in groupids):
+                continue
+            entry = {"hostid": host["hostid"], "host": host["host"], "name": host["name"]}
+            if params.get("selectInterfaces"):
+                entry["interfaces"] = [{"ip": f"10.0.{n // 250}.{n % 250 + 1}", "type": "1", "main": "1"}]
+            hosts.append(entry)
+        return hosts
+
+    def hostgroup_get(self, params):
+        groups = []
+        for start in range(0, len(self.hosts), GROUP_SIZE):
+            groupid = str(start // GROUP_SIZE + 1)
+            group = {"groupid": groupid, "name": f"Benchmark group {groupid}"}
+            if params.get("selectHosts"):
+                group["hosts"] = [{"hostid": host["hostid"], "name": host["name"]} for host in self.hosts[start:start + GROUP_SIZE]]
+            groups.append(group)
+        filter_names = set(as_list((params.get("filter") or {}).get("name")))
+        return [group for group in groups if not filter_names or group["name"] in filter_names]
+
+    def call(self, method, params):
+        if method == "user.login":
+            return "benchmark-token"
+        if method == "user.logout":
+            return True
+        if method == "apiinfo.version":
+            return "6.0.0"
+        if method == "host.get":
+            return self.host_get(params)
+        if method == "hostgroup.get":
+            return self.hostgroup_get(params)
+        if method == "item.get":
+            return self.item_get(params)
+        if method == "history.get":
+            return self.history(params)
+        if method == "trend.get":
+            return self.trends(params)
+        raise KeyError(method)
+
+def as_list(value):
+    if value is None:
+        return []
+    return [str(v) for v in value] if isinstance(value, list) else [str(value)]
+
+def make_handler(fleet, latency, counts, lock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"    # keep-alive，與正式環境的 Zabbix 前端相同
+        wbufsize = -1                    # header 與 body 一起送出
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            method = request.get("method")
+            with lock:
+                counts[method] = counts.get(method, 0) + 1
+            if latency:
+                time.sleep(latency / 1000)
+            try:
+                response = {"jsonrpc": "2.0", "result": fleet.call(method, request.get("params") or {}), "id": request.get("id")}
+            except KeyError:
+                response = {"jsonrpc": "2.0", "error": {"code": -32601, "message": "Method not found.",
+                                                        "data": f'Incorrect method "{method}".'}, "id": request.get("id")}
+            body = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            self.wfile.flush()
+
+    return Handler
+
+class AgentHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        header = self.request.recv(AGENT_HEADER.size)
+        if len(header) < AGENT_HEADER.size:
+            return
+        _, _, length, _ = AGENT_HEADER.unpack(header)
+        data = b""
+        while len(data) < length:
+            chunk = self.request.recv(length - len(data))
+            if not chunk:
+                return
+            data += chunk
+        key = data.decode("utf-8", errors="replace")
+        value = AGENT_VALUES.get(key, "ZBX_NOTSUPPORTED\0Unsupported item key.")
+        payload = value.encode("utf-8")
+        self.request.sendall(AGENT_HEADER.pack(b"ZBXD", 0x01, len(payload), 0) + payload)
+
+class AgentServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def start(fleet, port=0, agent_port=0, latency=LATENCY):
+    counts = {}
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(fleet, latency, counts, threading.Lock()))
+    server.daemon_threads = True
+    server.counts = counts
+    agent_server = AgentServer(("127.0.0.1", agent_port), AgentHandler)
+    for target in (server.serve_forever, agent_server.serve_forever):
+        threading.Thread(target=target, daemon=True).start()
+    return server, agent_server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic Zabbix JSON-RPC and agent server for offline benchmarks")
+    parser.add_argument("--hosts", type=int, default=HOSTS)
+    parser.add_argument("--items", type=int, default=ITEMS, help="每台主機的 item 數（以 custom.metric[n] 補齊）")
+    parser.add_argument("--days", type=int, default=DAYS, help="保留的歷史天數")
+    parser.add_argument("--interval", type=int, default=INTERVAL, help="歷史資料間隔（秒）")
+    parser.add_argument("--latency", type=float, default=LATENCY, help="每個請求的回應延遲（毫秒）")
+    parser.add_argument("--disks", type=int, default=DISKS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=0, help="0 表示自動選擇")
+    parser.add_argument("--agent-port", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    fleet = Fleet(args.hosts, args.items, args.days, args.interval, args.disks, seed=args.seed)
+    server, agent_server = start(fleet, args.port, args.agent_port, args.latency)
+    print(f"ready {server.server_address[1]} {agent_server.server_address[1]}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.counts, sort_keys=True), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+from zabbix_report import agent
+
+# 以本機 socket server 模擬 Zabbix agent 被動模式的回應
+
+def agent_server(reply):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    received = []
+
+    def serve():
+        conn, _ = server.accept()
+        with conn:
+            header = conn.recv(agent.HEADER.size)
+            _, _, length, _ = agent.HEADER.unpack(header)
+            data = b""
+            while len(data) < length:
+                data += conn.recv(length - len(data))
+            received.append(data.decode("utf-8"))
+            conn.sendall(reply)
+        server.close()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    return server.getsockname()[1], received, thread
+
+def test_get_returns_value():
+    port, received, thread = agent_server(agent.pack(b"12.5"))
+    assert agent.get("127.0.0.1", "system.cpu.load[all,avg1]", port=port, timeout=2) == "12.5"
+    thread.join(2)
+    assert received == ["system.cpu.load[all,avg1]"]
+
+def test_get_not_supported():
+    port, _, thread = agent_server(agent.pack(b"ZBX_NOTSUPPORTED\0Unsupported item key."))
+    with pytest.raises(agent.AgentNotSupported) as excinfo:
+        agent.get("127.0.0.1", "no.such.key", port=port, timeout=2)
+    thread.join(2)
+    assert excinfo.value.message == "Unsupported item key."
+
+def test_get_truncated_reply():
+    # 標頭宣告 100 bytes，實際只送 5 bytes 就關閉連線
+    reply = struct.pack("<4sBII", b"ZBXD", agent.FLAG_PROTOCOL, 100, 0) + b"12345"
+    port, _, thread = agent_server(reply)
+    with pytest.raises(agent.AgentProtocolError) as excinfo:
+        agent.get("127.0.0.1", "vfs.fs.size[/,pused]", port=port, timeout=2)
+    thread.join(2)
+    assert "truncated response (5/100 bytes)" in excinfo.value.message
+
+def test_get_connection_refused():
+    # 取得一個空閒的 port 後關閉，連線會被拒絕
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    with pytest.raises(agent.AgentUnavailable):
+        agent.get("127.0.0.1", "agent.ping", port=port, timeout=2)
+
+def test_get_many_collects_errors():
+    port, _, thread = agent_server(agent.pack(b"ZBX_NOTSUPPORTED\0Unsupported item key."))
+    results = agent.get_many([("127.0.0.1", "no.such.key")], port=port, timeout=2)
+    thread.join(2)
+    assert isinstance(results[("127.0.0.1", "no.such.key")], agent.AgentNotSupported)
@@ -0,0 +1,137 @@
+import pytest
+
+from zabbix_report import history_cache as history_cache_module
+from zabbix_report.history_cache import HistoryCache
+
+# 以假的 history.get 檢查快取只抓缺少的部分、checkpoint 的推進與清除
+
+NOW = 1700000000
+DAY = 24 * 3600
+
+class FakeHistory:
+    def __init__(self, points):
+        self.points = points    # itemid -> [clock, ...]，值等於 clock
+        self.calls = []
+        self.rows = 0           # 回傳的總筆數
+
+    def fetch(self, itemids, value_type, time_from, time_till, sortorder="ASC", limit=None):
+        self.calls.append((tuple(itemids), time_from, time_till, sortorder, limit))
+        rows = [
+            (clock, itemid) for itemid in itemids for clock in self.points.get(itemid, [])
+            if (time_from is None or clock >= time_from) and (time_till is None or clock <= time_till)
+        ]
+        rows.sort(reverse=sortorder == "DESC")
+        if limit is not None:
+            rows = rows[:limit]
+        self.rows += len(rows)
+        return [{"itemid": itemid, "clock": str(clock), "ns": "0", "value": str(clock)} for clock, itemid in rows]
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOW]
+    monkeypatch.setattr(history_cache_module.time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    cache = HistoryCache(str(tmp_path / "history.sqlite3"))
+    yield cache
+    cache.close()
+
+def cached_clocks(cache, itemid, time_from=0, time_till=NOW * 2):
+    return [int(clock) for clocks, _ in cache.iter_rows(itemid, time_from, time_till) for clock in clocks]
+
+def test_second_run_fetches_only_the_delta(cache, clock):
+    fake = FakeHistory({"1": list(range(NOW - DAY, NOW + 1, 60))})
+    cache.update(fake.fetch, ["1"], 0, NOW - DAY, NOW)
+    assert cache.checkpoint("1", 0) == (NOW - DAY, NOW - cache.settle)
+
+    # 一小時後：只向 Zabbix 要上次尚未穩定的 5 分鐘與新的一小時
+    clock[0] = NOW + 3600
+    fake.points["1"] = list(range(NOW - DAY, NOW + 3601, 60))
+    fake.calls = []
+    cache.update(fake.fetch, ["1"], 0, NOW + 3600 - DAY, NOW + 3600)
+    assert min(call[1] for call in fake.calls) == NOW - cache.settle + 1
+    assert max(call[2] for call in fake.calls) == NOW + 3600
+    assert cache.checkpoint("1", 0) == (NOW - DAY, NOW + 3600 - cache.settle)
+    assert cached_clocks(cache, "1", NOW + 3600 - DAY, NOW + 3600) == list(range(NOW + 3600 - DAY, NOW + 3601, 60))
+
+def test_checkpoint_advances_over_empty_windows(cache):
+    # 沒有資料的項目也要推進 checkpoint，下次不再重抓同一段
+    fake = FakeHistory({"1": []})
+    cache.update(fake.fetch, ["1"], 0, NOW - DAY, NOW - 600)
+    assert fake.calls
+    assert cache.checkpoint("1", 0) == (NOW - DAY, NOW - 600)
+
+    fake.calls = []
+    cache.update(fake.fetch, ["1"], 0, NOW - DAY, NOW - 600)
+    assert fake.calls == []
+
+def test_interrupted_update_keeps_fetched_windows(cache):
+    fake = FakeHistory({"1": list(range(NOW - DAY, NOW + 1, 60))})
+
+    def failing_fetch(itemids, value_type, time_from, time_till, sortorder="ASC", limit=None):
+        if len(fake.calls) == 1:
+            raise RuntimeError("connection lost")
+        return fake.fetch(itemids, value_type, time_from, time_till, sortorder, limit)
+
+    with pytest.raises(RuntimeError):
+        cache.update(failing_fetch, ["1"], 0, NOW - DAY, NOW)
+    # 第二段失敗：已寫入的第一段保留，checkpoint 推進到第一段結尾
+    first_end = fake.calls[0][2]
+    assert first_end < NOW
+    assert cache.checkpoint("1", 0) == (NOW - DAY, first_end)
+
+    fake.calls = []
+    cache.update(fake.fetch, ["1"], 0, NOW - DAY, NOW)
+    assert fake.calls[0][1] == first_end + 1
+    assert cached_clocks(cache, "1") == list(range(NOW - DAY, NOW + 1, 60))
+
+def test_backward_window_joins_only_when_complete():
+    cp = (1000, 2000)
+    # 往前補的範圍抓到一半：不能推進（中間還有缺口）
+    assert HistoryCache.advance(cp, 500, 999, 700, 5000) == cp
+    # 整段抓完：與原本的範圍相接
+    assert HistoryCache.advance(cp, 500, 999, 999, 5000) == (500, 2000)
+    # 往後補的範圍：每段都推進，但不超過尚未穩定的時間
+    assert HistoryCache.advance(cp, 2001, 4000, 3000, 5000) == (1000, 3000)
+    assert HistoryCache.advance(cp, 2001, 4000, 4000, 3500) == (1000, 3500)
+    # 新的項目沒有資料時也推進
+    assert HistoryCache.advance(None, 500, 999, 999, 5000) == (500, 999)
+
+def test_update_latest_fetches_only_new_rows(cache, clock):
+    fake = FakeHistory({"1": list(range(NOW - 10 * DAY, NOW + 1, 60))})
+    assert [row[0] for row in cache.latest(fake.fetch, "1", 0, 100)] == list(range(NOW, NOW - 100 * 60, -60))
+    assert fake.calls == [(("1",), None, None, "DESC", 100)]
+
+    clock[0] = NOW + 3600
+    fake.points["1"] = list(range(NOW - 10 * DAY, NOW + 3601, 60))
+    fake.calls = []
+    fake.rows = 0
+    latest = cache.latest(fake.fetch, "1", 0, 100)
+    assert [row[0] for row in latest] == list(range(NOW + 3600, NOW + 3600 - 100 * 60, -60))
+    assert all(call[1] is not None and call[1] >= NOW - cache.settle + 1 for call in fake.calls)
+    assert fake.rows == len(range(NOW - cache.settle + 60, NOW + 3601, 60))
+
+def test_evict_keeps_latest_rows_beyond_retention(tmp_path, clock):
+    cache = HistoryCache(str(tmp_path / "history.sqlite3"), retention=2 * DAY)
+    old = list(range(NOW - 5 * DAY, NOW - 4 * DAY, 3600))
+    fake = FakeHistory({"latest": old, "ranged": old})
+    cache.latest(fake.fetch, "latest", 0, 10)
+    cache.update(fake.fetch, ["ranged"], 0, NOW - 5 * DAY, NOW - 4 * DAY)
+
+    cache.evict(NOW)
+    # 依時間範圍的項目整段清除，checkpoint 跟著移到保留期限
+    assert cached_clocks(cache, "ranged") == []
+    assert cache.checkpoint("ranged", 0)[0] == NOW - 2 * DAY
+    # 最新 N 筆的項目即使超過保留期限也留下最新 10 筆，下次不必重抓
+    assert cached_clocks(cache, "latest") == old[-10:]
+    fake.rows = 0
+    cache.latest(fake.fetch, "latest", 0, 10)
+    assert fake.rows == 0
+
+    # 超過保留期限沒有再讀取的最新 N 筆項目，改回依時間清除
+    clock[0] = NOW + 3 * DAY
+    cache.evict(NOW + 3 * DAY)
+    assert cached_clocks(cache, "latest") == []
+    cache.close()
@@ -0,0 +1,81 @@
+import pytest
+
+pytest.importorskip("reportlab")
+
+from zabbix_report import pdf_report
+from zabbix_report.resolution import TREND_AFTER
+
+# 30 天的報表：較舊的部分走 trend.get，峰值與超標次數要以每小時的 max（反向閾值為 min）計算
+
+NOW = 1700000040                 # 整分鐘，與每分鐘一筆的資料對齊
+DAYS = 30
+ITEMID = "100"
+SPIKE = NOW - 20 * 24 * 3600     # 只持續一分鐘的峰值，落在 trend 的範圍內
+DIP = NOW - 15 * 24 * 3600
+
+def value_at(clock):
+    if clock == SPIKE:
+        return 100.0
+    if clock == DIP:
+        return 1.0
+    return 10.0
+
+class FakeZabbix:
+    def __init__(self):
+        self.methods = []
+
+    def request(self, method, params):
+        self.methods.append(method)
+        if method == "item.get":
+            return [{"itemid": ITEMID, "key_": "system.cpu.util", "value_type": "0"}]
+        if method == "history.get":
+            start = -(-params["time_from"] // 60) * 60
+            return [
+                {"itemid": ITEMID, "clock": str(clock), "ns": "0", "value": str(value_at(clock))}
+                for clock in range(start, params["time_till"] + 1, 60)
+            ][:params.get("limit")]
+        if method == "trend.get":
+            rows = []
+            for hour in range(params["time_from"] // 3600 * 3600, params["time_till"] + 1, 3600):
+                values = [value_at(clock) for clock in range(hour, hour + 3600, 60)]
+                rows.append({"itemid": ITEMID, "clock": str(hour), "num": str(len(values)),
+                             "value_min": str(min(values)), "value_avg": str(sum(values) / len(values)),
+                             "value_max": str(max(values))})
+            return rows
+        raise KeyError(method)
+
+@pytest.fixture
+def store(monkeypatch):
+    fake = FakeZabbix()
+    monkeypatch.setattr(pdf_report, "zabbix_api_request", fake.request)
+    return pdf_report.HistoryStore(), fake
+
+def test_report_window_goes_through_trend():
+    assert DAYS * 24 * 3600 > TREND_AFTER
+
+def test_trend_stats_keep_peaks(store):
+    history_store, fake = store
+    time_from, time_till = NOW - DAYS * 24 * 3600, NOW
+    stats = history_store.stats("1", "system.cpu.util", 0, time_from, time_till, 50, anomaly_threshold=50)
+    assert "trend.get" in fake.methods
+    assert stats["max"] == 100.0
+    assert stats["min"] == 1.0
+    assert stats["violations"] == 1
+    assert 9.5 < stats["avg"] < 10.5
+
+    # 每小時的 avg 會把一分鐘的峰值抹平（舊的行為）
+    average = history_store.get("1", "system.cpu.util", 0, time_from, time_till, agg="avg")
+    assert average.values.max() < 12
+
+def test_trend_stats_inverted_threshold(store):
+    history_store, _ = store
+    stats = history_store.stats("1", "system.cpu.util", 0, NOW - DAYS * 24 * 3600, NOW, 5, invert=True)
+    assert stats["min"] == 1.0
+    assert stats["max"] == 100.0
+    assert stats["violations"] == 1
+
+def test_short_window_uses_raw_history(store):
+    history_store, fake = store
+    stats = history_store.stats("1", "system.cpu.util", 0, NOW - 7 * 24 * 3600, NOW, 50)
+    assert "trend.get" not in fake.methods
+    assert stats["max"] == 10.0
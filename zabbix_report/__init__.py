@@ -0,0 +1 @@
+# 三種報表（PDF / HTML / Excel）共用的 Zabbix 收集與計算程式
@@ -0,0 +1,102 @@
+import socket
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Zabbix agent 被動模式（passive check）的用戶端，取代 zabbix_get 子行程
+# 封包格式："ZBXD" + flags (1 byte) + 資料長度 (4 bytes LE) + 保留欄位 (4 bytes LE，壓縮時為原始長度) + 資料
+# 不支援的 key 回傳 "ZBX_NOTSUPPORTED\0錯誤訊息"
+
+AGENT_PORT = 10050
+AGENT_TIMEOUT = 5          # 每個 key 的連線 + 讀取逾時（秒）
+AGENT_CONCURRENCY = 16     # get_many 同時查詢的數量
+MAX_RESPONSE = 128 * 1024 * 1024
+
+HEADER = struct.Struct("<4sBII")
+FLAG_PROTOCOL = 0x01
+FLAG_COMPRESSED = 0x02
+NOT_SUPPORTED = "ZBX_NOTSUPPORTED"
+
+class AgentError(Exception):
+    def __init__(self, host, key, message):
+        super().__init__(f"{host} {key}: {message}")
+        self.host = host
+        self.key = key
+        self.message = message
+
+    def to_dict(self):
+        return {"host": self.host, "key": self.key, "error": type(self).__name__, "message": self.message}
+
+# 連線失敗或逾時
+class AgentUnavailable(AgentError):
+    pass
+
+# agent 回傳 ZBX_NOTSUPPORTED
+class AgentNotSupported(AgentError):
+    pass
+
+# 回應不是合法的 ZBXD 封包
+class AgentProtocolError(AgentError):
+    pass
+
+def pack(data):
+    return HEADER.pack(b"ZBXD", FLAG_PROTOCOL, len(data), 0) + data
+
+def recv_exactly(sock, size):
+    chunks = []
+    while size > 0:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks), size
+
+def get(host, key, port=AGENT_PORT, timeout=AGENT_TIMEOUT):
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.settimeout(timeout)
+            sock.sendall(pack(key.encode("utf-8")))
+            header, missing = recv_exactly(sock, HEADER.size)
+            if missing:
+                raise AgentProtocolError(host, key, "connection closed before a complete header")
+            signature, flags, length, reserved = HEADER.unpack(header)
+            if signature != b"ZBXD" or not flags & FLAG_PROTOCOL:
+                raise AgentProtocolError(host, key, f"invalid header {header!r}")
+            if length > MAX_RESPONSE:
+                raise AgentProtocolError(host, key, f"response too large ({length} bytes)")
+            data, missing = recv_exactly(sock, length)
+            if missing:
+                raise AgentProtocolError(host, key, f"truncated response ({length - missing}/{length} bytes)")
+    except socket.timeout:
+        raise AgentUnavailable(host, key, f"timed out after {timeout}s")
+    except OSError as e:
+        raise AgentUnavailable(host, key, str(e))
+
+    if flags & FLAG_COMPRESSED:
+        try:
+            data = zlib.decompress(data)
+        except zlib.error as e:
+            raise AgentProtocolError(host, key, f"invalid compressed data: {e}")
+    value = data.decode("utf-8", errors="replace")
+    if value.startswith(NOT_SUPPORTED):
+        raise AgentNotSupported(host, key, value[len(NOT_SUPPORTED):].strip("\0").strip() or "not supported")
+    return value
+
+# queries 為 [(host, key), ...]，同時查詢；回傳 {(host, key): 值或 AgentError}
+# timeouts 可依 key 指定逾時，例如執行較久的自訂腳本
+def get_many(queries, port=AGENT_PORT, timeout=AGENT_TIMEOUT, max_workers=AGENT_CONCURRENCY, timeouts=None):
+    timeouts = timeouts or {}
+
+    def query(host, key):
+        try:
+            return get(host, key, port, timeouts.get(key, timeout))
+        except AgentError as e:
+            return e
+
+    queries = list(dict.fromkeys(queries))
+    if not queries:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(queries))) as executor:
+        futures = {(host, key): executor.submit(query, host, key) for host, key in queries}
+        return {query_key: future.result() for query_key, future in futures.items()}
@@ -0,0 +1,129 @@
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from .series import Series
+from .stats import format_timestamp
+
+# 折線圖：以 Largest-Triangle-Three-Buckets (LTTB) 把整段資料縮減成固定點數，
+# 每張圖最多 CHART_POINTS 點，不論時間範圍多長，報表建置時間與檔案大小都固定，而且整週的走勢都看得到
+
+CHART_POINTS = 400     # 每張圖的點數
+BUFFER_FACTOR = 8      # 逐段收集時，暫存超過 CHART_POINTS * BUFFER_FACTOR 點就先縮減一次
+CHART_WIDTH = 900
+CHART_HEIGHT = 220
+CHART_MARGIN = 40      # 左側留給 Y 軸標籤，下方留給時間標籤
+
+# 回傳保留下來的 (clocks, values)；第一筆與最後一筆一定保留
+def lttb(clocks, values, points=CHART_POINTS):
+    count = len(values)
+    if points < 3 or count <= points:
+        return clocks, values
+
+    x = clocks.astype(np.float64)
+    y = values
+    # 去掉頭尾後分成 points - 2 個 bucket，每個 bucket 至少一筆
+    edges = np.linspace(1, count - 1, points - 1).astype(np.int64)
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    anchor = 0
+    for i in range(points - 2):
+        start, stop = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_stop = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_stop = count - 1, count
+        next_x = x[next_start:next_stop].mean()
+        next_y = y[next_start:next_stop].mean()
+        # 與上一個選中點、下一個 bucket 平均點構成的三角形面積最大者
+        area = np.abs((x[anchor] - next_x) * (y[start:stop] - y[anchor])
+                      - (x[anchor] - x[start:stop]) * (next_y - y[anchor]))
+        anchor = start + int(area.argmax())
+        selected[i + 1] = anchor
+    return clocks[selected], values[selected]
+
+def downsample(series, points=CHART_POINTS):
+    return Series(*lttb(series.clocks, series.values, points))
+
+# 逐段 push (clocks, values)，暫存量固定，最後 result() 回傳縮減後的 Series
+class ChartSampler:
+    def __init__(self, points=CHART_POINTS, buffer_factor=BUFFER_FACTOR):
+        self.points = points
+        self.limit = points * buffer_factor
+        self.clocks = []
+        self.values = []
+        self.size = 0
+
+    def push(self, clocks, values):
+        if len(values) == 0:
+            return
+        self.clocks.append(np.asarray(clocks, dtype=np.int64))
+        self.values.append(np.asarray(values, dtype=np.float64))
+        self.size += len(values)
+        if self.size > self.limit:
+            clocks, values = lttb(np.concatenate(self.clocks), np.concatenate(self.values), self.limit // 2)
+            self.clocks, self.values = [clocks], [values]
+            self.size = len(values)
+
+    def result(self):
+        if not self.clocks:
+            return Series()
+        return downsample(Series(np.concatenate(self.clocks), np.concatenate(self.values)), self.points)
+
+# 換算成圖上座標（原點在左下角），threshold 也納入 Y 軸範圍
+# 回傳 {"points": [(x, y), ...], "threshold": y 或 None, "min": ..., "max": ..., "start": ..., "end": ...}
+def chart_layout(series, threshold=None, width=CHART_WIDTH, height=CHART_HEIGHT, margin=CHART_MARGIN):
+    if len(series) == 0:
+        return None
+    clocks = series.clocks.astype(np.float64)
+    values = series.values
+    low = float(values.min())
+    high = float(values.max())
+    if threshold is not None:
+        low = min(low, threshold)
+        high = max(high, threshold)
+    if high == low:
+        high = low + 1
+    span = max(clocks[-1] - clocks[0], 1)
+
+    plot_width = width - margin - 10
+    plot_height = height - margin - 10
+    xs = margin + (clocks - clocks[0]) / span * plot_width
+    ys = margin + (values - low) / (high - low) * plot_height
+    return {
+        "points": list(zip(xs.round(1).tolist(), ys.round(1).tolist())),
+        "threshold": margin + (threshold - low) / (high - low) * plot_height if threshold is not None else None,
+        "min": low,
+        "max": high,
+        "start": format_timestamp(series.clocks[0]),
+        "end": format_timestamp(series.clocks[-1])
+    }
+
+# HTML 報表使用的內嵌 SVG；沒有資料時回傳空字串
+def svg_chart(series, threshold=None, width=CHART_WIDTH, height=CHART_HEIGHT, margin=CHART_MARGIN):
+    layout = chart_layout(series, threshold, width, height, margin)
+    if layout is None:
+        return ""
+
+    # SVG 的 Y 軸向下，翻轉座標
+    def flip(y):
+        return round(height - y, 1)
+
+    points = " ".join(f"{x},{flip(y)}" for x, y in layout["points"])
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" class="chart" width="100%" viewBox="0 0 {width} {height}">',
+        f'<rect x="{margin}" y="10" width="{width - margin - 10}" height="{height - margin - 10}" fill="none" stroke="#ccc"/>',
+        f'<polyline points="{points}" fill="none" stroke="#005a9e" stroke-width="1.2"/>'
+    ]
+    if layout["threshold"] is not None:
+        y = flip(layout["threshold"])
+        parts.append(f'<line x1="{margin}" y1="{y}" x2="{width - 10}" y2="{y}" stroke="#e74c3c" stroke-dasharray="6,4"/>')
+    parts.extend([
+        f'<text x="{margin - 4}" y="{flip(height - 10) + 4}" font-size="11" text-anchor="end">{layout["max"]:.2f}</text>',
+        f'<text x="{margin - 4}" y="{flip(margin)}" font-size="11" text-anchor="end">{layout["min"]:.2f}</text>',
+        f'<text x="{margin}" y="{height - margin + 16}" font-size="11">{escape(layout["start"])}</text>',
+        f'<text x="{width - 10}" y="{height - margin + 16}" font-size="11" text-anchor="end">{escape(layout["end"])}</text>',
+        '</svg>'
+    ])
+    return "".join(parts)
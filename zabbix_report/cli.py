@@ -0,0 +1,150 @@
+import argparse
+import os
+
+from .trace import span, tracer
+
+# zabbix-report 指令：pdf / html / xlsx 三個子命令，以及 collect（一次收集寫成 snapshot）、fleet（依主機群組的全體主機報表）
+# reportlab、jinja2、xlsxwriter 等只在選到對應的輸出格式時才載入，cron 的快速檢查不必付出這些 import 時間
+# 各子命令加上 --snapshot 時直接從 snapshot 產生報表，不連線 Zabbix
+# 各子命令都可加上 --trace / --metrics（各階段計時）、--profile（cProfile）、--tracemalloc（記憶體配置）
+
+FORMATS = ["pdf", "html", "xlsx"]
+TRACEMALLOC_TOP = 10     # --tracemalloc 列出的配置位置數
+
+def load_format(name):
+    if name == "pdf":
+        from . import pdf_report
+        return pdf_report
+    if name == "html":
+        from . import html_report
+        return html_report
+    from . import xlsx_export
+    return xlsx_export
+
+def run_pdf(args):
+    load_format("pdf").main(args.snapshot, args.days)
+
+def run_html(args):
+    load_format("html").main(args.snapshot)
+
+def run_xlsx(args):
+    load_format("xlsx").main(args.format, args.output, args.snapshot)
+
+# 三種報表的資料收集一次寫進同一份 snapshot；重疊的項目由本機歷史快取共用，只向 Zabbix 抓一次
+def run_collect(args):
+    from .snapshot import Snapshot
+
+    snapshot = Snapshot()
+    for name in args.formats.split(","):
+        with span("collect", report=name):
+            load_format(name).collect(snapshot)
+    with span("snapshot.save", series=len(snapshot.series)):
+        snapshot.save(args.output)
+    print(f"Snapshot saved: {args.output}")
+
+# 依主機群組分成多份、多個 process 收集全體主機（fleet.py）
+def run_fleet(args):
+    from . import fleet
+
+    fleet.main(args.group, args.host, args.shard, args.workers, args.merge, args.output, args.agent)
+
+def formats(value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    for name in names:
+        if name not in FORMATS:
+            raise argparse.ArgumentTypeError(f"unknown format: {name}")
+    return ",".join(names)
+
+# "2/8" → (2, 8)
+def shard(value):
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n, got: {value}")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard out of range: {value}")
+    return index, count
+
+# 依 --trace / --metrics / --profile / --tracemalloc 執行 args.func，結束時寫出結果
+def run_instrumented(args):
+    if args.trace or args.metrics or args.profile or args.tracemalloc:
+        tracer.enable()
+    if args.tracemalloc:
+        import tracemalloc
+        tracemalloc.start()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    try:
+        args.func(args)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
+            print(f"Profile saved: {args.profile} (python -m pstats {args.profile})")
+        if args.tracemalloc:
+            import tracemalloc
+            snapshot = tracemalloc.take_snapshot()
+            tracer.extra["tracemalloc_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print("Top memory allocations:")
+            for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+                print(f"  {stat}")
+        if args.trace:
+            tracer.write_json(args.trace, args.command)
+            print(f"Trace saved: {args.trace}")
+        if args.metrics:
+            tracer.write_prometheus(args.metrics, args.command)
+            print(f"Metrics saved: {args.metrics}")
+
+def main(argv=None):
+    # 各子命令共用的量測選項
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--trace", default=os.environ.get("ZABBIX_REPORT_TRACE"),
+                        help="各階段計時寫成 JSON（登入、item 索引、API 呼叫、統計、產生報表）")
+    common.add_argument("--metrics", default=os.environ.get("ZABBIX_REPORT_METRICS"),
+                        help="寫成 Prometheus textfile，例如 /var/lib/node_exporter/textfile_collector/zabbix_report.prom")
+    common.add_argument("--profile", default=None, help="以 cProfile 執行並寫出 pstats 檔")
+    common.add_argument("--tracemalloc", action="store_true", help="記錄記憶體配置峰值與前幾名配置位置")
+
+    parser = argparse.ArgumentParser(prog="zabbix-report", description="Zabbix PDF / HTML / Excel reports")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    pdf = subparsers.add_parser("pdf", parents=[common], help="zabbix_report.pdf and zabbix_raw_report.pdf")
+    pdf.add_argument("--snapshot", default=None, help="從 snapshot 產生，不連線 Zabbix")
+    pdf.add_argument("--days", type=int, default=None, help="報表涵蓋的天數（預設 7）；超過 8 天時較舊的部分改用每小時的 trend")
+    pdf.set_defaults(func=run_pdf)
+
+    html = subparsers.add_parser("html", parents=[common], help="report_output.html")
+    html.add_argument("--snapshot", default=None, help="從 snapshot 產生，不連線 Zabbix")
+    html.set_defaults(func=run_html)
+
+    xlsx = subparsers.add_parser("xlsx", parents=[common], help="zabbix_data.xlsx or gzip CSV per tab")
+    xlsx.add_argument("--format", choices=["xlsx", "csv.gz"], default="xlsx")
+    xlsx.add_argument("--output", default=None, help="xlsx 檔名或 csv.gz 輸出目錄")
+    xlsx.add_argument("--snapshot", default=None, help="從 snapshot 產生，不連線 Zabbix")
+    xlsx.set_defaults(func=run_xlsx)
+
+    collect = subparsers.add_parser("collect", parents=[common], help="collect once into a snapshot for pdf / html / xlsx")
+    collect.add_argument("-o", "--output", default="zabbix_report.snapshot.npz")
+    collect.add_argument("--formats", type=formats, default=",".join(FORMATS), help="例如 pdf,html")
+    collect.set_defaults(func=run_collect)
+
+    fleet = subparsers.add_parser("fleet", parents=[common], help="fleet_report.html for every host of the given host groups")
+    fleet.add_argument("--group", action="append", default=[], help="主機群組名稱，可重複；未指定時為所有監控中的主機")
+    fleet.add_argument("--host", action="append", default=[], help="只包含這些 hostid，可重複")
+    fleet.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="同時收集的 process 數（每個 process 一份）")
+    fleet.add_argument("--shard", type=shard, default=None, help="i/n：只收集第 i 份（從 1 起算）並寫成部分結果")
+    fleet.add_argument("--merge", nargs="+", default=None, metavar="PART", help="合併 --shard 的部分結果並產生報表，不連線 Zabbix")
+    fleet.add_argument("-o", "--output", default=None, help="報表檔名（--shard 時為部分結果檔名）")
+    fleet.add_argument("--agent", action="store_true", help="也以 agent 被動模式查詢 Linux 主機的自訂 key")
+    fleet.set_defaults(func=run_fleet)
+
+    args = parser.parse_args(argv)
+    run_instrumented(args)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import itertools
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .trace import span
+
+# PDF / HTML / Excel 共用的 Zabbix JSON-RPC 用戶端
+# - 同一個 requests.Session 保持連線（keep-alive），不必每個請求重新建立 TCP / TLS 連線
+# - 要求 gzip 壓縮回應（前端的 web server 有開啟壓縮時生效）
+# - 登入取得的 token 存在本機，下次執行直接沿用，不會每次 user.login 留下新的 session；
+#   token 過期（超過 TOKEN_TTL 沒有使用，或 Zabbix 回應 session 已結束）時才重新登入
+# - 連線錯誤、逾時與 429 / 5xx 時以指數退避加上隨機抖動重試
+# - 記錄每個 method 的次數與回應時間，summary() 輸出統計
+
+TOKEN_CACHE = os.environ.get(
+    "ZABBIX_TOKEN_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "zabbix_report", "token.json")
+)
+TOKEN_TTL = 10 * 60          # 秒；Zabbix 預設閒置 15 分鐘自動登出，提早一點重新登入
+TIMEOUT = (5, 120)           # (連線, 讀取) 逾時秒數
+RETRIES = 4                  # 暫時性錯誤的重試次數
+BACKOFF = 0.5                # 第一次重試的最長等待秒數，之後每次加倍
+BACKOFF_MAX = 10
+POOL_SIZE = 16               # 連線池大小，需大於同時發出的請求數
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Zabbix API 回傳 error
+class ZabbixError(Exception):
+    def __init__(self, method, error):
+        message = (error.get("data") or error.get("message")) if isinstance(error, dict) else str(error)
+        super().__init__(f"{method}: {message}")
+        self.method = method
+        self.error = error
+
+    # session 已結束或 token 無效，需要重新登入
+    def expired(self):
+        text = json.dumps(self.error) if isinstance(self.error, dict) else str(self.error)
+        return "re-login" in text or "Not authori" in text
+
+class ZabbixClient:
+    def __init__(self, url, user, password, token_cache=TOKEN_CACHE, token_ttl=TOKEN_TTL,
+                 timeout=TIMEOUT, retries=RETRIES, backoff=BACKOFF, pool_size=POOL_SIZE):
+        self.url = url
+        self.user = user
+        self.password = password
+        self.token_cache = token_cache
+        self.token_ttl = token_ttl
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.token = None
+        self.last_used = 0.0
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()         # 登入 / token
+        self.stats_lock = threading.Lock()
+        self.stats = {}      # method -> [次數, 總秒數, 最長秒數, 重試次數]
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "Accept-Encoding": "gzip, deflate"})
+
+    def cache_key(self):
+        return f"{self.user}@{self.url}"
+
+    def load_token(self):
+        try:
+            with open(self.token_cache, encoding="utf-8") as f:
+                entry = json.load(f).get(self.cache_key())
+        except (OSError, ValueError, AttributeError):
+            return None
+        if entry and entry.get("expires", 0) > time.time():
+            return entry["token"]
+        return None
+
+    # token 檔只有自己可以讀寫
+    def save_token(self):
+        try:
+            with open(self.token_cache, encoding="utf-8") as f:
+                tokens = json.load(f)
+        except (OSError, ValueError):
+            tokens = {}
+        if self.token is None:
+            tokens.pop(self.cache_key(), None)
+        else:
+            tokens[self.cache_key()] = {"token": self.token, "expires": int(self.last_used + self.token_ttl)}
+        directory = os.path.dirname(self.token_cache)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # fleet 的各 shard process 可能同時寫入：暫存檔名加上 pid，不會互相截斷
+        tmp_path = f"{self.token_cache}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(tokens, f)
+        os.replace(tmp_path, self.token_cache)
+
+    # 沿用本機快取的 token，過期時才 user.login
+    def login(self):
+        with self.lock:
+            if self.token is None:
+                self.token = self.load_token()
+                if self.token is not None:
+                    self.last_used = time.time()
+            if self.token is None:
+                with span("login"):
+                    self.token = self.post("user.login", {"user": self.user, "password": self.password}, None)
+                self.last_used = time.time()
+                self.save_token()
+            return self.token
+
+    def logout(self):
+        if self.token is not None:
+            try:
+                self.post("user.logout", [], self.token)
+            finally:
+                self.token = None
+                self.save_token()
+
+    # 保留 token 給下次執行使用（更新到期時間），關閉連線
+    def close(self):
+        if self.token is not None:
+            self.save_token()
+        self.session.close()
+
+    def record(self, method, elapsed, retries):
+        with self.stats_lock:
+            stats = self.stats.setdefault(method, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += retries
+
+    def post(self, method, params, auth):
+        request_data = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params,
+            "id": next(self.ids),
+            "auth": auth
+        }
+        start = time.monotonic()
+        attempt = 0
+        with span(f"api {method}") as api_attrs:
+            while True:
+                try:
+                    response = self.session.post(self.url, json=request_data, timeout=self.timeout)
+                    if response.status_code not in RETRY_STATUS:
+                        break
+                    error = requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                if attempt >= self.retries:
+                    self.record(method, time.monotonic() - start, attempt)
+                    api_attrs["retries"] = attempt
+                    raise error
+                time.sleep(random.uniform(0, min(BACKOFF_MAX, self.backoff * 2 ** attempt)))
+                attempt += 1
+            self.record(method, time.monotonic() - start, attempt)
+            api_attrs["retries"] = attempt
+            api_attrs["bytes"] = len(response.content)
+
+        response.raise_for_status()
+        with span("json.decode", bytes=len(response.content)) as attrs:
+            result = response.json()
+            if isinstance(result.get("result"), list):
+                # 筆數也記在 API 呼叫的 span 上（span 保留 attrs 的參照）
+                attrs["rows"] = api_attrs["rows"] = len(result["result"])
+        if "error" in result or "result" not in result:
+            raise ZabbixError(method, result.get("error", "No result"))
+        return result["result"]
+
+    # 發出 API 請求；token 過期時重新登入一次再送
+    def call(self, method, params):
+        token = self.login()
+        try:
+            result = self.post(method, params, token)
+        except ZabbixError as e:
+            if not e.expired():
+                raise
+            # 本機快取的 token 也一併作廢，避免重新登入時又讀回同一個
+            with self.lock:
+                if self.token == token:
+                    self.token = None
+                    self.save_token()
+            token = self.login()
+            result = self.post(method, params, token)
+        self.last_used = time.time()
+        return result
+
+    # 每個 method 的次數、平均 / 最長回應時間與重試次數
+    def summary(self):
+        lines = ["API latency (method: calls, avg ms, max ms, retries)"]
+        for method, (count, total, longest, retries) in sorted(self.stats.items()):
+            lines.append(f"  {method}: {count}, {total / count * 1000:.1f}, {longest * 1000:.1f}, {retries}")
+        return "\n".join(lines)
@@ -0,0 +1,363 @@
+import base64
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from . import html_report
+from .charts import svg_chart
+from .html_report import (API_CONCURRENCY, HOST_CONCURRENCY, IOPS_METRIC, MERGED_METRICS, THRESHOLDS, alert_rows,
+                          episode_rows, get_client, get_item_index, get_system_info, template_data, zabbix_api_request)
+from .rendering import environment, render_to_file
+from .sketch import PERCENTILES, QuantileSketch, merge_sketches
+from .snapshot import Snapshot
+from .stats import TopK, format_duration, format_timestamp, longest_episodes
+from .trace import span, tracer
+
+# 全體主機報表（fleet 模式）：主機清單由 hostgroup.get / host.get 取得，不再寫死 HOST_IDS
+# 主機依 hostid 排序後輪流分成 n 份（--shard i/n），每份由一個 process（--workers）或另一次執行（其他機器 / cron）處理
+# 每份寫成部分結果（snapshot 的 "fleet_shard" 區段）：各主機的樣板資料、趨勢圖、Top-K、最長異常區間與分位數 sketch
+# 合併時只合併這些中間結果（Top-K、sketch 都可以合併），不必重新讀原始資料
+# 報表為 fleet_report.html（索引：主機清單與全體主機排行）加上 fleet_report_hosts/<hostid>.html（每台主機一頁），
+# 各主機頁由多個 process 同時產生，每頁逐段寫檔，不必把整份 HTML 放在記憶體
+# 單一 process 處理 500 台以上的主機時，JSON 解析與統計會先吃滿一顆 CPU，網路還遠遠沒有飽和
+
+FLEET_OUTPUT = "fleet_report.html"
+FLEET_TEMPLATE = "fleet.html"
+HOST_TEMPLATE = "fleet_host.html"
+PAGES_PER_TASK = 25      # 每個工作產生的主機頁數（減少 process 間傳遞的次數）
+SHARD_SECTION = "fleet_shard"
+TOP_METRICS = {"cpu": True, "mem": False, "disk": True}    # 名稱 -> 由大排到小
+
+# agent 介面（type 1）中的預設介面，沒有時取第一個
+def agent_ip(interfaces):
+    interfaces = [interface for interface in interfaces or [] if str(interface.get("type", "1")) == "1"]
+    interfaces.sort(key=lambda interface: str(interface.get("main")) != "1")
+    return interfaces[0].get("ip", "") if interfaces else ""
+
+# 依主機群組名稱（沒有指定時為所有監控中的主機）列出主機，依 hostid 排序
+def resolve_hosts(groups=(), hostids=()):
+    params = {
+        "output": ["hostid", "host", "name"],
+        "selectInterfaces": ["ip", "type", "main"],
+        "monitored_hosts": True
+    }
+    with span("fleet.resolve", groups=len(groups)) as attrs:
+        if groups:
+            found = zabbix_api_request("hostgroup.get", {"output": ["groupid", "name"], "filter": {"name": list(groups)}})
+            names = {group["name"] for group in found}
+            for name in groups:
+                if name not in names:
+                    print(f"Host group not found: {name}")
+            if not found:
+                return []
+            params["groupids"] = [group["groupid"] for group in found]
+        if hostids:
+            params["hostids"] = list(hostids)
+        hosts = [
+            {"hostid": host["hostid"], "host": host["host"], "name": host.get("name") or host["host"],
+             "ip": agent_ip(host.get("interfaces"))}
+            for host in zabbix_api_request("host.get", params)
+        ]
+        hosts.sort(key=lambda host: int(host["hostid"]))
+        attrs["hosts"] = len(hosts)
+    return hosts
+
+# 第 shard 份（從 1 起算）：排序後每 shards 台取一台，各份的主機數最多差一台
+def shard_hosts(hosts, shard, shards):
+    return hosts[shard - 1::shards]
+
+# 依 item 索引判斷作業系統；兩者都沒有的主機（例如 SNMP 設備）不列入報表
+def host_os_type(host_id):
+    keys = set(get_item_index().keys(host_id))
+    if "system.sw.os" in keys:
+        return "linux"
+    if "system.uname" in keys:
+        return "windows"
+    return None
+
+# TopK 依到達順序存成 [[label, clock, value], ...]，合併時維持同值的先後
+def top_to_list(top):
+    return [list(item) for item in zip(top.labels.tolist(), top.clocks.tolist(), top.values.tolist())]
+
+def top_from_list(items, largest=True):
+    top = TopK(10, largest=largest)
+    if items:
+        labels = np.empty(len(items), dtype=object)
+        labels[:] = [item[0] for item in items]
+        top.extend(np.array([item[1] for item in items], dtype=np.int64),
+                   np.array([item[2] for item in items], dtype=np.float64), labels)
+    return top
+
+def sketch_to_text(sketch):
+    return base64.b64encode(sketch.to_bytes()).decode("ascii")
+
+def sketch_from_text(text):
+    return QuantileSketch.from_bytes(base64.b64decode(text))
+
+# 一台主機的部分結果；趨勢圖的序列另外存成 fleet/<hostid>/<名稱>
+def host_record(snapshot, host, os_type, system_info):
+    chart_thresholds = {}
+    for name, (series, threshold) in system_info["charts"].items():
+        snapshot.add_series(f"fleet/{host['hostid']}/{name}", series)
+        chart_thresholds[name] = threshold
+    return {
+        "hostid": host["hostid"],
+        "name": system_info["hostname"],
+        "os_type": os_type,
+        "data": template_data(system_info, os_type, host["ip"], host["host"]),
+        "chart_thresholds": chart_thresholds,
+        "top": {name: top_to_list(top) for name, top in system_info["top"].items()},
+        "episodes": system_info["episodes"],
+        "sketches": {
+            metric: sketch_to_text(sketch)
+            for metric, sketch in system_info["sketches"].items() if sketch is not None and sketch.count
+        }
+    }
+
+# 收集第 shard 份主機，寫入 snapshot 的 "fleet_shard" 區段
+def collect_shard(snapshot, hosts, shard=1, shards=1, query_agent=False):
+    html_report.get_zabbix_token()
+    selected = shard_hosts(hosts, shard, shards)
+    get_item_index().ensure(zabbix_api_request, [host["hostid"] for host in selected])
+
+    records = []
+    with ThreadPoolExecutor(max_workers=API_CONCURRENCY) as item_executor, \
+            ThreadPoolExecutor(max_workers=HOST_CONCURRENCY) as host_executor:
+        futures = []
+        for host in selected:
+            os_type = host_os_type(host["hostid"])
+            if os_type is None:
+                print(f"Skipping host without OS items: {host['name']} ({host['hostid']})")
+                continue
+            futures.append((host, os_type, host_executor.submit(
+                get_system_info, host["hostid"], os_type, item_executor, host["ip"] or None, query_agent
+            )))
+        for host, os_type, future in futures:
+            records.append(host_record(snapshot, host, os_type, future.result()))
+    get_client().close()
+    print(get_client().summary())
+
+    section = snapshot.section(SHARD_SECTION)
+    section["shard"] = [shard, shards]
+    section["hosts"] = records
+
+# ProcessPoolExecutor 的工作：在子 process 收集一份，連同 trace 的 span 傳回主 process
+# checked：主 process 已確認索引是最新的主機，shard 不再逐台以 countOutput 重新確認
+def shard_worker(hosts, shard, shards, query_agent, trace, checked=()):
+    if trace:
+        tracer.enable()
+    get_item_index().mark_checked(checked)
+    snapshot = Snapshot()
+    with span("collect", report="fleet", shard=f"{shard}/{shards}"):
+        collect_shard(snapshot, hosts, shard, shards, query_agent)
+    return snapshot, tracer.spans
+
+# 分成 workers 份同時收集，回傳各份的 snapshot
+def run_shards(hosts, workers, query_agent=False):
+    workers = max(1, min(workers, len(hosts)))
+    if workers == 1:
+        snapshot = Snapshot()
+        with span("collect", report="fleet"):
+            collect_shard(snapshot, hosts, 1, 1, query_agent)
+        return [snapshot]
+
+    # 先在主 process 更新全部主機的 item 索引並保存 token，各 shard 直接沿用，不必各自登入、各自重抓索引
+    get_item_index().ensure(zabbix_api_request, [host["hostid"] for host in hosts])
+    checked = [host["hostid"] for host in hosts if host["hostid"] in get_item_index().checked]
+    get_client().close()
+
+    # 以 spawn 啟動：fork 會複製主 process 的連線池與 SQLite 連線
+    context = multiprocessing.get_context("spawn")
+    parts = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = [
+            executor.submit(shard_worker, hosts, shard, workers, query_agent, tracer.enabled, checked)
+            for shard in range(1, workers + 1)
+        ]
+        for shard, future in enumerate(futures, 1):
+            snapshot, spans = future.result()
+            tracer.add_spans(spans, f"shard {shard}/{workers}")
+            parts.append(snapshot)
+    return parts
+
+def percentile_text(sketch, p):
+    return f"{sketch.quantile(p / 100):.2f}" if sketch is not None else "N/A"
+
+# 主機清單的 IOPS P95：各磁碟分開計算，列出最忙的那顆
+def busiest_device_text(sketches, p):
+    busiest = max(
+        ((sketch.quantile(p / 100), metric[len(IOPS_METRIC):]) for metric, sketch in sketches.items()
+         if metric.startswith(IOPS_METRIC)),
+        default=None
+    )
+    return f"{busiest[0]:.2f} ({busiest[1]})" if busiest is not None else "N/A"
+
+# 合併各份的部分結果，寫入新 snapshot 的 "fleet" 區段；缺少的 shard 只提示，不中止
+def merge(parts):
+    merged = Snapshot()
+    records = {}
+    shards = {}
+    for part in parts:
+        if not part.has(SHARD_SECTION):
+            print("Skipping snapshot without fleet shard data")
+            continue
+        section = part.section(SHARD_SECTION)
+        shard, count = section["shard"]
+        shards.setdefault(count, set()).add(shard)
+        for record in section["hosts"]:
+            records[record["hostid"]] = record
+        merged.series.update(part.series)
+    for count, found in sorted(shards.items()):
+        missing = sorted(set(range(1, count + 1)) - found)
+        if missing:
+            print(f"Missing shards of {count}: {', '.join(str(shard) for shard in missing)}")
+
+    with span("fleet.merge", hosts=len(records), parts=len(parts)):
+        records = sorted(records.values(), key=lambda record: int(record["hostid"]))
+        fleet_top = {name: TopK(10, largest=largest) for name, largest in TOP_METRICS.items()}
+        fleet_sketches = {metric: [] for metric in MERGED_METRICS}
+        hosts = []
+        for record in records:
+            for name, items in record["top"].items():
+                fleet_top[name].merge(top_from_list(items, TOP_METRICS[name]))
+            sketches = {metric: sketch_from_text(text) for metric, text in record["sketches"].items()}
+            for metric, sketch in sketches.items():
+                if metric in fleet_sketches:
+                    fleet_sketches[metric].append(sketch)
+            record["percentiles"] = [
+                dict({"metric": metric}, **{f"p{p}": percentile_text(sketch, p) for p in PERCENTILES})
+                for metric, sketch in sketches.items()
+            ]
+            data = record["data"]
+            longest = record["episodes"][0] if record["episodes"] else None
+            hosts.append({
+                "hostid": record["hostid"],
+                "hostname": record["name"],
+                "ip": data["system_ip"],
+                "os": data["system_os"],
+                "cpu": data["system_cpu"],
+                "mem": data["system_mem"],
+                "cpu_p95": percentile_text(sketches.get("CPU"), 95),
+                "load_p95": percentile_text(sketches.get("Load"), 95),
+                "iops_p95": busiest_device_text(sketches, 95),
+                "longest_episode": f"{longest['metric']} {format_duration(longest['duration'])}" if longest else "",
+                "agent_errors": len(data["agent_errors"])
+            })
+
+        percentiles = []
+        for metric, sketches in fleet_sketches.items():
+            if sketches:
+                sketch = merge_sketches(sketches)
+                row = {"hostname": "全體主機", "metric": metric, "hosts": len(sketches)}
+                row.update({f"p{p}": percentile_text(sketch, p) for p in PERCENTILES})
+                percentiles.append(row)
+
+        section = merged.section("fleet")
+        section["shards"] = max(shards) if shards else 0
+        section["hosts"] = hosts
+        section["details"] = {
+            record["hostid"]: dict(
+                {key: record[key] for key in ("name", "os_type", "data", "chart_thresholds", "percentiles")},
+                episodes=episode_rows(record["episodes"])
+            )
+            for record in records
+        }
+        section["fleet"] = {
+            "cpu_alerts": alert_rows(fleet_top["cpu"], THRESHOLDS["cpu"]),
+            "mem_alerts": alert_rows(fleet_top["mem"], THRESHOLDS["mem"], invert=True),
+            "disk_alerts": alert_rows(fleet_top["disk"], THRESHOLDS["disk"]),
+            "episodes": episode_rows(longest_episodes([
+                episode for record in records for episode in record["episodes"]
+            ])),
+            "percentiles": percentiles
+        }
+    return merged
+
+# fleet_report.html → fleet_report_hosts/
+def pages_dir(output):
+    return f"{os.path.splitext(output)[0]}_hosts"
+
+# pages：[(路徑, 主機資料, {圖名: Series}, 索引頁的相對路徑), ...]
+def render_host_pages(pages):
+    for path, detail, series, index in pages:
+        host = dict(detail["data"])
+        for name, threshold in detail["chart_thresholds"].items():
+            host[f"{name}_chart"] = svg_chart(series[name], threshold)
+        render_to_file(HOST_TEMPLATE, path, hostname=detail["name"], os_type=detail["os_type"], host=host,
+                       episodes=detail["episodes"], percentiles=detail["percentiles"], index=index)
+    return len(pages)
+
+# ProcessPoolExecutor 的工作：連同 trace 的 span 傳回主 process
+def host_pages_worker(pages, trace):
+    if trace:
+        tracer.enable()
+    render_host_pages(pages)
+    return tracer.spans
+
+# 產生各主機頁（workers 個 process 同時產生）與索引頁
+def render(snapshot, output=FLEET_OUTPUT, workers=1):
+    section = snapshot.section("fleet")
+    directory = pages_dir(output)
+    index = f"../{os.path.basename(output)}"
+    pages = []
+    for host in section["hosts"]:
+        detail = section["details"][host["hostid"]]
+        series = {name: snapshot.get_series(f"fleet/{host['hostid']}/{name}") for name in detail["chart_thresholds"]}
+        pages.append((os.path.join(directory, f"{host['hostid']}.html"), detail, series, index))
+    tasks = [pages[start:start + PAGES_PER_TASK] for start in range(0, len(pages), PAGES_PER_TASK)]
+    workers = max(1, min(workers, len(tasks)))
+
+    with span("render.hosts", hosts=len(pages), workers=workers):
+        # 先編譯一次存進快取，各 process 直接載入編譯結果
+        environment().get_template(HOST_TEMPLATE)
+        if workers == 1:
+            for task in tasks:
+                render_host_pages(task)
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+                futures = [executor.submit(host_pages_worker, task, tracer.enabled) for task in tasks]
+                for number, future in enumerate(futures, 1):
+                    tracer.add_spans(future.result(), f"pages {number}/{len(tasks)}")
+
+    render_to_file(
+        FLEET_TEMPLATE, output,
+        hosts=section["hosts"],
+        fleet=section["fleet"],
+        shards=section["shards"],
+        pages=os.path.basename(directory),
+        created=format_timestamp(snapshot.meta["created"])
+    )
+    print(f"Fleet report generated: {output} ({len(pages)} hosts, pages in {directory})")
+
+# parts：只合併既有的部分結果；shard=(i, n)：只收集第 i 份並寫成部分結果；其餘情況分成 workers 份收集後合併
+def main(groups=(), hostids=(), shard=None, workers=1, parts=None, output=None, query_agent=False):
+    if parts:
+        with span("snapshot.load", parts=len(parts)):
+            snapshots = [Snapshot.load(path) for path in parts]
+        merged = merge(snapshots)
+    else:
+        html_report.get_zabbix_token()
+        print("Authentication successful")
+        hosts = resolve_hosts(groups, hostids)
+        if not hosts:
+            print("No hosts found")
+            return
+        print(f"Fleet: {len(hosts)} hosts")
+
+        if shard is not None:
+            index, count = shard
+            snapshot = Snapshot()
+            with span("collect", report="fleet", shard=f"{index}/{count}"):
+                collect_shard(snapshot, hosts, index, count, query_agent)
+            path = output or f"fleet.shard{index}of{count}.npz"
+            with span("snapshot.save", series=len(snapshot.series)):
+                snapshot.save(path)
+            print(f"Shard saved: {path}")
+            return
+        merged = merge(run_shards(hosts, workers, query_agent))
+
+    with span("render", report="fleet"):
+        render(merged, output or FLEET_OUTPUT, workers)
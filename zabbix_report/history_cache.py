@@ -0,0 +1,371 @@
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .paging import iter_windows
+from .resolution import plan, trend_row
+from .sketch import QuantileSketch
+from .trace import span
+
+# 本機歷史資料快取（SQLite）
+# 每個 itemid 記錄已完整快取的時間範圍 [first_clock, last_clock]，
+# 下次只向 Zabbix 要 last_clock 之後（或 first_clock 之前）缺少的部分，再從本機合併讀出
+# 另外每個 itemid 每天（SKETCH_PERIOD）保存一份分位數 sketch，保留得比原始資料久，跨週、跨月的 p95 / p99 直接合併
+# CSV 版以「最新 N 筆」取資料的項目記在 latest_items，依筆數保留最新 N 筆（同時也保留 RETENTION 內的資料），
+# 不會被 35 天的清除刪掉一部分、下次又整段補抓回來
+
+CACHE_PATH = os.environ.get(
+    "ZABBIX_HISTORY_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "zabbix_report", "history.sqlite3")
+)
+RETENTION = 35 * 24 * 3600   # 保留 35 天，足夠月報使用
+SETTLE = 300                 # 最近 5 分鐘的資料可能還在 proxy / agent 緩衝中，下次重新抓取
+CHUNK_ROWS = 50000           # 從快取讀出時每段的筆數
+SKETCH_PERIOD = 24 * 3600    # 每份 sketch 涵蓋的時間（對齊 UTC 的整天）
+SKETCH_RETENTION = 400 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    itemid TEXT NOT NULL,
+    clock INTEGER NOT NULL,
+    ns INTEGER NOT NULL DEFAULT 0,
+    value,
+    PRIMARY KEY (itemid, clock, ns)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS history_clock ON history (clock);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    itemid TEXT PRIMARY KEY,
+    value_type INTEGER NOT NULL,
+    first_clock INTEGER NOT NULL,
+    last_clock INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sketches (
+    itemid TEXT NOT NULL,
+    period INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    PRIMARY KEY (itemid, period)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS latest_items (
+    itemid TEXT PRIMARY KEY,
+    keep_rows INTEGER NOT NULL,
+    used INTEGER NOT NULL
+);
+"""
+
+class HistoryCache:
+    def __init__(self, path=CACHE_PATH, retention=RETENTION, settle=SETTLE,
+                 sketch_period=SKETCH_PERIOD, sketch_retention=SKETCH_RETENTION):
+        self.path = path
+        self.retention = retention
+        self.settle = settle
+        self.sketch_period = sketch_period
+        self.sketch_retention = sketch_retention
+        self.lock = threading.Lock()
+        self.conn = None
+
+    # 第一次使用時才開檔，並順便清掉超過保留期限的資料
+    def connect(self):
+        if self.conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(SCHEMA)
+            self.evict()
+        return self.conn
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def evict(self, now=None):
+        now = int(now if now is not None else time.time())
+        cutoff = now - self.retention
+        # 超過保留期限沒有再以最新 N 筆讀取的項目，改回依時間清除
+        self.conn.execute("DELETE FROM latest_items WHERE used < ?", (cutoff,))
+        self.conn.execute("DELETE FROM history WHERE clock < ? AND itemid NOT IN (SELECT itemid FROM latest_items)", (cutoff,))
+        self.conn.execute("DELETE FROM sketches WHERE period < ?", (now - self.sketch_retention,))
+        self.conn.execute(
+            "UPDATE checkpoints SET first_clock = MAX(first_clock, ?), last_clock = MAX(last_clock, ? - 1) "
+            "WHERE itemid NOT IN (SELECT itemid FROM latest_items)",
+            (cutoff, cutoff)
+        )
+
+        # 最新 N 筆的項目：只清除比第 N 新的那筆更舊、而且超過保留期限的資料
+        for itemid, keep_rows in self.conn.execute("SELECT itemid, keep_rows FROM latest_items").fetchall():
+            row = self.conn.execute(
+                "SELECT clock FROM history WHERE itemid = ? ORDER BY clock DESC, ns DESC LIMIT 1 OFFSET ?",
+                (itemid, keep_rows - 1)
+            ).fetchone()
+            if row is None:
+                continue
+            boundary = min(cutoff, row[0])
+            self.conn.execute("DELETE FROM history WHERE itemid = ? AND clock < ?", (itemid, boundary))
+            self.conn.execute(
+                "UPDATE checkpoints SET first_clock = MAX(first_clock, ?), last_clock = MAX(last_clock, ? - 1) WHERE itemid = ?",
+                (boundary, boundary, itemid)
+            )
+        self.conn.commit()
+
+    def checkpoint(self, itemid, value_type):
+        row = self.connect().execute(
+            "SELECT value_type, first_clock, last_clock FROM checkpoints WHERE itemid = ?", (itemid,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[0] != value_type:
+            # 項目的資料型態變了，舊資料作廢
+            self.conn.execute("DELETE FROM history WHERE itemid = ?", (itemid,))
+            self.conn.execute("DELETE FROM checkpoints WHERE itemid = ?", (itemid,))
+            self.conn.execute("DELETE FROM sketches WHERE itemid = ?", (itemid,))
+            return None
+        return row[1], row[2]
+
+    def store(self, entries, value_type):
+        numeric = value_type in (0, 3)
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO history (itemid, clock, ns, value) VALUES (?, ?, ?, ?)",
+            ((entry['itemid'], int(entry['clock']), int(entry.get('ns', 0)),
+              float(entry['value']) if numeric else entry['value']) for entry in entries)
+        )
+
+    def save_checkpoint(self, itemid, value_type, first_clock, last_clock):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO checkpoints (itemid, value_type, first_clock, last_clock) VALUES (?, ?, ?, ?)",
+            (itemid, value_type, first_clock, last_clock)
+        )
+
+    # fetch(itemids, value_type, time_from, time_till, sortorder="ASC", limit=None) 回傳 history.get 的結果
+    # 把缺少的時間範圍分段抓回並逐段寫入快取，記憶體中一次只有一段
+    # 每段寫入後立即 commit 並推進 checkpoint：等待 Zabbix 回應時不持有 SQLite 的寫入鎖
+    # （fleet 模式多個 process 共用同一個快取檔），中途中斷時已抓回的部分也保留
+    def update(self, fetch, itemids, value_type, time_from, time_till):
+        now = int(time.time())
+        settled_till = min(time_till, now - self.settle)
+
+        # 計算每個 item 缺少的時間範圍，範圍相同的 item 合併成一次 history.get
+        checkpoints = {}
+        ranges = {}
+        with self.lock:
+            self.connect()
+            for itemid in itemids:
+                cp = self.checkpoint(itemid, value_type)
+                checkpoints[itemid] = cp
+                if cp is None:
+                    missing = [(time_from, time_till)]
+                else:
+                    first_clock, last_clock = cp
+                    missing = []
+                    if time_from < first_clock:
+                        missing.append((time_from, first_clock - 1))
+                    if time_till > last_clock:
+                        missing.append((last_clock + 1, time_till))
+                for window in missing:
+                    ranges.setdefault(window, []).append(itemid)
+            # checkpoint() 可能因資料型態改變而刪除舊資料
+            self.conn.commit()
+
+        with span("history_cache.update", itemids=len(itemids), windows=len(ranges)) as attrs:
+            attrs["rows"] = 0
+            for (window_from, window_till), ids in ranges.items():
+                for _, end, entries in iter_windows(fetch, ids, value_type, window_from, window_till):
+                    with self.lock:
+                        self.store(entries, value_type)
+                        for itemid in ids:
+                            cp = self.advance(checkpoints[itemid], window_from, window_till, end, settled_till)
+                            if cp != checkpoints[itemid]:
+                                checkpoints[itemid] = cp
+                                self.save_checkpoint(itemid, value_type, cp[0], cp[1])
+                        self.conn.commit()
+                    attrs["rows"] += len(entries)
+
+    # 抓回 window 中 end 之前的資料後，已完整快取的範圍
+    # 新的 item 與往後補的範圍從起點連續，每段都能推進；往前補的範圍要整段抓完才與原本的範圍相接
+    @staticmethod
+    def advance(cp, window_from, window_till, end, settled_till):
+        if cp is None:
+            return window_from, max(window_from - 1, min(end, settled_till))
+        first_clock, last_clock = cp
+        if window_from <= last_clock + 1 and window_till > last_clock:
+            return first_clock, max(last_clock, min(end, settled_till))
+        if end >= window_till and window_till >= first_clock - 1:
+            return min(first_clock, window_from), last_clock
+        return cp
+
+    # 逐段讀出 (clocks, values) 陣列，依 clock 由舊到新
+    def iter_rows(self, itemid, time_from, time_till, chunk_rows=CHUNK_ROWS):
+        clock, ns = time_from, -1
+        while True:
+            with self.lock:
+                rows = self.connect().execute(
+                    "SELECT clock, ns, value FROM history WHERE itemid = ? AND (clock, ns) > (?, ?) AND clock <= ? "
+                    "ORDER BY clock, ns LIMIT ?",
+                    (itemid, clock, ns, time_till, chunk_rows)
+                ).fetchall()
+            if not rows:
+                return
+            clock, ns = rows[-1][0], rows[-1][1]
+            yield (np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows)),
+                   np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows)))
+            if len(rows) < chunk_rows:
+                return
+
+    # 回傳 {itemid: 產生 (clocks, values) 陣列的 generator}
+    def get_many(self, fetch, itemids, value_type, time_from, time_till):
+        self.update(fetch, itemids, value_type, time_from, time_till)
+        return {itemid: self.iter_rows(itemid, time_from, time_till) for itemid in itemids}
+
+    def get(self, fetch, itemid, value_type, time_from, time_till):
+        return self.get_many(fetch, [itemid], value_type, time_from, time_till)[itemid]
+
+    # time_from ~ time_till 的分位數 sketch（資料需先以 update / get_many 補齊）
+    # 範圍內的整天：有保存的 sketch 直接合併；沒有時由快取的原始資料建立，已完整快取且穩定的那天存起來供之後使用
+    # 頭尾不滿一天的部分由原始資料計算；原始資料已清除的日子只要 sketch 還在，仍會納入
+    # 超過 TREND_AFTER 的長區間與 fetch_planned 相同分成 trend / history 兩段：快取只有 history 那段的原始資料，
+    # trend 那段沒有保存 sketch 的小時改以 fetch_trend 取回的每小時 avg（以 num 為權重）加入，
+    # 因此 p99 等尾端分位數在這段會比原始資料平緩
+    def sketch(self, itemid, value_type, time_from, time_till, fetch_trend=None):
+        period = self.sketch_period
+        result = QuantileSketch()
+        with span("history_cache.sketch") as attrs:
+            with self.lock:
+                self.connect()
+                cp = self.checkpoint(itemid, value_type)
+                stored = dict(self.conn.execute(
+                    "SELECT period, digest FROM sketches WHERE itemid = ? AND period >= ? AND period <= ?",
+                    (itemid, time_from - period, time_till)
+                ).fetchall())
+
+            segments = plan(time_from, time_till, value_type) if fetch_trend is not None else [("history", time_from, time_till)]
+            built = []
+            reused = 0
+            trend_hours = 0
+            total_days = 0
+            for source, segment_from, segment_till in segments:
+                first_day = -(-segment_from // period) * period
+                days = range(first_day, segment_till - period + 2, period)
+                total_days += len(days)
+                for day in days:
+                    if day in stored:
+                        result.merge(QuantileSketch.from_bytes(stored[day]))
+                        reused += 1
+                        continue
+                    if source == "trend":
+                        continue
+                    day_sketch = QuantileSketch()
+                    for _, values in self.iter_rows(itemid, day, day + period - 1):
+                        day_sketch.add(values)
+                    result.merge(day_sketch)
+                    if cp is not None and cp[0] <= day and day + period - 1 <= cp[1] and day_sketch.count:
+                        built.append((itemid, day, day_sketch.to_bytes()))
+
+                if source == "trend":
+                    covered = {day for day in days if day in stored}
+                    # 整段都有保存的 sketch 時不必再查 trend
+                    if len(covered) * period < segment_till - segment_from + 1:
+                        rows = [
+                            trend_row(entry) for entry in fetch_trend([itemid], value_type, segment_from, segment_till)
+                            if entry['itemid'] == itemid and int(entry['clock']) // period * period not in covered
+                        ]
+                        result.add([row[2] for row in rows], [row[4] for row in rows])
+                        trend_hours += len(rows)
+                    continue
+
+                edges = [(segment_from, segment_till)] if not days else [(segment_from, days[0] - 1), (days[-1] + period, segment_till)]
+                for edge_from, edge_till in edges:
+                    for _, values in self.iter_rows(itemid, edge_from, edge_till):
+                        result.add(values)
+
+            if built:
+                with self.lock:
+                    self.conn.executemany("INSERT OR REPLACE INTO sketches (itemid, period, digest) VALUES (?, ?, ?)", built)
+                    self.conn.commit()
+            attrs["days"] = total_days
+            attrs["reused"] = reused
+            attrs["built"] = len(built)
+            attrs["trend_hours"] = trend_hours
+        return result
+
+    # 最新 limit 筆（CSV 版使用 limit 而非時間範圍）：補齊快取，之後以 iter_latest 讀出
+    # 上次之後的新資料與 update 相同，依資料密度分段抓取，每段寫入後推進 checkpoint
+    def update_latest(self, fetch, itemid, value_type, limit):
+        with span("history_cache.update_latest", itemids=1) as attrs:
+            now = int(time.time())
+            settled_till = now - self.settle
+            with self.lock:
+                self.connect()
+                cp = self.checkpoint(itemid, value_type)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO latest_items (itemid, keep_rows, used) VALUES (?, ?, ?)", (itemid, limit, now)
+                )
+                self.conn.commit()
+
+            if cp is None:
+                entries = fetch([itemid], value_type, None, None, sortorder="DESC", limit=limit)
+                first_clock = min(int(entry['clock']) for entry in entries) if len(entries) >= limit else 0
+                last_clock = max(first_clock - 1, settled_till)
+                with self.lock:
+                    self.store(entries, value_type)
+                    self.save_checkpoint(itemid, value_type, first_clock, last_clock)
+                    self.conn.commit()
+                attrs["rows"] = len(entries)
+            else:
+                first_clock, last_clock = cp
+                attrs["rows"] = 0
+                for _, end, entries in iter_windows(fetch, [itemid], value_type, last_clock + 1, now):
+                    last_clock = max(last_clock, min(end, settled_till))
+                    with self.lock:
+                        self.store(entries, value_type)
+                        self.save_checkpoint(itemid, value_type, first_clock, last_clock)
+                        self.conn.commit()
+                    attrs["rows"] += len(entries)
+
+            with self.lock:
+                cached = self.conn.execute(
+                    "SELECT COUNT(1) FROM history WHERE itemid = ? AND clock >= ?", (itemid, first_clock)
+                ).fetchone()[0]
+
+            # 第一次登記為最新 N 筆之前已被依時間清除而筆數不足時，往前補抓
+            if cached < limit and first_clock > 0:
+                entries = fetch([itemid], value_type, None, first_clock - 1, sortorder="DESC", limit=limit - cached)
+                first_clock = min(int(entry['clock']) for entry in entries) if len(entries) >= limit - cached else 0
+                with self.lock:
+                    self.store(entries, value_type)
+                    self.save_checkpoint(itemid, value_type, first_clock, last_clock)
+                    self.conn.commit()
+                attrs["rows"] += len(entries)
+
+    # 依 clock 由新到舊逐段讀出最新 limit 筆，每段為 [(clock, value), ...]
+    def iter_latest(self, itemid, limit, chunk_rows=CHUNK_ROWS):
+        clock, ns = None, None
+        while limit > 0:
+            with self.lock:
+                if clock is None:
+                    rows = self.connect().execute(
+                        "SELECT clock, ns, value FROM history WHERE itemid = ? ORDER BY clock DESC, ns DESC LIMIT ?",
+                        (itemid, min(limit, chunk_rows))
+                    ).fetchall()
+                else:
+                    rows = self.connect().execute(
+                        "SELECT clock, ns, value FROM history WHERE itemid = ? AND (clock, ns) < (?, ?) "
+                        "ORDER BY clock DESC, ns DESC LIMIT ?",
+                        (itemid, clock, ns, min(limit, chunk_rows))
+                    ).fetchall()
+            if not rows:
+                return
+            clock, ns = rows[-1][0], rows[-1][1]
+            limit -= len(rows)
+            yield [(row[0], row[2]) for row in rows]
+            if len(rows) < chunk_rows:
+                return
+
+    # 回傳依 clock 由新到舊排序的 [(clock, value), ...]
+    def latest(self, fetch, itemid, value_type, limit):
+        self.update_latest(fetch, itemid, value_type, limit)
+        return [row for rows in self.iter_latest(itemid, limit) for row in rows]
@@ -0,0 +1,676 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait as futures_wait
+import time
+
+from . import agent
+from .charts import ChartSampler, svg_chart
+from .client import ZabbixClient
+from .history_cache import HistoryCache
+from .item_index import ItemIndex
+from .rendering import render_to_file
+from .resolution import fetch_planned, iter_merged
+from .series import Series
+from .sketch import PERCENTILES, merge_sketches
+from .snapshot import Snapshot
+from .stats import EpisodeIndex, TopK, exceeds, format_duration, format_timestamp, longest_episodes, round_cents
+from .trace import span
+
+# Zabbix API 配置
+# 環境變數 ZABBIX_URL 可改連其他 Zabbix（例如 benchmarks/zabbix_stub.py 的測試伺服器）
+ZABBIX_URL = os.environ.get("ZABBIX_URL", "http://10.40.4.67:8090/api_jsonrpc.php")
+ZABBIX_USER = "Admin"
+ZABBIX_PASSWORD = "zabbix"
+HOST_IDS = {
+    "linux": "10644",  # 假設 Linux 主機 ID
+    "windows": "10643"  # 假設 Windows 主機 ID
+}
+
+# 假設的 IP 和 URL 資訊
+SYSTEM_INFO = {
+    "linux": {"ip": "10.40.4.67", "url": "sp.hosp"},
+    "windows": {"ip": "10.40.4.86", "url": "ap.hosp"}
+}
+
+# 閾值配置
+THRESHOLDS = {
+    "cpu": 70,  # CPU utilization > 70%
+    "cpuload": None,  # Will be set dynamically based on CPU cores
+    "mem": 70,  # Memory utilization > 70%
+    "swap": 70,  # Swap utilization > 70%
+    "disk": 80,  # Disk utilization > 80%
+    "iops": 80,  # IOPS utilization > 80%
+    "readwrite": 80,  # Read/Write MB/s > 80%
+    "disk_active": 80  # Disk active time > 80%
+}
+
+# agent 被動模式查詢設定（自訂 key 的腳本執行較久，逾時另外設定）
+AGENT_PORT = int(os.environ.get("ZABBIX_AGENT_PORT", agent.AGENT_PORT))
+AGENT_HOST = os.environ.get("ZABBIX_AGENT_HOST")   # 設定時取代 SYSTEM_INFO 的 ip
+AGENT_TIMEOUTS = {
+    "collect.slide.issue": 30,
+    "collect.userlogin.issue": 30
+}
+
+# 從 item 索引列出掛載點時略過的系統掛載點（vfs.fs.discovery 也會建立這些 item）
+SKIP_MOUNTPOINTS = re.compile(r"^/(boot|snap|run|dev|sys|proc)(/|$)")
+
+# 分位數：CPU / Load 合併成全體主機；IOPS 依磁碟分開（"IOPS dm-0"），不跨磁碟、跨主機合併
+MERGED_METRICS = ("CPU", "Load")
+IOPS_METRIC = "IOPS "
+
+# 並行收集設定
+HOST_CONCURRENCY = 4     # 同時收集的主機數
+API_CONCURRENCY = 8      # 同時對 Zabbix 發出的最大請求數
+LATENCY_TARGET = 2.0     # 秒；平均回應時間超過時自動降低並行數，避免壓垮前端
+
+# 依 Zabbix 回應時間調整並行數（AIMD）：延遲變高時減半，恢復後每輪加一
+class AdaptiveLimiter:
+    def __init__(self, max_limit, target_latency):
+        self.max_limit = max_limit
+        self.limit = float(max_limit)
+        self.target_latency = target_latency
+        self.avg_latency = 0.0
+        self.in_flight = 0
+        self.last_backoff = 0.0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency):
+        with self.cond:
+            self.in_flight -= 1
+            self.avg_latency = latency if self.avg_latency == 0 else 0.8 * self.avg_latency + 0.2 * latency
+            now = time.monotonic()
+            if self.avg_latency > self.target_latency:
+                # 同一波延遲只退讓一次
+                if now - self.last_backoff > self.avg_latency:
+                    self.limit = max(1.0, self.limit / 2)
+                    self.last_backoff = now
+            else:
+                self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+            self.cond.notify_all()
+
+api_limiter = AdaptiveLimiter(API_CONCURRENCY, LATENCY_TARGET)
+
+# Zabbix 連線、本機歷史快取（每次只向 Zabbix 要上次執行之後的新資料）與 item 索引
+# 第一次使用時才建立，import 本模組（例如 fleet.py、只產生報表的子命令）不會讀取 token 快取或開啟快取檔
+client = None
+history_cache = None
+item_index = None
+_lock = threading.Lock()
+
+def get_client():
+    global client
+    if client is None:
+        with _lock:
+            if client is None:
+                client = ZabbixClient(ZABBIX_URL, ZABBIX_USER, ZABBIX_PASSWORD)
+    return client
+
+def get_history_cache():
+    global history_cache
+    if history_cache is None:
+        with _lock:
+            if history_cache is None:
+                history_cache = HistoryCache()
+    return history_cache
+
+def get_item_index():
+    global item_index
+    if item_index is None:
+        with _lock:
+            if item_index is None:
+                item_index = ItemIndex()
+    return item_index
+
+# 有 executor 時丟到執行緒池，沒有時直接執行（維持原本的循序行為）
+def submit(executor, fn, *args, **kwargs):
+    if executor is not None:
+        return executor.submit(fn, *args, **kwargs)
+    future = Future()
+    future.set_result(fn(*args, **kwargs))
+    return future
+
+def get_zabbix_token():
+    try:
+        return get_client().login()
+    except Exception as e:
+        print(f"Error obtaining token: {str(e)}")
+        exit(1)
+
+def zabbix_api_request(method, params):
+    api_limiter.acquire()
+    start = time.monotonic()
+    try:
+        return get_client().call(method, params)
+    except Exception as e:
+        print(f"Error in API request ({method}): {str(e)}")
+        return []
+    finally:
+        api_limiter.release(time.monotonic() - start)
+
+def fetch_trend(itemids, value_type, time_from, time_till):
+    params = {
+        "itemids": itemids,
+        "time_from": time_from,
+        "time_till": time_till,
+        "output": ["itemid", "clock", "num", "value_min", "value_avg", "value_max"]
+    }
+    return zabbix_api_request("trend.get", params)
+
+# itemid 從 item_index 查表（get_system_info 已確保索引是最新的），不再每個 key 各發一次 item.get
+def get_historical_data(host_id, item_key, value_type, time_from, time_till, threshold=None, invert=False):
+    item_id = get_item_index().itemid(host_id, item_key)
+    if item_id is None:
+        print(f"No items found for key: {item_key}")
+        return iter(())
+
+    def fetch(itemids, value_type, time_from, time_till, sortorder="ASC", limit=None):
+        params = {
+            "history": value_type,
+            "itemids": itemids,
+            "time_from": time_from,
+            "time_till": time_till,
+            "output": "extend",
+            "sortfield": "clock",
+            "sortorder": sortorder
+        }
+        if limit is not None:
+            params["limit"] = limit
+        return zabbix_api_request("history.get", params)
+
+    def fetch_history(itemids, value_type, time_from, time_till):
+        return get_history_cache().get_many(fetch, itemids, value_type, time_from, time_till)
+
+    # 長時間範圍較舊的部分改用 trend；報表列的是前 10 名，所以每小時取峰值
+    history_chunks, trends = fetch_planned(fetch_history, fetch_trend, [item_id], value_type, time_from, time_till)[item_id]
+    return convert_chunks(item_key, iter_merged(history_chunks, trends, "min" if invert else "max"), threshold, invert)
+
+# 逐段換算單位並過濾閾值，yield Series；資料從快取分段讀出，不會整條載入記憶體
+def convert_chunks(item_key, chunks, threshold=None, invert=False):
+    for clocks, values in chunks:
+        series = Series(clocks, values)
+        if 'memory' in item_key or 'vfs.fs.size' in item_key or 'swap' in item_key:
+            if 'pavailable' not in item_key and 'pfree' not in item_key and 'pused' not in item_key:
+                series = series.scaled(1024 * 1024 * 1024)  # bytes → GB
+        elif 'net' in item_key:
+            series = series.scaled(1000)  # bits/s to Kbps
+        elif 'readwrite' in item_key:
+            series = series.scaled(1024 * 1024)  # bytes/s to MB/s
+
+        if threshold is not None:
+            series = series.exceeding(threshold, invert)
+        if len(series):
+            yield series
+
+# 逐段交給 sampler 畫圖，再原樣往下傳
+def sample_chunks(chunks, sampler):
+    for series in chunks:
+        sampler.push(series.clocks, series.values)
+        yield series
+
+# 逐段交給 EpisodeIndex 找出連續異常的區間，再原樣往下傳（需要未過濾的資料才知道何時恢復正常）
+def track_episodes(chunks, index):
+    for series in chunks:
+        index.push(series.clocks, series.values)
+        yield series
+
+def exceeding_chunks(chunks, threshold, invert=False):
+    for series in chunks:
+        series = series.exceeding(threshold, invert)
+        if len(series):
+            yield series
+
+# 以兩位小數排序（與表格顯示一致），只保留前 10 筆
+def select_top(chunks, label, invert=False, k=10):
+    top = TopK(k, largest=not invert)
+    for series in chunks:
+        top.push(series.clocks, round_cents(series.values), label)
+    return top
+
+def alert_rows(top, anomaly_threshold=None, invert=False):
+    rows = []
+    for label, clock, value in top.items():
+        item = {"hostname": label, "usage": f"{value:.2f}", "timestamp": format_timestamp(clock)}
+        if anomaly_threshold is not None:
+            item["is_anomalous"] = bool(exceeds(value, anomaly_threshold, invert))
+        rows.append(item)
+    return rows
+
+def episode_rows(episodes):
+    return [
+        {
+            "hostname": episode["hostname"],
+            "metric": episode["metric"],
+            "start": format_timestamp(episode["start"]),
+            "end": format_timestamp(episode["end"]),
+            "duration": format_duration(episode["duration"]),
+            "peak": f"{episode['peak']:.2f}",
+            "mean": f"{episode['mean']:.2f}",
+            "ongoing": episode["ongoing"]
+        }
+        for episode in episodes
+    ]
+
+# 各主機一列，merged 的項目最後一列為全體主機（合併各主機的 sketch）；沒有資料的項目略過
+# IOPS 各磁碟分開列出（"IOPS dm-0"），不同磁碟的 IOPS 合併後的分位數沒有意義
+def percentile_rows(host_infos, merged=MERGED_METRICS):
+    rows = []
+    for metric in dict.fromkeys(metric for info in host_infos for metric in info["sketches"]):
+        sketches = [(info["hostname"], info["sketches"].get(metric)) for info in host_infos]
+        sketches = [(hostname, sketch) for hostname, sketch in sketches if sketch is not None and sketch.count]
+        if metric in merged and len(sketches) > 1:
+            sketches.append(("全體主機", merge_sketches(sketch for _, sketch in sketches)))
+        for hostname, sketch in sketches:
+            values = sketch.percentiles()
+            row = {"hostname": hostname, "metric": metric}
+            row.update({f"p{p}": f"{values[f'p{p}']:.2f}" for p in PERCENTILES})
+            rows.append(row)
+    return rows
+
+def calculate_stats(data, hostname, threshold, invert=False, anomaly_threshold=None):
+    return alert_rows(select_top(data, hostname, invert), anomaly_threshold, invert)
+
+# agent_host：自訂 key 查詢的 agent 位址（fleet 模式為主機的 agent 介面），未指定時使用 SYSTEM_INFO 的 ip
+def get_system_info(host_id, os_type, executor=None, agent_host=None, query_agent=True):
+    keys = [
+        "vm.memory.size[total]", "system.cpu.util", "system.cpu.load[all,avg1]",
+        "vm.memory.size[pavailable]", "system.swap.size[,pfree]"
+    ]
+    if os_type == "linux":
+        keys.extend(["system.sw.os", "system.cpu.num"])
+    else:  # windows
+        keys.extend(["system.uname", "wmi.get[root/cimv2,\"Select NumberOfLogicalProcessors from Win32_ComputerSystem\"]"])
+
+    # 磁碟、掛載點清單來自 item 索引（由 LLD 建立的 item），不再寫死
+    get_item_index().ensure(zabbix_api_request, [host_id])
+
+    params = {
+        "hostids": host_id,
+        "output": ["itemid", "name", "key_", "lastvalue"],
+        "filter": {"key_": keys}
+    }
+    items = zabbix_api_request("item.get", params)
+
+    # 獲取主機名稱
+    params = {
+        "hostids": host_id,
+        "output": ["host", "name"]
+    }
+    hosts = zabbix_api_request("host.get", params)
+    hostname = hosts[0].get('name', 'Unknown Host') if hosts else 'Unknown Host'
+
+    # 初始化 system_info
+    system_info = {
+        "os_string": "Unknown OS",
+        "cpu_cores": 0,
+        "memory_bytes": 0,
+        "os_type": os_type,
+        "num": 0,
+        "last_month_count": 0,
+        "this_month_count": 0,
+        "growth_rate": 0.0,
+        "user_login_total": 0,
+        "slide_total": 0,
+        "slide_free_size": 0,
+        "login_users": []
+    }
+
+    # 先處理 CPU 核心數和其他基本資訊
+    for item in items:
+        if item["key_"] in ["system.sw.os", "system.uname"]:
+            system_info["os_string"] = item["lastvalue"]
+        elif item["key_"] == "system.cpu.num":
+            system_info["cpu_cores"] = int(item["lastvalue"])
+        elif item["key_"] == "wmi.get[root/cimv2,\"Select NumberOfLogicalProcessors from Win32_ComputerSystem\"]":
+            system_info["cpu_cores"] = int(item["lastvalue"])
+        elif item["key_"] == "vm.memory.size[total]":
+            system_info["memory_bytes"] = int(item["lastvalue"])
+
+    # 設定時間範圍：過去 7 天
+    time_till = int(time.time())
+    time_from = time_till - (7 * 24 * 3600)  # 7 days in seconds
+
+    # 獲取歷史數據（所有項目先一起送出，再依序取回結果）
+    def fetch(item_key, value_type, threshold=None, invert=False):
+        return submit(executor, get_historical_data, host_id, item_key, value_type,
+                      time_from, time_till, threshold, invert=invert)
+
+    # 取回未過濾的資料：CPU / Load / Mem 另外畫整段時間的折線圖，異常區間也需要恢復正常的時間，之後再過濾
+    cpu_future = fetch('system.cpu.util', 0)
+    cpuload_future = fetch('system.cpu.load[all,avg1]', 0)
+    mem_future = fetch('vm.memory.size[pavailable]', 0, invert=True)
+    swap_future = fetch('system.swap.size[,pfree]', 0, invert=True)
+
+    # 磁碟相關數據
+    linux_disks = [
+        {"name": mountpoint, "total_key": f"vfs.fs.size[{mountpoint},total]", "pused_key": f"vfs.fs.size[{mountpoint},pused]", "value_type": 0}
+        for mountpoint in get_item_index().item_params(host_id, "vfs.fs.size", "pused")
+        if not SKIP_MOUNTPOINTS.match(mountpoint)
+    ]
+    disk_futures = [
+        (disk, fetch(disk["total_key"], disk["value_type"]), fetch(disk["pused_key"], disk["value_type"]))
+        for disk in (linux_disks if os_type == "linux" else [])
+    ]
+
+    def device_keys(name):
+        return [f"{name}[{device}]" for device in get_item_index().item_params(host_id, name)] if os_type == "linux" else []
+
+    iops_keys = device_keys("custom.iops")
+    iops_futures = [(key, fetch(key, 0)) for key in iops_keys]
+
+    readwrite_keys = device_keys("custom.readwrite")
+    readwrite_futures = [(key, fetch(key, 0)) for key in readwrite_keys]
+
+    disk_util_keys = device_keys("disk.util")
+    disk_util_futures = [(key, fetch(key, 0)) for key in disk_util_keys]
+
+    # 先等所有歷史資料抓完，之後的統計時間才不會混入 API 的等待時間
+    with span("history.wait", host=hostname):
+        futures_wait([cpu_future, cpuload_future, mem_future, swap_future]
+                     + [future for _, total_future, pused_future in disk_futures for future in (total_future, pused_future)]
+                     + [future for _, future in iops_futures + readwrite_futures + disk_util_futures])
+
+    with span("stats", host=hostname):
+        # 各項目依異常閾值記錄連續異常的區間
+        episode_indexes = []
+
+        def episodes(chunks, label, threshold, invert=False):
+            index = EpisodeIndex(threshold, invert)
+            episode_indexes.append((label, index))
+            return track_episodes(chunks, index)
+
+        # CPU / Mem / Disk 的 Top-K 另外保留，供 main() 合併成全體主機排行
+        charts = {"cpu": ChartSampler(), "cpuload": ChartSampler(), "mem": ChartSampler()}
+        cpu_chunks = episodes(sample_chunks(cpu_future.result(), charts["cpu"]), "CPU", THRESHOLDS["cpu"])
+        cpu_top = select_top(exceeding_chunks(cpu_chunks, THRESHOLDS["cpu"]), hostname)
+        cpu_alerts = alert_rows(cpu_top, THRESHOLDS["cpu"])
+        cpuload_threshold = system_info["cpu_cores"] if system_info["cpu_cores"] else 1
+        cpuload_chunks = episodes(sample_chunks(cpuload_future.result(), charts["cpuload"]), "CPU Load", cpuload_threshold)
+        cpuload_alerts = calculate_stats(cpuload_chunks, hostname, THRESHOLDS["cpuload"], anomaly_threshold=cpuload_threshold)
+        mem_chunks = episodes(sample_chunks(mem_future.result(), charts["mem"]), "Mem 可用率", THRESHOLDS["mem"], invert=True)
+        mem_top = select_top(exceeding_chunks(mem_chunks, THRESHOLDS["mem"], invert=True), hostname, invert=True)
+        mem_alerts = alert_rows(mem_top, THRESHOLDS["mem"], invert=True)
+        swap_chunks = exceeding_chunks(episodes(swap_future.result(), "Swap 可用率", THRESHOLDS["swap"], invert=True),
+                                       THRESHOLDS["swap"], invert=True)
+        swap_alerts = calculate_stats(swap_chunks, hostname, THRESHOLDS["swap"], invert=True, anomaly_threshold=THRESHOLDS["swap"])
+
+        disk_data = []
+        disk_top = TopK(10)
+        for disk, total_future, pused_future in disk_futures:
+            total_first = next(total_future.result(), None)
+            pused_top = select_top(episodes(pused_future.result(), f"Disk {disk['name']}", THRESHOLDS["disk"]), hostname)
+            disk["total"] = total_first[0][1] if total_first is not None else "0.00"
+            disk["alerts"] = alert_rows(pused_top, THRESHOLDS["disk"])
+            disk_data.append(disk)
+            for label, clock, value in pused_top.items():
+                disk_top.push([clock], [value], f"{hostname} {disk['name']}")
+
+        # IOPS 數據
+        iops_data = []
+        for key, future in iops_futures:
+            name = key.split("[")[1][:-1]
+            chunks = exceeding_chunks(episodes(future.result(), f"IOPS {name}", THRESHOLDS["iops"]), THRESHOLDS["iops"])
+            iops_data.append({
+                "name": name,
+                "alerts": calculate_stats(chunks, hostname, THRESHOLDS["iops"], anomaly_threshold=THRESHOLDS["iops"])
+            })
+
+        # Read/Write 數據
+        readwrite_data = []
+        for key, future in readwrite_futures:
+            name = key.split("[")[1][:-1]
+            chunks = exceeding_chunks(episodes(future.result(), f"Read/Write {name}", THRESHOLDS["readwrite"]), THRESHOLDS["readwrite"])
+            readwrite_data.append({
+                "name": name,
+                "alerts": calculate_stats(chunks, hostname, THRESHOLDS["readwrite"], anomaly_threshold=THRESHOLDS["readwrite"])
+            })
+
+        # Disk Active Time 數據
+        disk_util_data = []
+        for key, future in disk_util_futures:
+            name = key.split("[")[1][:-1]
+            chunks = exceeding_chunks(episodes(future.result(), f"Disk Active Time {name}", THRESHOLDS["disk_active"]), THRESHOLDS["disk_active"])
+            disk_util_data.append({
+                "name": name,
+                "alerts": calculate_stats(chunks, hostname, THRESHOLDS["disk_active"], anomaly_threshold=THRESHOLDS["disk_active"])
+            })
+
+    # CPU / Load / 各磁碟 IOPS 的分位數 sketch（合併快取的每日 sketch），collect() 再把 CPU / Load 合併成全體主機
+    with span("percentiles", host=hostname):
+        def item_sketch(item_key):
+            item_id = get_item_index().itemid(host_id, item_key)
+            return get_history_cache().sketch(item_id, 0, time_from, time_till, fetch_trend) if item_id is not None else None
+
+        sketches = {
+            "CPU": item_sketch("system.cpu.util"),
+            "Load": item_sketch("system.cpu.load[all,avg1]")
+        }
+        for key in iops_keys:
+            sketches[IOPS_METRIC + key.split("[")[1][:-1]] = item_sketch(key)
+
+    # 更新 system_info
+    system_info.update({
+        "hostname": hostname,
+        "cpu_data": cpu_alerts,
+        "cpuload_data": cpuload_alerts,
+        "mem_data": mem_alerts,
+        "swap_data": swap_alerts,
+        "disk_data": disk_data,
+        "iops_data": iops_data,
+        "readwrite_data": readwrite_data,
+        "disk_util_data": disk_util_data,
+        "top": {"cpu": cpu_top, "mem": mem_top, "disk": disk_top},
+        "sketches": sketches,
+        # 這台主機最長的異常區間，供 main() 合併成全體主機排行
+        "episodes": longest_episodes([
+            dict(episode, hostname=hostname, metric=label)
+            for label, index in episode_indexes for episode in index.episodes()
+        ]),
+        "charts": {
+            "cpu": (charts["cpu"].result(), THRESHOLDS["cpu"]),
+            "cpuload": (charts["cpuload"].result(), system_info["cpu_cores"] or None),
+            "mem": (charts["mem"].result(), THRESHOLDS["mem"])
+        }
+    })
+
+    # 自訂 key 直接以 agent 被動模式查詢（不需要 zabbix_get），失敗時記錄錯誤並保留預設值
+    system_info["agent_errors"] = []
+    if os_type == "linux" and query_agent:
+        agent_host = AGENT_HOST or agent_host or SYSTEM_INFO[os_type]["ip"]
+        results = agent.get_many([(agent_host, "collect.slide.issue"), (agent_host, "collect.userlogin.issue")],
+                                 port=AGENT_PORT, timeouts=AGENT_TIMEOUTS)
+
+        slide_data = results[(agent_host, "collect.slide.issue")]
+        if isinstance(slide_data, agent.AgentError):
+            print(f"Error querying agent: {slide_data}")
+            system_info["agent_errors"].append(slide_data.to_dict())
+        else:
+            slide_data = slide_data.strip()
+            print(f"Debug: slide_data = {slide_data}")
+            lines = slide_data.splitlines()
+            for line in lines:
+                if not line or line == "None":
+                    continue
+                num_match = re.search(r'num (\d+)', line)
+                last_month_match = re.search(r'last (\d+)', line)
+                this_month_match = re.search(r'this (\d+)', line)
+                growth_rate_match = re.search(r'grow ([\d.]+)', line)
+
+                if num_match:
+                    system_info["num"] = int(num_match.group(1))
+                if last_month_match:
+                    system_info["last_month_count"] = int(last_month_match.group(1))
+                if this_month_match:
+                    system_info["this_month_count"] = int(this_month_match.group(1))
+                if growth_rate_match:
+                    system_info["growth_rate"] = float(growth_rate_match.group(1))
+
+        userlogin_data = results[(agent_host, "collect.userlogin.issue")]
+        if isinstance(userlogin_data, agent.AgentError):
+            print(f"Error querying agent: {userlogin_data}")
+            system_info["agent_errors"].append(userlogin_data.to_dict())
+        else:
+            userlogin_data = userlogin_data.strip()
+            print(f"Debug: userlogin_data = {userlogin_data}")
+            try:
+                login_users = json.loads(userlogin_data)
+                system_info["login_users"] = [{"userid": user["User_ID"], "username": user["Username"], "count": user["Count"]} for user in login_users]
+                system_info["user_login_total"] = sum(user["Count"] for user in login_users) if login_users else 0
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Invalid collect.userlogin.issue data: {e}")
+                system_info["agent_errors"].append({
+                    "host": agent_host, "key": "collect.userlogin.issue", "error": type(e).__name__, "message": str(e)
+                })
+
+        system_info["slide_total"] = 100
+        system_info["slide_free_size"] = 50
+
+    return system_info
+
+def parse_os_info(os_string, os_type):
+    if os_type == "linux":
+        match = re.search(r'#\d+~(\d+\.\d+)\.\d+-Ubuntu', os_string)
+        if match:
+            return f"Ubuntu {match.group(1)}"
+        match = re.search(r'Ubuntu \d+\.\d+\.\d+-[\w\d]+~(\d+\.\d+)', os_string)
+        if match:
+            return f"Ubuntu {match.group(1)}"
+    elif os_type == "windows":
+        match = re.search(r'Windows \S+ (\d+\.\d+\.\d+) Microsoft Windows (\d+ [^\s]+)', os_string)
+        if match:
+            version = match.group(1)
+            os_name = match.group(2)
+            return f"Windows {os_name} {version}"
+    return "Unknown OS"
+
+# 一台主機的樣板資料（report.html 的 linux / windows，fleet 模式的各主機）
+def template_data(system_info, os_type, system_ip, system_url):
+    memory_gb = round(system_info["memory_bytes"] / (1024 ** 3), 2)
+    return {
+        "system_ip": system_ip,
+        "system_url": system_url,
+        "system_os": parse_os_info(system_info["os_string"], os_type),
+        "system_cpu": f"{system_info['cpu_cores']} cores",
+        "system_mem": f"{memory_gb} GB",
+        "num": system_info["num"],
+        "last_month_count": system_info["last_month_count"],
+        "this_month_count": system_info["this_month_count"],
+        "growth_rate": system_info["growth_rate"],
+        "user_login_total": system_info["user_login_total"],
+        "slide_total": system_info["slide_total"],
+        "slide_free_size": system_info["slide_free_size"],
+        "login_users": system_info["login_users"],
+        "cpu_alerts": system_info["cpu_data"],
+        "cpuload_alerts": system_info["cpuload_data"],
+        "mem_alerts": system_info["mem_data"],
+        "swap_alerts": system_info["swap_data"],
+        "disks": system_info["disk_data"],
+        "iops": system_info["iops_data"],
+        "readwrite": system_info["readwrite_data"],
+        "disk_util": system_info["disk_util_data"],
+        "agent_errors": system_info["agent_errors"]
+    }
+
+# 收集資料寫入 snapshot 的 "html" 區段：各主機的樣板資料、全體主機排行與趨勢圖的序列（已縮減）
+def collect(snapshot):
+    get_zabbix_token()
+    print("Authentication successful")
+
+    linux_data = {}
+    windows_data = {}
+    chart_thresholds = {}
+
+    # 所有主機的 item 索引一次更新（一次 item.get），之後各主機直接查表
+    get_item_index().ensure(zabbix_api_request, list(HOST_IDS.values()))
+
+    # 主機與歷史項目分成兩個執行緒池，避免主機工作佔滿 worker 而等不到自己的項目
+    with ThreadPoolExecutor(max_workers=API_CONCURRENCY) as item_executor, \
+            ThreadPoolExecutor(max_workers=HOST_CONCURRENCY) as host_executor:
+        host_futures = {
+            os_type: host_executor.submit(get_system_info, host_id, os_type, item_executor)
+            for os_type, host_id in HOST_IDS.items()
+        }
+        host_infos = {os_type: future.result() for os_type, future in host_futures.items()}
+    get_client().close()
+    print(get_client().summary())
+
+    # 全體主機排行：合併各主機的 Top-K
+    fleet_top = {"cpu": TopK(10), "mem": TopK(10, largest=False), "disk": TopK(10)}
+    for system_info in host_infos.values():
+        for name, top in system_info["top"].items():
+            fleet_top[name].merge(top)
+    fleet_data = {
+        "cpu_alerts": alert_rows(fleet_top["cpu"], THRESHOLDS["cpu"]),
+        "mem_alerts": alert_rows(fleet_top["mem"], THRESHOLDS["mem"], invert=True),
+        "disk_alerts": alert_rows(fleet_top["disk"], THRESHOLDS["disk"]),
+        "episodes": episode_rows(longest_episodes([
+            episode for system_info in host_infos.values() for episode in system_info["episodes"]
+        ])),
+        "percentiles": percentile_rows(list(host_infos.values()))
+    }
+
+    for os_type, system_info in host_infos.items():
+        data = template_data(system_info, os_type, SYSTEM_INFO[os_type]["ip"], SYSTEM_INFO[os_type]["url"])
+
+        chart_thresholds[os_type] = {}
+        for name, (series, threshold) in system_info["charts"].items():
+            snapshot.add_series(f"html/{os_type}/{name}", series)
+            chart_thresholds[os_type][name] = threshold
+
+        if os_type == "linux":
+            linux_data = data
+        else:
+            windows_data = data
+
+    section = snapshot.section("html")
+    section["host_ids"] = HOST_IDS
+    section["linux"] = linux_data
+    section["windows"] = windows_data
+    section["fleet"] = fleet_data
+    section["chart_thresholds"] = chart_thresholds
+
+# 從 snapshot 產生 report_output.html，不需要連線
+def render(snapshot):
+    section = snapshot.section("html")
+    hosts = {}
+    for os_type in ("linux", "windows"):
+        data = dict(section[os_type])
+        for name, threshold in section["chart_thresholds"].get(os_type, {}).items():
+            data[f"{name}_chart"] = svg_chart(snapshot.get_series(f"html/{os_type}/{name}"), threshold)
+        hosts[os_type] = data
+
+    # 目前目錄有 report.html 時優先使用，否則使用套件內建的模板（編譯結果快取在本機）
+    render_to_file(
+        'report.html', 'report_output.html',
+        linux=hosts["linux"],
+        windows=hosts["windows"],
+        fleet=section["fleet"],
+        linux_disks=hosts["linux"]["disks"],
+        windows_disks=[]  # Windows 磁碟數據未提供
+    )
+    print("HTML report generated: report_output.html")
+
+# 取得資料與產生報表；有 snapshot_path 時直接從 snapshot 產生
+def main(snapshot_path=None):
+    if snapshot_path is not None:
+        snapshot = Snapshot.load(snapshot_path)
+        if not snapshot.has("html"):
+            print(f"No HTML data in snapshot: {snapshot_path}")
+            return
+    else:
+        snapshot = Snapshot()
+        with span("collect", report="html"):
+            collect(snapshot)
+    with span("render", report="html"):
+        render(snapshot)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,151 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .trace import span
+
+# 本機 item 索引：(hostid, key) → (itemid, value_type)
+# 每批主機只發一次 item.get 取回全部 item，存成 JSON；之後的查詢直接查表，不再每個 key 各發一次 item.get
+# 超過 INDEX_TTL，或主機的 item 數量改變（LLD 新增 / 移除磁碟、掛載點）時才重新抓取
+# 報表的磁碟、掛載點清單也從索引取得（item_params），新的磁碟不必改程式就會出現在報表中
+
+INDEX_PATH = os.environ.get(
+    "ZABBIX_ITEM_INDEX",
+    os.path.join(os.path.expanduser("~"), ".cache", "zabbix_report", "items.json")
+)
+INDEX_TTL = 6 * 3600
+INDEX_VERSION = 1
+INDEX_CONCURRENCY = 8    # 同時發出的 countOutput 請求數
+
+KEY_PATTERN = re.compile(r"^([^\[]+)\[(.*)\]$")
+
+# "vfs.fs.size[/data,pused]" → ("vfs.fs.size", ["/data", "pused"])；沒有參數時為空 list
+def parse_key(key):
+    match = KEY_PATTERN.match(key)
+    if match is None:
+        return key, []
+    return match.group(1), [param.strip().strip('"') for param in match.group(2).split(",")]
+
+# dm-2 排在 dm-10 前面
+def natural_key(text):
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", text)]
+
+class ItemIndex:
+    def __init__(self, path=INDEX_PATH, ttl=INDEX_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hosts = None       # hostid -> {"fetched": 時間, "count": item 數, "items": {key: [itemid, value_type]}}
+        self.checked = set()    # 這次執行已確認過是最新的主機
+
+    def read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == INDEX_VERSION:
+                return data["hosts"]
+        except (OSError, ValueError, KeyError):
+            pass
+        return {}
+
+    def load(self):
+        if self.hosts is None:
+            self.hosts = self.read()
+
+    # fleet 模式的其他 shard（其他 process）可能同時更新索引：寫入前重新讀檔，只覆蓋這次更新的主機
+    def save(self, host_ids):
+        hosts = self.read()
+        hosts.update({host_id: self.hosts[host_id] for host_id in host_ids})
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": INDEX_VERSION, "hosts": hosts}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    # request(method, params) 回傳 API 結果；確保 host_ids 的索引是最新的
+    # 只有查表與更新 hosts / checked 時持有 lock，countOutput 與 item.get 在 lock 之外同時發出，
+    # 其他主機（其他執行緒）的查詢不必等這些網路請求
+    def ensure(self, request, host_ids):
+        with span("item_index", hosts=len(host_ids)) as attrs:
+            now = int(time.time())
+            stale = []
+            counted = {}
+            with self.lock:
+                self.load()
+                for host_id in dict.fromkeys(host_ids):
+                    if host_id in self.checked:
+                        continue
+                    entry = self.hosts.get(host_id)
+                    if entry is None or now - entry["fetched"] >= self.ttl:
+                        stale.append(host_id)
+                    else:
+                        counted[host_id] = entry["count"]
+
+            # countOutput 只回傳數量，比取回全部 item 便宜很多
+            def count_items(host_id):
+                return request("item.get", {"hostids": host_id, "countOutput": True})
+
+            if counted:
+                with ThreadPoolExecutor(max_workers=min(INDEX_CONCURRENCY, len(counted))) as executor:
+                    counts = dict(zip(counted, executor.map(count_items, counted)))
+                with self.lock:
+                    for host_id, count in counts.items():
+                        if not isinstance(count, (str, int)) or int(count) != counted[host_id]:
+                            stale.append(host_id)
+                        else:
+                            self.checked.add(host_id)
+            attrs["refreshed"] = len(stale)
+            if not stale:
+                return
+
+            items = request("item.get", {"hostids": stale, "output": ["itemid", "hostid", "key_", "value_type"]})
+            fetched = {host_id: {"fetched": now, "count": 0, "items": {}} for host_id in stale}
+            for item in items if isinstance(items, list) else []:
+                entry = fetched.get(item["hostid"])
+                if entry is not None:
+                    entry["items"][item["key_"]] = [item["itemid"], int(item["value_type"])]
+                    entry["count"] += 1
+            # 查詢失敗（或主機沒有 item）時不覆蓋舊的索引，下次執行再試
+            updated = [host_id for host_id, entry in fetched.items() if entry["count"]]
+            if not updated:
+                return
+            with self.lock:
+                for host_id in updated:
+                    self.hosts[host_id] = fetched[host_id]
+                    self.checked.add(host_id)
+                self.save(updated)
+
+    # 其他 process（fleet 的主 process）剛確認過是最新的主機，這次執行不必再以 countOutput 確認
+    def mark_checked(self, host_ids):
+        with self.lock:
+            self.load()
+            self.checked.update(host_id for host_id in host_ids if host_id in self.hosts)
+
+    def itemid(self, host_id, key):
+        item = self.hosts.get(host_id, {}).get("items", {}).get(key) if self.hosts else None
+        return item[0] if item else None
+
+    def value_type(self, host_id, key):
+        item = self.hosts.get(host_id, {}).get("items", {}).get(key) if self.hosts else None
+        return item[1] if item else None
+
+    def keys(self, host_id):
+        return list(self.hosts.get(host_id, {}).get("items", {})) if self.hosts else []
+
+    # 名稱為 name 的 key 的第一個參數（最後一個參數等於 last 時），依自然順序排序
+    # 例如 item_params(host, "vfs.fs.size", "pused") → ["/", "/data", ...]；item_params(host, "custom.iops") → ["dm-0", ...]
+    def item_params(self, host_id, name, last=None):
+        found = set()
+        for key in self.keys(host_id):
+            key_name, params = parse_key(key)
+            if key_name != name or not params:
+                continue
+            if last is not None and (len(params) < 2 or params[-1] != last):
+                continue
+            found.add(params[0])
+        return sorted(found, key=natural_key)
@@ -0,0 +1,36 @@
+# 分段抓取 history：把時間範圍切成數段，依上一段的資料密度調整下一段長度，
+# 讓每次 history.get 約 TARGET_ROWS 筆，避免一次回傳數百 MB 的 JSON（或讓 Zabbix 端超過 PHP memory_limit）
+
+TARGET_ROWS = 20000     # 每段的目標筆數
+MAX_ROWS = 50000        # 每段的上限（history.get limit），超過代表切得太大，縮短後重抓
+INITIAL_SLICE = 3600    # 第一段長度（秒）
+MIN_SLICE = 60
+
+# fetch(itemids, value_type, time_from, time_till, sortorder="ASC", limit=None) 回傳 history.get 的結果
+# 依時間順序逐段 yield 每段的 history.get 結果
+def iter_history(fetch, itemids, value_type, time_from, time_till,
+                 target_rows=TARGET_ROWS, max_rows=MAX_ROWS, initial_slice=INITIAL_SLICE):
+    for _, _, entries in iter_windows(fetch, itemids, value_type, time_from, time_till, target_rows, max_rows, initial_slice):
+        yield entries
+
+# 同上，逐段 yield (start, end, entries)；end 之前（含）的資料都已取回，快取可以據此推進 checkpoint
+def iter_windows(fetch, itemids, value_type, time_from, time_till,
+                 target_rows=TARGET_ROWS, max_rows=MAX_ROWS, initial_slice=INITIAL_SLICE):
+    start = time_from
+    span = initial_slice
+    while start <= time_till:
+        end = min(time_till, start + span - 1)
+        entries = fetch(itemids, value_type, start, end, limit=max_rows)
+        if len(entries) >= max_rows and span > MIN_SLICE:
+            # 被 limit 截斷，縮短後重抓這一段
+            span = max(MIN_SLICE, span // 4)
+            continue
+
+        yield start, end, entries
+
+        seconds = end - start + 1
+        if entries:
+            span = max(MIN_SLICE, int(seconds * target_rows / len(entries)))
+        else:
+            span = seconds * 4
+        start = end + 1
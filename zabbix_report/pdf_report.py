@@ -0,0 +1,551 @@
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib import colors
+from reportlab.graphics.shapes import Drawing, Line, PolyLine, Rect, String
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .charts import chart_layout, downsample
+from .client import ZabbixClient
+from .history_cache import HistoryCache
+from .item_index import ItemIndex
+from .paging import iter_history
+from .resolution import AGGREGATES, NUM, fetch_planned, iter_merged, plan
+from .series import Series
+from .sketch import QuantileSketch
+from .snapshot import Snapshot
+from .stats import format_duration, format_summary, format_timestamp, longest_episodes, summarize
+from .trace import span
+
+# Zabbix API configuration
+THRESHOLDS = {
+    "cpu": 70,           # CPU utilization > 70%
+    "memory": 20,        # 可用記憶體百分比 < 20%（因為是 pavailable）
+    "load": 5,           # Load average > 5
+    "iops": 1000,        # IOPS > 1000 ops/s
+    "disk_space": 80,    # Disk usage > 80%
+    "net_traffic": 1000000  # Network traffic > 1MB/s
+}
+
+ZABBIX_URL = os.environ.get("ZABBIX_URL", "http://10.40.4.67:8090/api_jsonrpc.php")
+ZABBIX_USER = "Admin"
+ZABBIX_PASSWORD = "zabbix"
+HOST_ID = "10644"
+
+# 將資料轉為兩欄一排的格式
+def format_two_column_table(data, title1="Timestamp", value1="Value", title2="Timestamp", value2="Value"):
+    table_data = [[title1, value1, title2, value2]]
+    for i in range(0, len(data), 2):
+        row = []
+        row.extend(data[i])
+        if i + 1 < len(data):
+            row.extend(data[i + 1])
+        else:
+            row.extend(["", ""])  # 補空
+        table_data.append(row)
+    return table_data
+
+# 第一次連線時才建立，import 本模組（cli、snapshot 離線產生報表）不會建立連線
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        client = ZabbixClient(ZABBIX_URL, ZABBIX_USER, ZABBIX_PASSWORD)
+    return client
+
+def get_zabbix_token():
+    try:
+        return get_client().login()
+    except Exception as e:
+        print(f"Error obtaining token: {str(e)}")
+        exit(1)
+
+def zabbix_api_request(method, params):
+    try:
+        return get_client().call(method, params)
+    except Exception as e:
+        print(f"Error in API request ({method}): {str(e)}")
+        return []
+
+def get_system_info(host_id):
+    params = {
+        "hostids": host_id,
+        "output": ["host", "name"]
+    }
+    hosts = zabbix_api_request("host.get", params)
+    if hosts:
+        host = hosts[0]
+        uname_result = zabbix_api_request("item.get", {
+            "hostids": host_id,
+            "search": {"key_": "system.uname"},
+            "output": "extend",
+            "sortfield": "name"
+        })
+        uname = uname_result[0]['lastvalue'] if uname_result else 'N/A'
+        return {
+            'Hostname': host.get('name', 'N/A'),
+            'OS': uname,
+            'Hardware': 'Linux System',
+            'Location': 'N/A'
+        }
+    return {}
+
+def convert_value(item_key, value_type, value):
+    if 'memory' in item_key and value_type == 3 and 'pavailable' not in item_key:
+        value = value / (1024 * 1024 * 1024)  # bytes → GB
+    elif 'vfs.fs.size' in item_key and 'used' in item_key:
+        value = value / (1024 * 1024 * 1024)  # bytes → GB for remaining space
+    elif 'net' in item_key:
+        value = value / 1000  # bits/s to Kbps
+    return value
+
+# 每次執行的歷史資料暫存：同一個 (hostid, key, value_type, 時間範圍) 只向 Zabbix 抓一次，
+# 過濾後資料、原始資料與 calculate_stats 的輸入都從記憶體取得
+# 有 history_cache 時只向 Zabbix 要上次執行之後的新資料；長時間範圍較舊的部分改用 trend.get
+# 有 item_index 時 itemid 從本機索引查表，索引仍然有效時完全不需要 item.get
+class HistoryStore:
+    def __init__(self, history_cache=None, item_index=None):
+        self.history_cache = history_cache
+        self.item_index = item_index
+        self.itemids = {}   # (host_id, item_key) -> itemid
+        self.history = {}   # (host_id, item_key, value_type, time_from, time_till) -> (history_arrays, trend_arrays)
+        self.series = {}    # (window_key, agg) -> Series，已換算單位
+
+    def resolve_itemids(self, host_id, item_keys):
+        missing = [key for key in item_keys if (host_id, key) not in self.itemids]
+        if not missing:
+            return
+        if self.item_index is not None:
+            self.item_index.ensure(zabbix_api_request, [host_id])
+            for key in missing:
+                self.itemids[(host_id, key)] = self.item_index.itemid(host_id, key)
+            return
+        params = {
+            "hostids": host_id,
+            "filter": {"key_": missing},
+            "output": ["itemid", "name", "key_", "value_type"]
+        }
+        items = zabbix_api_request("item.get", params)
+        for item in items:
+            self.itemids.setdefault((host_id, item['key_']), item['itemid'])
+        for key in missing:
+            self.itemids.setdefault((host_id, key), None)
+
+    def fetch_history(self, itemids, value_type, time_from, time_till, sortorder="ASC", limit=None):
+        params = {
+            "history": value_type,
+            "itemids": itemids,
+            "output": ["itemid", "clock", "ns", "value"],
+            "sortfield": "clock",
+            "sortorder": sortorder
+        }
+        if time_from is not None:
+            params["time_from"] = time_from
+        if time_till is not None:
+            params["time_till"] = time_till
+        if limit is not None:
+            params["limit"] = limit
+        return zabbix_api_request("history.get", params)
+
+    def fetch_trend(self, itemids, value_type, time_from, time_till):
+        params = {
+            "itemids": itemids,
+            "time_from": time_from,
+            "time_till": time_till,
+            "output": ["itemid", "clock", "num", "value_min", "value_avg", "value_max"]
+        }
+        return zabbix_api_request("trend.get", params)
+
+    # 回傳 {itemid: 逐段 (clocks, values) 陣列}；history.get 依資料密度分段抓取
+    def fetch_history_chunks(self, itemids, value_type, time_from, time_till):
+        if self.history_cache is not None:
+            return self.history_cache.get_many(self.fetch_history, itemids, value_type, time_from, time_till)
+        chunks = {item_id: [] for item_id in itemids}
+        for entries in iter_history(self.fetch_history, itemids, value_type, time_from, time_till):
+            rows = {item_id: [] for item_id in itemids}
+            for entry in entries:
+                if entry['itemid'] in rows:
+                    rows[entry['itemid']].append((int(entry['clock']), float(entry['value'])))
+            for item_id, points in rows.items():
+                chunks[item_id].append(Series.from_points(points))
+        return chunks
+
+    # 一次 item.get + 每種 value_type 一次 history.get（長區間再加一次 trend.get）取回所有需要的序列
+    def prefetch(self, host_id, series, time_from, time_till):
+        self.resolve_itemids(host_id, [item_key for item_key, _ in series])
+
+        wanted = {}
+        for item_key, value_type in series:
+            window_key = (host_id, item_key, value_type, time_from, time_till)
+            item_id = self.itemids[(host_id, item_key)]
+            if window_key in self.history or item_id is None:
+                continue
+            wanted.setdefault(value_type, {}).setdefault(item_id, []).append(window_key)
+
+        for value_type, by_itemid in wanted.items():
+            parts = fetch_planned(self.fetch_history_chunks, self.fetch_trend, list(by_itemid), value_type, time_from, time_till)
+            for item_id, window_keys in by_itemid.items():
+                history_chunks, trends = parts[item_id]
+                history = Series.from_chunks(history_chunks)
+                for window_key in window_keys:
+                    self.history[window_key] = (history, trends)
+
+    # 回傳 Series；agg 決定 trend 每小時取哪個值，預設超標紀錄取峰值，原始資料取平均
+    def get(self, host_id, item_key, value_type, time_from, time_till, threshold=None, invert=False, agg=None):
+        window_key = (host_id, item_key, value_type, time_from, time_till)
+        if window_key not in self.history:
+            self.prefetch(host_id, [(item_key, value_type)], time_from, time_till)
+        if self.itemids.get((host_id, item_key)) is None:
+            print(f"No items found for key: {item_key}")
+            return Series()
+
+        if agg is None:
+            agg = "avg" if threshold is None else ("min" if invert else "max")
+        if (window_key, agg) not in self.series:
+            history, trends = self.history[window_key]
+            series = Series.from_chunks(iter_merged([(history.clocks, history.values)], trends, agg))
+            self.series[(window_key, agg)] = Series(series.clocks, convert_value(item_key, value_type, series.values))
+
+        series = self.series[(window_key, agg)]
+        if threshold is not None:
+            return series.exceeding(threshold, invert)
+        return series
+
+    # 統計（max / avg / min、超標次數、異常時間）
+    # 長區間較舊的部分為 trend，每小時只有 min / avg / max：超標次數、異常時間與峰值以 max（反向閾值為 min）計算，
+    # 平均取 avg，另一端取 min（反向閾值為 max），不會被每小時平均抹平；全部為原始資料時三者相同
+    def stats(self, host_id, item_key, value_type, time_from, time_till, threshold, invert=False, anomaly_threshold=None):
+        peak = self.get(host_id, item_key, value_type, time_from, time_till, agg="min" if invert else "max")
+        result = calculate_stats(peak, threshold, invert, anomaly_threshold)
+        if result is None or len(plan(time_from, time_till, value_type)) == 1:
+            return result
+        average = self.get(host_id, item_key, value_type, time_from, time_till, agg="avg")
+        result["avg"] = calculate_stats(average, None)["avg"]
+        other = "max" if invert else "min"
+        opposite = self.get(host_id, item_key, value_type, time_from, time_till, agg=other)
+        result[other] = calculate_stats(opposite, None)[other]
+        return result
+
+    # p50 / p95 / p99（已換算單位）；有 history_cache 時合併快取的每日 sketch，否則由這次取回的資料計算
+    # 長區間以 trend 取代的部分以每小時 avg 加入，權重為該小時的原始資料筆數 num
+    def percentiles(self, host_id, item_key, value_type, time_from, time_till):
+        item_id = self.itemids.get((host_id, item_key))
+        if item_id is None:
+            return None
+        if self.history_cache is not None:
+            sketch = self.history_cache.sketch(item_id, value_type, time_from, time_till, self.fetch_trend)
+        else:
+            window_key = (host_id, item_key, value_type, time_from, time_till)
+            if window_key not in self.history:
+                self.prefetch(host_id, [(item_key, value_type)], time_from, time_till)
+            history, (_, trend_values) = self.history[window_key]
+            sketch = QuantileSketch().add(history.values)
+            sketch.add(trend_values[:, AGGREGATES["avg"]], trend_values[:, NUM])
+        result = sketch.percentiles()
+        if result is None:
+            return None
+        return {name: float(convert_value(item_key, value_type, value)) for name, value in result.items()}
+
+def get_historical_data(history_store, host_id, item_key, value_type, time_from, time_till, threshold=None, invert=False):
+    return history_store.get(host_id, item_key, value_type, time_from, time_till, threshold, invert)
+
+def calculate_stats(data, threshold, invert=False, anomaly_threshold=None):
+    return summarize(data.clocks, data.values, threshold, invert, anomaly_threshold)
+
+def debug_list_keys(host_id, keyword):
+    params = {
+        "hostids": host_id,
+        "output": ["itemid", "name", "key_"]
+    }
+    items = zabbix_api_request("item.get", params)
+    for item in items:
+        print(f"{item['name']} ")
+        if keyword in item['key_']:
+            print(f"{item['itemid']} | {item['name']} | {item['key_']}")
+
+def list_hosts():
+    params = {
+        "output": ["hostid", "host", "name"]
+    }
+    hosts = zabbix_api_request("host.get", params)
+    for host in hosts:
+        print(f"hostid: {host['hostid']}, host: {host['host']}, name: {host['name']}")
+
+# 時間範圍：過去 7 天（collect() 執行時才以當下時間計算）
+num = 7 * 24 * 3600
+
+# 產生 PDF 的設定：大表格切成每頁一張小表格，reportlab 不必一次排版整張表，建置時間與筆數成正比
+ROWS_PER_TABLE = 45      # 每張表格的列數（一頁約可放 45 列，每列兩筆資料）
+BUILD_WORKERS = 2        # 兩份 PDF 各用一個 process 同時建置；設為 1 則依序建置
+
+DATA_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke)
+])
+
+# 依 ROWS_PER_TABLE 切成多張表格，共用同一個 TableStyle
+def chunked_tables(data, value_title, style):
+    tables = []
+    page_size = ROWS_PER_TABLE * 2
+    for start in range(0, max(len(data), 1), page_size):
+        table_data = format_two_column_table(data[start:start + page_size], "Timestamp", value_title, "Timestamp", value_title)
+        table = Table(table_data, colWidths=[120, 50, 120, 50])
+        table.setStyle(style)
+        tables.append(table)
+    return tables
+
+# 折線圖（資料已先以 LTTB 縮減），threshold 以紅色虛線標示
+CHART_WIDTH = 468        # letter 紙張扣掉左右邊界的寬度
+CHART_HEIGHT = 180
+
+def chart_drawing(data, threshold=None, width=CHART_WIDTH, height=CHART_HEIGHT):
+    drawing = Drawing(width, height)
+    layout = chart_layout(data, threshold, width, height)
+    if layout is None:
+        drawing.add(String(width / 2, height / 2, "No data", fontSize=10, textAnchor='middle'))
+        return drawing
+
+    margin = 40
+    drawing.add(Rect(margin, 10, width - margin - 10, height - margin - 10, fillColor=None, strokeColor=colors.lightgrey))
+    drawing.add(PolyLine([coord for point in layout["points"] for coord in point], strokeColor=colors.blue, strokeWidth=0.8))
+    if layout["threshold"] is not None:
+        drawing.add(Line(margin, layout["threshold"], width - 10, layout["threshold"],
+                         strokeColor=colors.red, strokeDashArray=[4, 3]))
+    drawing.add(String(margin - 4, height - 14, f"{layout['max']:.2f}", fontSize=8, textAnchor='end'))
+    drawing.add(String(margin - 4, margin, f"{layout['min']:.2f}", fontSize=8, textAnchor='end'))
+    drawing.add(String(margin, margin - 14, layout["start"], fontSize=8))
+    drawing.add(String(width - 10, margin - 14, layout["end"], fontSize=8, textAnchor='end'))
+    return drawing
+
+def percentile_row(metric, percentiles):
+    if percentiles is None:
+        return [metric, 'N/A', 'N/A', 'N/A']
+    return [metric] + [f"{percentiles[name]:.2f}" for name in ("p50", "p95", "p99")]
+
+def stats_row(metric, stats):
+    stats = format_summary(stats)
+    return [metric, stats['max'], stats['avg'], stats['min'], stats['violations'], stats['anomaly_duration']]
+
+# 所有項目中持續最久的異常區間
+def episode_rows(stats, metrics):
+    episodes = []
+    for metric in metrics:
+        for episode in (stats.get(metric["name"]) or {}).get("episodes", []):
+            episodes.append(dict(episode, metric=metric["stats_title"]))
+    rows = [["Metric", "Start", "End", "Duration", "Peak", "Mean"]]
+    for episode in longest_episodes(episodes):
+        end = format_timestamp(episode["end"]) + (" (ongoing)" if episode["ongoing"] else "")
+        rows.append([episode["metric"], format_timestamp(episode["start"]), end, format_duration(episode["duration"]),
+                     f"{episode['peak']:.2f}", f"{episode['mean']:.2f}"])
+    return rows
+
+# sections 為 [(標題, Series, 數值欄標題), ...]
+def build_report(pdf_file, system_info, stats_data, sections, episodes_data=None, percentiles_data=None):
+    doc = SimpleDocTemplate(pdf_file, pagesize=letter)
+    styles = getSampleStyleSheet()
+    elements = []
+
+    # Page 1: 系統資訊
+    elements.append(Paragraph("System Information", styles['Title']))
+    elements.append(Spacer(1, 12))
+    for key, value in system_info.items():
+        elements.append(Paragraph(f"<b>{key}:</b> {value}", styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+    # 摘要統計
+    elements.append(Paragraph("Summary Statistics (Last 7 Days)", styles['Title']))
+    elements.append(Spacer(1, 12))
+
+    stats_table = Table(stats_data, colWidths=[100, 60, 60, 60, 90, 90])
+    stats_table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+    ]))
+    elements.append(stats_table)
+
+    # 分位數（容量規劃用）
+    if percentiles_data and len(percentiles_data) > 1:
+        elements.append(Spacer(1, 12))
+        elements.append(Paragraph("Percentiles (Last 7 Days)", styles['Heading2']))
+        percentiles_table = Table(percentiles_data, colWidths=[160, 80, 80, 80])
+        percentiles_table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke)
+        ]))
+        elements.append(percentiles_table)
+
+    # 最長的異常區間（超過 anomaly 閾值的連續時段）
+    if episodes_data and len(episodes_data) > 1:
+        elements.append(Spacer(1, 12))
+        elements.append(Paragraph("Longest Anomaly Episodes", styles['Heading2']))
+        episodes_table = Table(episodes_data, colWidths=[100, 95, 125, 60, 45, 45])
+        episodes_table.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('FONTSIZE', (0, 0), (-1, -1), 8)
+        ]))
+        elements.append(episodes_table)
+    elements.append(Spacer(1, 300))  # 換頁
+
+    # Page 2: 資料報表
+    elements.append(Paragraph("Historical Data (Last 7 Days)", styles['Title']))
+    elements.append(Spacer(1, 12))
+
+    for i, (title, data, value_title) in enumerate(sections):
+        elements.append(Paragraph(title, styles['Heading2']))
+        elements.extend(chunked_tables(data[:num], value_title, DATA_TABLE_STYLE))
+        if i < len(sections) - 1:
+            elements.append(Spacer(1, 12))
+
+    # 輸出 PDF
+    try:
+        doc.build(elements)
+        print(f"Report generated: {pdf_file}")
+    except Exception as e:
+        print(f"Error generating PDF: {str(e)}")
+
+# 第二份 PDF（整段時間範圍的折線圖），sections 為 [(標題, 縮減後的 Series, 閾值), ...]
+def build_raw_report(pdf_file, sections):
+    doc_raw = SimpleDocTemplate(pdf_file, pagesize=letter)
+    styles = getSampleStyleSheet()
+    elements_raw = []
+
+    elements_raw.append(Paragraph("Historical Raw Data (Last 7 Days)", styles['Title']))
+    elements_raw.append(Spacer(1, 12))
+
+    for title, data, threshold in sections:
+        elements_raw.append(Paragraph(title, styles['Heading2']))
+        elements_raw.append(chart_drawing(data, threshold))
+        elements_raw.append(Spacer(1, 12))
+
+    try:
+        doc_raw.build(elements_raw)
+        print(f"Raw report generated: {pdf_file}")
+    except Exception as e:
+        print(f"Error generating raw PDF: {str(e)}")
+
+# 報表項目：超標紀錄的 key 與原始資料的 key（磁碟空間原始資料使用百分比）、閾值與各段標題
+# 網路流量已換算成 Kbps，折線圖的閾值也換算後再畫
+METRICS = [
+    {"name": "cpu", "key": 'system.cpu.util', "raw_key": 'system.cpu.util', "value_type": 0,
+     "threshold": THRESHOLDS["cpu"], "invert": False, "anomaly_threshold": 80, "chart_threshold": THRESHOLDS["cpu"],
+     "title": "CPU Utilization (%)", "value_title": "Value (%)", "stats_title": "CPU Utilization (%)", "raw_title": "CPU Utilization (Raw)"},
+    {"name": "mem", "key": 'vm.memory.size[pavailable]', "raw_key": 'vm.memory.size[pavailable]', "value_type": 0,
+     "threshold": THRESHOLDS["memory"], "invert": True, "anomaly_threshold": 20, "chart_threshold": THRESHOLDS["memory"],
+     "title": "Memory Available (%)", "value_title": "Value (%)", "stats_title": "Memory Available (%)", "raw_title": "Memory Available (%) (Raw)"},
+    {"name": "load", "key": 'system.cpu.load[all,avg1]', "raw_key": 'system.cpu.load[all,avg1]', "value_type": 0,
+     "threshold": THRESHOLDS["load"], "invert": False, "anomaly_threshold": 5, "chart_threshold": THRESHOLDS["load"],
+     "title": "Load Average", "value_title": "Value", "stats_title": "Load Average", "raw_title": "Load Average (Raw)"},
+    {"name": "iops", "key": 'custom.iops[dm-0]', "raw_key": 'custom.iops[dm-0]', "value_type": 0,
+     "threshold": THRESHOLDS["iops"], "invert": False, "anomaly_threshold": 1000, "chart_threshold": THRESHOLDS["iops"],
+     "title": "Disk Write Operations (ops/s)", "value_title": "Value", "stats_title": "Disk IOPS", "raw_title": "Disk IOPS (Raw)"},
+    {"name": "disk_space", "key": 'vfs.fs.size[/,used]', "raw_key": 'vfs.fs.size[/,pused]', "value_type": 0,
+     "threshold": THRESHOLDS["disk_space"], "invert": False, "anomaly_threshold": 90, "chart_threshold": THRESHOLDS["disk_space"],
+     "title": "Disk Space Used (GB)", "value_title": "Value (GB)", "stats_title": "Disk Space Used (GB)", "raw_title": "Disk Space Used (GB) (Raw)"},
+    {"name": "net_in", "key": 'net.if.in["ens160"]', "raw_key": 'net.if.in["ens160"]', "value_type": 3,
+     "threshold": THRESHOLDS["net_traffic"], "invert": False, "anomaly_threshold": 2000000, "chart_threshold": THRESHOLDS["net_traffic"] / 1000,
+     "title": "Network In (Kbps)", "value_title": "Value (Kbps)", "stats_title": "Network In (Kbps)", "raw_title": "Network In (Kbps) (Raw)"},
+    {"name": "net_out", "key": 'net.if.out["ens160"]', "raw_key": 'net.if.out["ens160"]', "value_type": 3,
+     "threshold": THRESHOLDS["net_traffic"], "invert": False, "anomaly_threshold": 2000000, "chart_threshold": THRESHOLDS["net_traffic"] / 1000,
+     "title": "Network Out (Kbps)", "value_title": "Value (Kbps)", "stats_title": "Network Out (Kbps)", "raw_title": "Network Out (Kbps) (Raw)"}
+]
+
+# 收集資料寫入 snapshot 的 "pdf" 區段：超標紀錄、原始資料的折線圖（已縮減）與統計
+# time_till 未指定時為現在，time_from 為 time_till 往前 num 秒
+def collect(snapshot, time_from=None, time_till=None):
+    time_till = int(time.time()) if time_till is None else time_till
+    time_from = time_till - num if time_from is None else time_from
+    get_zabbix_token()
+    print("Authentication successful")
+
+    list_hosts()
+
+    section = snapshot.section("pdf")
+    section["host_id"] = HOST_ID
+    section["time_from"] = time_from
+    section["time_till"] = time_till
+    section["system_info"] = get_system_info(HOST_ID)
+
+    history_store = HistoryStore(HistoryCache(), ItemIndex())
+    keys = []
+    for metric in METRICS:
+        for key in (metric["key"], metric["raw_key"]):
+            if (key, metric["value_type"]) not in keys:
+                keys.append((key, metric["value_type"]))
+    history_store.prefetch(HOST_ID, keys, time_from, time_till)
+    section["itemids"] = {key: history_store.itemids.get((HOST_ID, key)) for key, _ in keys}
+
+    stats = {}
+    percentiles = {}
+    for metric in METRICS:
+        with span("stats", metric=metric["name"]) as attrs:
+            data = get_historical_data(history_store, HOST_ID, metric["key"], metric["value_type"], time_from, time_till,
+                                       threshold=metric["threshold"], invert=metric["invert"])
+            # 原始資料（未過濾，與上面共用同一份歷史資料）只用在統計與折線圖
+            raw = get_historical_data(history_store, HOST_ID, metric["raw_key"], metric["value_type"], time_from, time_till)
+            stats[metric["name"]] = history_store.stats(HOST_ID, metric["raw_key"], metric["value_type"], time_from, time_till,
+                                                        metric["threshold"], invert=metric["invert"],
+                                                        anomaly_threshold=metric["anomaly_threshold"])
+            percentiles[metric["name"]] = history_store.percentiles(HOST_ID, metric["raw_key"], metric["value_type"],
+                                                                    time_from, time_till)
+            snapshot.add_series(f"pdf/{metric['name']}", data)
+            snapshot.add_series(f"pdf/{metric['name']}/chart", downsample(raw))
+            attrs["rows"] = len(raw)
+    section["stats"] = stats
+    section["percentiles"] = percentiles
+    get_client().close()
+    print(get_client().summary())
+
+# 從 snapshot 產生兩份 PDF，不需要連線
+def render(snapshot):
+    section = snapshot.section("pdf")
+    stats_data = [["Metric", "Max", "Average", "Min", "Thresh. Viol.", "Anomaly Dur."]]
+    sections = []
+    raw_sections = []
+    for metric in METRICS:
+        stats_data.append(stats_row(metric["stats_title"], section["stats"][metric["name"]]))
+        sections.append((metric["title"], snapshot.get_series(f"pdf/{metric['name']}"), metric["value_title"]))
+        raw_sections.append((metric["raw_title"], snapshot.get_series(f"pdf/{metric['name']}/chart"), metric["chart_threshold"]))
+    episodes_data = episode_rows(section["stats"], METRICS)
+    percentiles_data = [["Metric", "P50", "P95", "P99"]]
+    if "percentiles" in section:
+        percentiles_data.extend(percentile_row(metric["stats_title"], section["percentiles"].get(metric["name"]))
+                                for metric in METRICS)
+
+    if BUILD_WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=BUILD_WORKERS) as executor:
+            raw_future = executor.submit(build_raw_report, 'zabbix_raw_report.pdf', raw_sections)
+            report_future = executor.submit(build_report, 'zabbix_report.pdf', section["system_info"], stats_data, sections, episodes_data, percentiles_data)
+            raw_future.result()
+            report_future.result()
+    else:
+        build_raw_report('zabbix_raw_report.pdf', raw_sections)
+        build_report('zabbix_report.pdf', section["system_info"], stats_data, sections, episodes_data, percentiles_data)
+
+# 取得資料與產生報表；有 snapshot_path 時直接從 snapshot 產生
+# days：報表涵蓋的天數（預設 7 天）；超過 8 天（TREND_AFTER）時較舊的部分改用 trend
+def main(snapshot_path=None, days=None):
+    if snapshot_path is not None:
+        snapshot = Snapshot.load(snapshot_path)
+        if not snapshot.has("pdf"):
+            print(f"No PDF data in snapshot: {snapshot_path}")
+            return
+    else:
+        snapshot = Snapshot()
+        time_till = int(time.time())
+        time_from = time_till - days * 24 * 3600 if days is not None else None
+        with span("collect", report="pdf"):
+            collect(snapshot, time_from, time_till)
+    with span("render", report="pdf"):
+        render(snapshot)
+
+if __name__ == "__main__":
+    main()
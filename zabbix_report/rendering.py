@@ -0,0 +1,45 @@
+import os
+import threading
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from .trace import span
+
+# HTML 報表共用的 Jinja2 環境
+# - 編譯後的模板（bytecode）存在本機，下次執行（以及 fleet 模式的每個 process）不必重新編譯；模板檔修改後自動重新編譯
+# - template.generate() 逐段寫進檔案，不先組成整份 HTML 字串；先寫暫存檔再改名，寫到一半失敗時不留下不完整的報表
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+TEMPLATE_CACHE = os.environ.get(
+    "ZABBIX_TEMPLATE_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "zabbix_report", "templates")
+)
+
+_environment = None
+_lock = threading.Lock()
+
+# 目前目錄有同名模板（例如 report.html）時優先使用，否則使用套件內建的模板
+def environment():
+    global _environment
+    with _lock:
+        if _environment is None:
+            os.makedirs(TEMPLATE_CACHE, exist_ok=True)
+            _environment = Environment(
+                loader=FileSystemLoader(['.', TEMPLATE_DIR]),
+                bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE)
+            )
+        return _environment
+
+def render_to_file(name, path, **context):
+    template = environment().get_template(name)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with span("template.render", template=name) as attrs, open(tmp_path, "w", encoding="utf-8") as f:
+        size = 0
+        for chunk in template.generate(**context):
+            f.write(chunk)
+            size += len(chunk)
+        attrs["chars"] = size
+    os.replace(tmp_path, path)
@@ -0,0 +1,73 @@
+import numpy as np
+
+# 依查詢時間長度決定解析度：
+# 時間範圍超過 TREND_AFTER 時，較舊的部分改用 trend.get 的每小時 min/avg/max，
+# 只有最近 RAW_TAIL 秒（trend 還沒寫入的小時）仍向 history.get 要原始資料，兩段再接起來
+
+TREND_AFTER = 8 * 24 * 3600   # 週報（7 天）維持原始資料，月報等長區間才改用 trend
+RAW_TAIL = 3 * 3600           # 最近 3 小時保留原始資料
+HOUR = 3600
+
+# trend 陣列每列為 (min, avg, max, num)，num 為該小時的原始資料筆數（計算分位數時作為 avg 的權重）
+AGGREGATES = {"min": 0, "avg": 1, "max": 2}
+NUM = 3
+
+# 回傳 [(來源, time_from, time_till), ...]，來源為 "trend" 或 "history"
+# trend 只有數值型 (value_type 0 / 3) 才有
+def plan(time_from, time_till, value_type, trend_after=TREND_AFTER, raw_tail=RAW_TAIL):
+    if value_type not in (0, 3) or time_till - time_from <= trend_after:
+        return [("history", time_from, time_till)]
+
+    # trend 以整點為單位；起點所在的那一小時整段使用 trend
+    trend_from = time_from // HOUR * HOUR
+    trend_till = (time_till - raw_tail) // HOUR * HOUR
+    if trend_till <= trend_from:
+        return [("history", time_from, time_till)]
+    return [("trend", trend_from, trend_till - 1), ("history", trend_till, time_till)]
+
+# fetch_history(itemids, value_type, time_from, time_till) 回傳 {itemid: 逐段 (clocks, values) 陣列}
+# fetch_trend(itemids, value_type, time_from, time_till) 回傳 trend.get 的結果
+# 回傳 {itemid: (history_chunks, (trend_clocks, trend_values))}，trend_values 每列為 (min, avg, max, num)
+def fetch_planned(fetch_history, fetch_trend, itemids, value_type, time_from, time_till,
+                  trend_after=TREND_AFTER, raw_tail=RAW_TAIL):
+    history = {itemid: [] for itemid in itemids}
+    trends = {itemid: [] for itemid in itemids}
+    for source, segment_from, segment_till in plan(time_from, time_till, value_type, trend_after, raw_tail):
+        if source == "history":
+            for itemid, chunks in fetch_history(itemids, value_type, segment_from, segment_till).items():
+                history[itemid].append(chunks)
+        else:
+            for entry in fetch_trend(itemids, value_type, segment_from, segment_till):
+                if entry['itemid'] in trends:
+                    trends[entry['itemid']].append(trend_row(entry))
+    return {itemid: (chain(history[itemid]), trend_arrays(trends[itemid])) for itemid in itemids}
+
+# trend.get 的一筆 → (clock, min, avg, max, num)；沒有 num 欄位時權重為 1
+def trend_row(entry):
+    return (
+        int(entry['clock']),
+        float(entry['value_min']),
+        float(entry['value_avg']),
+        float(entry['value_max']),
+        float(entry.get('num', 1))
+    )
+
+def chain(iterables):
+    for iterable in iterables:
+        yield from iterable
+
+def trend_arrays(rows):
+    rows.sort()
+    clocks = np.array([row[0] for row in rows], dtype=np.int64)
+    values = np.array([row[1:] for row in rows], dtype=np.float64).reshape(len(rows), 4)
+    return clocks, values
+
+# 把 trend 與原始資料接成一條，逐段 yield (clocks, values)
+# agg 決定每小時取哪個值：超標紀錄用 max（反向閾值用 min），一般趨勢用 avg
+def iter_merged(history_chunks, trends, agg="avg"):
+    trend_clocks, trend_values = trends
+    if len(trend_clocks):
+        yield trend_clocks, trend_values[:, AGGREGATES[agg]]
+    for clocks, values in history_chunks:
+        if len(clocks):
+            yield clocks, values
@@ -0,0 +1,58 @@
+import numpy as np
+
+from .stats import exceeds, format_timestamp
+
+# 以 int64 clock / float64 value 陣列保存的時間序列（每筆 16 bytes）
+# 取用時才格式化成 [timestamp, "%.2f"]，因此可以直接交給 format_two_column_table 或 Jinja 樣板逐筆走訪
+class Series:
+    __slots__ = ("clocks", "values")
+
+    def __init__(self, clocks=None, values=None):
+        self.clocks = np.asarray(clocks if clocks is not None else [], dtype=np.int64)
+        self.values = np.asarray(values if values is not None else [], dtype=np.float64)
+
+    # points 為 [(clock, value), ...]
+    @classmethod
+    def from_points(cls, points):
+        count = len(points)
+        return cls(np.fromiter((point[0] for point in points), dtype=np.int64, count=count),
+                   np.fromiter((point[1] for point in points), dtype=np.float64, count=count))
+
+    # chunks 為逐段的 Series 或 (clocks, values)
+    @classmethod
+    def from_chunks(cls, chunks):
+        clocks = []
+        values = []
+        for chunk in chunks:
+            chunk_clocks, chunk_values = (chunk.clocks, chunk.values) if isinstance(chunk, Series) else chunk
+            clocks.append(chunk_clocks)
+            values.append(chunk_values)
+        if not clocks:
+            return cls()
+        return cls(np.concatenate(clocks), np.concatenate(values))
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Series(self.clocks[index], self.values[index])
+        return [format_timestamp(self.clocks[index]), f"{self.values[index]:.2f}"]
+
+    def __iter__(self):
+        for clock, value in zip(self.clocks.tolist(), self.values.tolist()):
+            yield [format_timestamp(clock), f"{value:.2f}"]
+
+    def __repr__(self):
+        return f"Series({len(self)} points)"
+
+    # 超過閾值（invert 時為低於閾值）的部分
+    def exceeding(self, threshold, invert=False):
+        mask = exceeds(self.values, threshold, invert)
+        return Series(self.clocks[mask], self.values[mask])
+
+    def scaled(self, divisor):
+        return Series(self.clocks, self.values / divisor)
+
+    def rows(self, limit=None):
+        return list(self[:limit] if limit is not None else self)
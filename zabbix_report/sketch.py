@@ -0,0 +1,120 @@
+import math
+
+import numpy as np
+
+# 可合併的分位數 sketch（t-digest）：不保留每一筆資料，只保留最多約 compression / 2 個 centroid (mean, weight)
+# 靠近兩端（p1、p99）的 centroid 較小，尾端分位數的誤差也較小；兩個 sketch 合併後仍是同樣大小的 sketch，
+# 因此每天的 sketch 可以合併成一週 / 一個月，各主機的 sketch 可以合併成全體主機，不必重新讀原始資料
+# 壓縮時一次排序後依 k1 尺度函數 k(q) = compression / (2π) · asin(2q - 1) 分組，以 reduceat 合併，不逐筆迴圈
+
+COMPRESSION = 200
+BUFFER_SIZE = 20000      # 累積這麼多筆才壓縮一次
+PERCENTILES = (50, 95, 99)
+
+class QuantileSketch:
+    def __init__(self, compression=COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0, dtype=np.float64)
+        self.weights = np.empty(0, dtype=np.float64)
+        self.pending = []     # 尚未壓縮的 (means, weights)
+        self.buffered = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    @property
+    def count(self):
+        self.compress()
+        return int(self.weights.sum())
+
+    # weights：每個值代表的筆數，例如 trend 每小時的 avg 以該小時的原始資料筆數 num 為權重；未指定時每個值為 1 筆
+    def add(self, values, weights=None):
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if weights is None:
+            weights = np.ones(len(values))
+        else:
+            weights = np.asarray(weights, dtype=np.float64).ravel()
+        keep = ~np.isnan(values) & (weights > 0)
+        values, weights = values[keep], weights[keep]
+        if len(values) == 0:
+            return self
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.pending.append((values, weights))
+        self.buffered += len(values)
+        if self.buffered >= BUFFER_SIZE:
+            self.compress()
+        return self
+
+    def merge(self, other):
+        other.compress()
+        if len(other.means):
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.pending.append((other.means, other.weights))
+            self.buffered += len(other.means)
+            self.compress()
+        return self
+
+    def compress(self):
+        if not self.pending:
+            return
+        means = np.concatenate([self.means] + [part[0] for part in self.pending])
+        weights = np.concatenate([self.weights] + [part[1] for part in self.pending])
+        self.pending = []
+        self.buffered = 0
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+
+        # 以每個點（或 centroid）中心的累積比例決定組別，同一組的 k 值相差不到 1
+        total = weights.sum()
+        cumulative = np.cumsum(weights) - weights / 2
+        k = self.compression / (2 * math.pi) * np.arcsin(np.clip(2 * cumulative / total - 1, -1, 1))
+        groups = np.floor(k).astype(np.int64)
+        starts = np.concatenate(([0], np.nonzero(np.diff(groups))[0] + 1))
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    # 依 centroid 中心的累積權重線性內插，兩端以 min / max 補齊
+    def quantiles(self, qs):
+        self.compress()
+        qs = np.asarray(qs, dtype=np.float64)
+        if len(self.means) == 0:
+            return np.full(qs.shape, np.nan)
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.concatenate(([0.0], centers, [total]))
+        values = np.concatenate(([self.min], self.means, [self.max]))
+        return np.interp(qs * total, positions, values)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    # {"p50": 值, "p95": 值, "p99": 值}；沒有資料時為 None
+    def percentiles(self, percentiles=PERCENTILES):
+        if self.count == 0:
+            return None
+        values = self.quantiles([p / 100 for p in percentiles])
+        return {f"p{p}": float(value) for p, value in zip(percentiles, values.tolist())}
+
+    # 存進快取：[compression, min, max, centroid 數, means..., weights...]（float64）
+    def to_bytes(self):
+        self.compress()
+        header = np.array([self.compression, self.min, self.max, len(self.means)], dtype=np.float64)
+        return np.concatenate((header, self.means, self.weights)).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        array = np.frombuffer(data, dtype=np.float64)
+        sketch = cls(int(array[0]))
+        sketch.min, sketch.max, size = float(array[1]), float(array[2]), int(array[3])
+        sketch.means = array[4:4 + size].copy()
+        sketch.weights = array[4 + size:4 + 2 * size].copy()
+        return sketch
+
+# 多個 sketch 合併成一個新的 sketch（不修改原本的 sketch）
+def merge_sketches(sketches, compression=COMPRESSION):
+    merged = QuantileSketch(compression)
+    for sketch in sketches:
+        if sketch is not None:
+            merged.merge(sketch)
+    return merged
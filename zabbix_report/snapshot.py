@@ -0,0 +1,53 @@
+import json
+import time
+
+import numpy as np
+
+from .series import Series
+
+# 一次收集的結果：主機資訊、itemid、時間序列與統計
+# PDF / HTML / Excel 都可以從同一份 snapshot 產生報表，不必再連線 Zabbix（也可以離線重新產生）
+# 檔案為 np.savez_compressed：中繼資料以 JSON 存在 "meta"，每條時間序列存成 c<n> (clock) / v<n> (value) 兩個陣列
+
+SNAPSHOT_VERSION = 1
+
+class Snapshot:
+    def __init__(self, meta=None, series=None):
+        self.meta = meta if meta is not None else {
+            "version": SNAPSHOT_VERSION,
+            "created": int(time.time())
+        }
+        self.series = series if series is not None else {}
+
+    # 各報表的資料放在自己的區段（"pdf" / "html" / "xlsx"）
+    def section(self, name):
+        return self.meta.setdefault(name, {})
+
+    def has(self, name):
+        return name in self.meta
+
+    def add_series(self, name, series):
+        self.series[name] = series
+
+    def get_series(self, name):
+        return self.series.get(name, Series())
+
+    def save(self, path):
+        names = sorted(self.series)
+        meta = dict(self.meta, series=names)
+        arrays = {"meta": np.frombuffer(json.dumps(meta, ensure_ascii=False).encode("utf-8"), dtype=np.uint8)}
+        for i, name in enumerate(names):
+            arrays[f"c{i}"] = self.series[name].clocks
+            arrays[f"v{i}"] = self.series[name].values
+        with open(path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("version") != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version {meta.get('version')} in {path} (expected {SNAPSHOT_VERSION})")
+            names = meta.pop("series")
+            series = {name: Series(data[f"c{i}"], data[f"v{i}"]) for i, name in enumerate(names)}
+        return cls(meta, series)
@@ -0,0 +1,265 @@
+from datetime import datetime
+from fractions import Fraction
+
+import numpy as np
+
+# 以 int64 clock / float64 value 陣列計算統計，字串格式化留到產生報表時才做
+# 原本的流程是先格式化成 "%.2f" 字串再 float() 回來計算，這裡以 round_cents 維持相同的數字
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def format_timestamp(clock):
+    return datetime.fromtimestamp(int(clock)).strftime(TIMESTAMP_FORMAT)
+
+# 等同 float(f"{value:.2f}")
+# value * 100 本身會有捨入誤差，剛好落在半分附近的少數值改用字串格式化處理
+def round_cents(values):
+    values = np.asarray(values, dtype=np.float64)
+    scaled = values * 100
+    rounded = np.rint(scaled) / 100
+    distance = np.abs(scaled - np.floor(scaled) - 0.5)
+    for i in np.nonzero(distance < 1e-6 + np.abs(scaled) * 1e-12)[0].tolist():
+        rounded[i] = float(f"{values[i]:.2f}")
+    return rounded
+
+# 兩位小數的值（最小非零值 0.01 > 2**-7）都是 2**-59 的整數倍，
+# 以整數精確加總，平均值與 statistics.mean 完全相同，而且可以逐段累加
+EXACT_SHIFT = 59
+
+def exact_sum(values):
+    mantissas, exponents = np.frexp(values)
+    mantissas = (mantissas * 2.0 ** 53).astype(np.int64)
+    total = 0
+    for exponent in np.unique(exponents).tolist():
+        selected = mantissas[exponents == exponent]
+        # 拆成高低兩半再加總，避免 int64 溢位
+        high = int((selected >> 26).sum())
+        low = int((selected & ((1 << 26) - 1)).sum())
+        total += ((high << 26) + low) << (exponent - 53 + EXACT_SHIFT)
+    return total
+
+def exact_mean(total, count):
+    return float(Fraction(total, count << EXACT_SHIFT))
+
+def exceeds(values, threshold, invert=False):
+    return values < threshold if invert else values > threshold
+
+# 異常區間（run-length）：連續異常的樣本合併成一段 (start, end, peak, mean, samples)
+# end 為第一筆恢復正常的時間；持續到最後一筆仍異常的那一段算到最後一筆，標記為 ongoing
+# 每段資料以 np.diff 找出邊界、reduceat 計算峰值與總和，不逐筆迴圈；只有跨段延續的區間以 Python 處理
+# 兩段之間恢復正常不到 merge_gap 秒時，episodes() 合併成一段（短暫回到閾值以下的抖動不拆成多段）
+EPISODE_GAP = 300        # 秒
+EPISODES_SHOWN = 10      # 報表列出的最長區間數
+
+class EpisodeIndex:
+    def __init__(self, threshold, invert=False, merge_gap=EPISODE_GAP):
+        self.threshold = threshold
+        self.invert = invert
+        self.merge_gap = merge_gap
+        self.parts = []        # 已結束的區間，每段資料一組 (starts, ends, peaks, sums, counts)
+        self.open = None       # 尚未結束的區間 (start, peak, sum, count)
+        self.last_clock = None
+
+    def peak(self, a, b):
+        return min(a, b) if self.invert else max(a, b)
+
+    # anomalous 為已算好的布林陣列時直接使用（例如 StreamingSummary 以兩位小數比較）
+    def push(self, clocks, values, anomalous=None):
+        if len(values) == 0:
+            return self
+        clocks = np.asarray(clocks, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if anomalous is None:
+            anomalous = exceeds(values, self.threshold, self.invert)
+        edges = np.diff(np.concatenate(([0], anomalous.astype(np.int8), [0])))
+        starts = np.nonzero(edges == 1)[0]
+        stops = np.nonzero(edges == -1)[0]
+        counts = stops - starts
+        if len(starts):
+            selected = values[anomalous]
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            peaks = (np.minimum if self.invert else np.maximum).reduceat(selected, offsets)
+            sums = np.add.reduceat(selected, offsets)
+        else:
+            peaks = sums = np.empty(0, dtype=np.float64)
+        start_clocks = clocks[starts]
+        end_clocks = clocks[np.minimum(stops, len(clocks) - 1)]
+
+        if self.open is not None:
+            start, peak, total, count = self.open
+            if len(starts) and starts[0] == 0:
+                # 上一段資料最後的區間延續到這一段
+                start_clocks[0] = start
+                peaks[0] = self.peak(peak, peaks[0])
+                sums[0] += total
+                counts[0] += count
+            else:
+                self.parts.append((np.array([start]), clocks[:1], np.array([peak]), np.array([total]), np.array([count])))
+        self.open = None
+        if len(starts) and stops[-1] == len(clocks):
+            self.open = (int(start_clocks[-1]), float(peaks[-1]), float(sums[-1]), int(counts[-1]))
+            start_clocks, end_clocks, peaks, sums, counts = start_clocks[:-1], end_clocks[:-1], peaks[:-1], sums[:-1], counts[:-1]
+        if len(start_clocks):
+            self.parts.append((start_clocks, end_clocks, peaks, sums, counts))
+        self.last_clock = int(clocks[-1])
+        return self
+
+    # 合併前的 (starts, ends, peaks, sums, counts)，含尚未結束的區間；第六個值表示最後一段是否仍在持續
+    def arrays(self):
+        parts = list(self.parts)
+        if self.open is not None:
+            start, peak, total, count = self.open
+            parts.append((np.array([start]), np.array([self.last_clock]), np.array([peak]), np.array([total]), np.array([count])))
+        if not parts:
+            return tuple(np.empty(0) for _ in range(5)) + (False,)
+        return tuple(np.concatenate(column) for column in zip(*parts)) + (self.open is not None,)
+
+    # 各段異常時間的總和（不含合併時補上的間隔）
+    def duration(self):
+        starts, ends = self.arrays()[:2]
+        return int((ends - starts).sum())
+
+    # 依開始時間排列：[{"start", "end", "duration", "peak", "mean", "samples", "ongoing"}, ...]
+    def episodes(self):
+        starts, ends, peaks, sums, counts, ongoing = self.arrays()
+        if len(starts) == 0:
+            return []
+        first = np.concatenate(([True], starts[1:] - ends[:-1] >= self.merge_gap))
+        groups = np.nonzero(first)[0]
+        last = np.concatenate((groups[1:] - 1, [len(starts) - 1]))
+        peaks = (np.minimum if self.invert else np.maximum).reduceat(peaks, groups)
+        sums = np.add.reduceat(sums, groups)
+        counts = np.add.reduceat(counts, groups)
+        return [
+            {
+                "start": start, "end": end, "duration": end - start, "peak": peak, "mean": total / count,
+                "samples": count, "ongoing": ongoing and i == len(groups) - 1
+            }
+            for i, (start, end, peak, total, count) in enumerate(zip(
+                starts[groups].tolist(), ends[last].tolist(), peaks.tolist(), sums.tolist(), counts.tolist()
+            ))
+        ]
+
+# 多個項目的區間合併後取最長的 k 段（同長度時先發生的在前）
+def longest_episodes(episodes, k=EPISODES_SHOWN):
+    return sorted(episodes, key=lambda episode: (-episode["duration"], episode["start"]))[:k]
+
+# 1d 02:03:04
+def format_duration(seconds):
+    days, seconds = divmod(int(seconds), 86400)
+    hours, seconds = divmod(seconds, 3600)
+    text = f"{hours:02d}:{seconds // 60:02d}:{seconds % 60:02d}"
+    return f"{days}d {text}" if days else text
+
+# 逐段累加的統計：max / avg / min、超標次數、異常持續時間與異常區間
+# 異常持續時間：每段連續異常從第一筆起算，到第一筆恢復正常的時間為止；
+# 持續到最後一筆仍異常的那一段算到最後一筆（即 EpisodeIndex 合併前各段的總和）
+class StreamingSummary:
+    def __init__(self, threshold, invert=False, anomaly_threshold=None):
+        self.threshold = threshold
+        self.invert = invert
+        self.anomaly_threshold = anomaly_threshold
+        self.count = 0
+        self.total = 0
+        self.max = None
+        self.min = None
+        self.violations = 0
+        self.episodes = EpisodeIndex(anomaly_threshold, invert) if anomaly_threshold is not None else None
+
+    def push(self, clocks, values):
+        if len(values) == 0:
+            return self
+        values = round_cents(values)
+        self.count += len(values)
+        self.total += exact_sum(values)
+        self.max = float(values.max()) if self.max is None else max(self.max, float(values.max()))
+        self.min = float(values.min()) if self.min is None else min(self.min, float(values.min()))
+        if self.threshold is not None:
+            self.violations += int(np.count_nonzero(exceeds(values, self.threshold, self.invert)))
+        if self.episodes is not None:
+            self.episodes.push(clocks, values, exceeds(values, self.anomaly_threshold, self.invert))
+        return self
+
+    def result(self):
+        if self.count == 0:
+            return None
+        return {
+            'max': self.max,
+            'avg': exact_mean(self.total, self.count),
+            'min': self.min,
+            'violations': self.violations,
+            'anomaly_duration': self.episodes.duration() if self.episodes is not None else 0,
+            'episodes': self.episodes.episodes() if self.episodes is not None else []
+        }
+
+# chunks 為逐段的 (clocks, values)；也可以直接傳入單一陣列
+def summarize_chunks(chunks, threshold, invert=False, anomaly_threshold=None):
+    summary = StreamingSummary(threshold, invert, anomaly_threshold)
+    for clocks, values in chunks:
+        summary.push(clocks, values)
+    return summary.result()
+
+def summarize(clocks, values, threshold, invert=False, anomaly_threshold=None):
+    return summarize_chunks([(clocks, values)], threshold, invert, anomaly_threshold)
+
+def format_summary(stats):
+    if stats is None:
+        return {
+            'max': 'N/A', 'avg': 'N/A', 'min': 'N/A',
+            'violations': 0, 'anomaly_duration': '0s'
+        }
+    return {
+        'max': f"{stats['max']:.2f}",
+        'avg': f"{stats['avg']:.2f}",
+        'min': f"{stats['min']:.2f}",
+        'violations': stats['violations'],
+        'anomaly_duration': f"{int(stats['anomaly_duration'])}s"
+    }
+
+# 串流 Top-K：每次 push 一段資料只保留前 k 筆（argpartition，O(n)），不必整條排序也不建立每筆 dict
+# 同值依到達順序（時間先後、主機先後）排列，與原本穩定排序的結果相同
+# 各主機的 TopK 可再 merge 成全體主機的 Top-K
+class TopK:
+    def __init__(self, k=10, largest=True):
+        self.k = k
+        self.largest = largest
+        self.clocks = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.float64)
+        self.labels = np.empty(0, dtype=object)
+
+    def keys(self, values):
+        return -values if self.largest else values
+
+    # 回傳要保留的索引（依到達順序）
+    def select(self, values):
+        if len(values) <= self.k:
+            return np.arange(len(values))
+        keys = self.keys(values)
+        kth = np.partition(keys, self.k - 1)[self.k - 1]
+        better = np.nonzero(keys < kth)[0]
+        ties = np.nonzero(keys == kth)[0][:self.k - len(better)]
+        return np.sort(np.concatenate((better, ties)))
+
+    def push(self, clocks, values, label=None):
+        clocks = np.asarray(clocks, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        index = self.select(values)
+        labels = np.empty(len(index), dtype=object)
+        labels[:] = [label] * len(index)
+        self.extend(clocks[index], values[index], labels)
+
+    def merge(self, other):
+        self.extend(other.clocks, other.values, other.labels)
+
+    def extend(self, clocks, values, labels):
+        self.clocks = np.concatenate((self.clocks, clocks))
+        self.values = np.concatenate((self.values, values))
+        self.labels = np.concatenate((self.labels, labels))
+        if len(self.values) > self.k:
+            index = self.select(self.values)
+            self.clocks, self.values, self.labels = self.clocks[index], self.values[index], self.labels[index]
+
+    # [(label, clock, value), ...]，由最嚴重排到最輕微
+    def items(self):
+        order = np.argsort(self.keys(self.values), kind="stable")
+        return [(self.labels[i], int(self.clocks[i]), float(self.values[i])) for i in order.tolist()]
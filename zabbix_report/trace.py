@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 執行過程的分段計時：登入、item 索引、每次 API 呼叫（筆數 / bytes）、JSON 解碼、歷史快取、統計與產生報表
+# span() 只在 enable() 之後記錄（沒有開啟時幾乎沒有額外成本），結束時寫成 JSON trace 或 Prometheus textfile
+# Prometheus textfile 給 node_exporter 的 textfile collector 讀取，每晚執行後即可在 dashboard 看到各階段的趨勢
+
+METRIC_PREFIX = "zabbix_report"
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.spans = []
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.extra = {}      # 整次執行的數值，例如 tracemalloc 峰值
+
+    def enable(self):
+        self.enabled = True
+        self.spans = []
+        self.started = time.time()
+        self.start = time.perf_counter()
+
+    # with span("history.get", itemids=3) as attrs: ... attrs["rows"] = len(rows)
+    @contextmanager
+    def span(self, name, **attrs):
+        if not self.enabled:
+            yield attrs
+            return
+        start = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            duration = time.perf_counter() - start
+            with self.lock:
+                self.spans.append({
+                    "name": name,
+                    "start": round(start - self.start, 6),
+                    "duration": round(duration, 6),
+                    "thread": threading.current_thread().name,
+                    "attrs": attrs
+                })
+
+    # 其他 process（fleet 模式的 shard）記錄的 span 併入這次執行，thread 前面加上來源
+    def add_spans(self, spans, source):
+        with self.lock:
+            self.spans.extend(dict(span, thread=f"{source} {span['thread']}") for span in spans)
+
+    # 依名稱彙總：次數、總秒數、最長秒數，以及 rows / bytes 的總和
+    def summary(self):
+        phases = {}
+        with self.lock:
+            spans = list(self.spans)
+        for span in spans:
+            phase = phases.setdefault(span["name"], {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "rows": 0, "bytes": 0})
+            phase["count"] += 1
+            phase["seconds"] += span["duration"]
+            phase["max_seconds"] = max(phase["max_seconds"], span["duration"])
+            for field in ("rows", "bytes"):
+                value = span["attrs"].get(field)
+                if isinstance(value, (int, float)):
+                    phase[field] += value
+        return phases
+
+    def run_info(self):
+        info = {"started": int(self.started), "seconds": round(time.perf_counter() - self.start, 6)}
+        try:
+            import resource
+            # Linux 的 ru_maxrss 單位為 KB
+            info["peak_rss_bytes"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            pass
+        info.update(self.extra)
+        return info
+
+    def write_json(self, path, report):
+        with self.lock:
+            spans = list(self.spans)
+        data = {"report": report, "run": self.run_info(), "phases": self.summary(), "spans": spans}
+        write_atomic(path, json.dumps(data, ensure_ascii=False, indent=2, default=str))
+
+    def write_prometheus(self, path, report):
+        run = self.run_info()
+        label = f'report="{report}"'
+        lines = [
+            f"# HELP {METRIC_PREFIX}_run_seconds Wall time of the report run.",
+            f"# TYPE {METRIC_PREFIX}_run_seconds gauge",
+            f"{METRIC_PREFIX}_run_seconds{{{label}}} {run['seconds']}",
+            f"# HELP {METRIC_PREFIX}_last_run_timestamp_seconds Start time of the last report run.",
+            f"# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{METRIC_PREFIX}_last_run_timestamp_seconds{{{label}}} {run['started']}"
+        ]
+        for name in ("peak_rss_bytes", "tracemalloc_peak_bytes"):
+            if name in run:
+                lines.extend([
+                    f"# TYPE {METRIC_PREFIX}_{name} gauge",
+                    f"{METRIC_PREFIX}_{name}{{{label}}} {run[name]}"
+                ])
+        phases = self.summary()
+        for metric, field, help_text in (
+            ("phase_seconds", "seconds", "Total time spent in each phase."),
+            ("phase_max_seconds", "max_seconds", "Longest single span of each phase."),
+            ("phase_calls", "count", "Number of spans of each phase."),
+            ("phase_rows", "rows", "Rows returned in each phase."),
+            ("phase_bytes", "bytes", "Response bytes in each phase.")
+        ):
+            lines.append(f"# HELP {METRIC_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{metric} gauge")
+            for phase, values in sorted(phases.items()):
+                escaped = phase.replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{METRIC_PREFIX}_{metric}{{{label},phase="{escaped}"}} {values[field]}')
+        write_atomic(path, "\n".join(lines) + "\n")
+
+# textfile collector 可能在寫到一半時讀取，先寫暫存檔再改名
+def write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+tracer = Tracer()
+
+def span(name, **attrs):
+    return tracer.span(name, **attrs)
@@ -0,0 +1,203 @@
+import gzip
+import heapq
+import itertools
+import os
+import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .client import ZabbixClient
+from .history_cache import HistoryCache
+from .series import Series
+from .snapshot import Snapshot
+from .trace import span
+
+# Zabbix API 端點
+url = os.environ.get("ZABBIX_URL", "http://10.40.4.67:8090/api_jsonrpc.php")
+
+# Zabbix 登入憑證
+username = "Admin"  # 替換為您的 Zabbix 帳號
+password = "zabbix"  # 替換為您的 Zabbix 密碼
+
+# 第一次連線時才建立，import 本模組不會讀取 token 快取；各頁籤的執行緒共用同一個
+client = None
+_lock = threading.Lock()
+
+def get_client():
+    global client
+    if client is None:
+        with _lock:
+            if client is None:
+                client = ZabbixClient(url, username, password)
+    return client
+
+# 自動獲取 auth_token（沿用上次執行的 token，過期時才重新登入）
+def get_auth_token():
+    try:
+        auth_token = get_client().login()
+    except Exception as e:
+        print(f"Login failed: {e}")
+        exit()
+    print("Successfully logged in.")
+    return auth_token
+
+num = 3600 * 30
+
+# 定義頁籤名稱與對應的 itemids
+tabs = {
+    "CPU Utilization %": ["48119"],  # 例如 CPU 使用率
+    "Memory Usage %": ["48096"],     # 例如記憶體使用量
+    "Memory Swap Free %": ["48093"],
+    "Disk Usage %": ["48168"],
+    "Disk data Usage %": ["48170"],
+    "Disk docker Usage %": ["48171"]
+}
+
+# 輸出設定：資料從快取逐段讀出直接寫檔，不在記憶體中組整張表
+FETCH_WORKERS = 4            # 同時抓取的頁籤數
+EXCEL_MAX_ROWS = 1048576     # Excel 每個工作表的列數上限（含標題列），超過時接續寫到下一個工作表
+
+# 本機歷史快取：第二次之後只向 Zabbix 要上次執行之後的新資料（第一次使用時才開啟快取檔）
+history_cache = None
+
+def get_history_cache():
+    global history_cache
+    if history_cache is None:
+        with _lock:
+            if history_cache is None:
+                history_cache = HistoryCache()
+    return history_cache
+
+def fetch_history(itemids, value_type, time_from, time_till, sortorder="ASC", limit=None):
+    params = {
+        "output": "extend",
+        "history": value_type,  # 0 for numeric data
+        "itemids": itemids,
+        "sortfield": "clock",
+        "sortorder": sortorder
+    }
+    if time_from is not None:
+        params["time_from"] = time_from
+    if time_till is not None:
+        params["time_till"] = time_till
+    if limit is not None:
+        params["limit"] = limit  # 限制返回的記錄數
+    return get_client().call("history.get", params)
+
+# 補齊一個頁籤所有 itemid 的快取
+def update_tab(itemids):
+    for itemid in itemids:
+        get_history_cache().update_latest(fetch_history, itemid, 0, num)
+
+# 依 clock 由新到舊逐筆 yield (clock, value)，同一頁籤的多個 itemid 合併後取最新 num 筆
+def iter_tab(itemids):
+    streams = [itertools.chain.from_iterable(get_history_cache().iter_latest(itemid, num)) for itemid in itemids]
+    return itertools.islice(heapq.merge(*streams, reverse=True), num)
+
+# 與原本 pd.to_datetime(unit="s") 相同，以 UTC 表示
+def to_datetime(clock):
+    return datetime.fromtimestamp(clock, timezone.utc).replace(tzinfo=None)
+
+# constant_memory 模式下 xlsxwriter 每寫完一列就寫到暫存檔，記憶體用量固定；時間寫成 Excel 原生日期
+# tab_rows 為 [(頁籤名稱, 逐筆 (clock, value)), ...]
+def write_xlsx(path, tab_rows):
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd hh:mm:ss"})
+    try:
+        for tab_name, rows in tab_rows:
+            worksheet = None
+            row = EXCEL_MAX_ROWS
+            part = 1
+            for clock, value in rows:
+                if row >= EXCEL_MAX_ROWS:
+                    sheet_name = tab_name if part == 1 else f"{tab_name[:26]} ({part})"
+                    worksheet = workbook.add_worksheet(sheet_name)
+                    worksheet.set_column(0, 0, 20)
+                    worksheet.write_row(0, 0, ["Timestamp", "Value"])
+                    row = 1
+                    part += 1
+                worksheet.write_datetime(row, 0, to_datetime(clock), date_format)
+                worksheet.write_number(row, 1, value)
+                row += 1
+            if worksheet is None:
+                workbook.add_worksheet(tab_name).write_row(0, 0, ["Timestamp", "Value"])
+    finally:
+        workbook.close()
+
+# 每個頁籤一個 gzip 壓縮的 CSV
+def write_csv_gz(directory, tab_rows):
+    os.makedirs(directory, exist_ok=True)
+    for tab_name, rows in tab_rows:
+        path = os.path.join(directory, tab_name.replace("/", "_").replace(" ", "_") + ".csv.gz")
+        with gzip.open(path, "wt", newline="", encoding="utf-8", compresslevel=6) as f:
+            writer = csv.writer(f)
+            writer.writerow(["Timestamp", "Value"])
+            writer.writerows((to_datetime(clock).strftime("%Y-%m-%d %H:%M:%S"), value) for clock, value in rows)
+        print(f"CSV file '{path}' has been created successfully.")
+
+# 登入並把各頁籤同時抓取寫入快取，回傳成功的頁籤
+def update_tabs():
+    get_auth_token()
+
+    tab_names = []
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        futures = {tab_name: executor.submit(update_tab, itemids) for tab_name, itemids in tabs.items()}
+        for tab_name, future in futures.items():
+            try:
+                future.result()
+                tab_names.append(tab_name)
+            except ValueError as e:
+                print(f"JSON Decode Error for {tab_name}: {e}")
+            except Exception as e:
+                print(f"Error for {tab_name}: {e}")
+    get_client().close()
+    print(get_client().summary())
+    return tab_names
+
+# 收集資料寫入 snapshot 的 "xlsx" 區段，每個頁籤一條序列（依 clock 由新到舊）
+def collect(snapshot):
+    tab_names = update_tabs()
+    section = snapshot.section("xlsx")
+    section["tabs"] = tab_names
+    section["itemids"] = {tab_name: tabs[tab_name] for tab_name in tab_names}
+    for tab_name in tab_names:
+        snapshot.add_series(f"xlsx/{tab_name}", Series.from_points(list(iter_tab(tabs[tab_name]))))
+
+def series_rows(series):
+    return zip(series.clocks.tolist(), series.values.tolist())
+
+def write_output(tab_rows, output_format, output):
+    if output_format == "xlsx":
+        output = output or "zabbix_data.xlsx"
+        try:
+            write_xlsx(output, tab_rows)
+            print(f"Excel file '{output}' with multiple tabs has been created successfully.")
+        except ImportError:
+            print("xlsxwriter is not installed; use --format csv.gz or pip install xlsxwriter")
+    else:
+        write_csv_gz(output or "zabbix_data", tab_rows)
+
+# output_format 為 "xlsx" 或 "csv.gz"；output 為 xlsx 檔名或 csv.gz 輸出目錄
+# 有 snapshot_path 時從 snapshot 產生，否則從快取逐段讀出直接寫檔
+def main(output_format="xlsx", output=None, snapshot_path=None):
+    if snapshot_path is not None:
+        snapshot = Snapshot.load(snapshot_path)
+        tab_names = snapshot.section("xlsx").get("tabs", [])
+        tab_rows = ((tab_name, series_rows(snapshot.get_series(f"xlsx/{tab_name}"))) for tab_name in tab_names)
+    else:
+        with span("collect", report="xlsx"):
+            tab_names = update_tabs()
+        tab_rows = ((tab_name, iter_tab(tabs[tab_name])) for tab_name in tab_names)
+
+    # 將數據保存為 Excel 檔案（多個頁籤）或 gzip CSV
+    if not tab_names:
+        print("No data to save.")
+    else:
+        with span("render", report="xlsx", format=output_format):
+            write_output(tab_rows, output_format, output)
+
+if __name__ == "__main__":
+    main()